@@ -1,10 +1,14 @@
 # admin_dashboard.py - 反馈查看后台
 import streamlit as st
 import pandas as pd
-import json
 import os
 from datetime import datetime
 from feedback_system import FeedbackSystem
+from data_exporter import export_to_file, export_file_name
+import sampling_profiler
+
+# 导出文件目录
+EXPORT_DIR = "data/exports"
 
 def main():
     st.set_page_config(
@@ -22,12 +26,14 @@ def main():
     
     # 侧边栏导航
     st.sidebar.title("📊 导航")
-    page = st.sidebar.radio("选择页面", ["📈 数据概览", "📋 反馈详情", "⚙️ 系统管理"])
+    page = st.sidebar.radio("选择页面", ["📈 数据概览", "📋 反馈详情", "🔥 性能分析", "⚙️ 系统管理"])
     
     if page == "📈 数据概览":
         show_overview(feedback_system)
     elif page == "📋 反馈详情":
         show_feedback_details(feedback_system)
+    elif page == "🔥 性能分析":
+        show_profiler()
     elif page == "⚙️ 系统管理":
         show_system_management(feedback_system)
 
@@ -148,8 +154,6 @@ def show_overview(feedback_system):
         st.markdown("### 📊 反馈类型分布")
         
         try:
-            all_feedbacks = feedback_system.get_all_feedbacks()
-            
             type_data = {
                 "使用体验": stats.get("usage_feedback", 0),
                 "功能建议": stats.get("suggestion", 0),
@@ -199,10 +203,10 @@ def show_feedback_details(feedback_system):
     st.title("📋 反馈详情")
     
     try:
-        # 获取所有反馈
-        all_feedbacks = feedback_system.get_all_feedbacks()
+        # 总数由索引统计，不再加载全部反馈
+        total_count = feedback_system.count_feedbacks()
         
-        if not all_feedbacks:
+        if not total_count:
             st.info("暂无用户反馈记录")
             return
         
@@ -222,29 +226,22 @@ def show_feedback_details(feedback_system):
         with col3:
             min_rating = st.selectbox("最低评分", ["全部", "1星+", "2星+", "3星+", "4星+", "5星"])
         
-        # 应用筛选
-        filtered_feedbacks = []
-        for fb in all_feedbacks:
-            # 搜索过滤
-            if search_term:
-                if search_term.lower() not in fb.get("content", "").lower():
-                    continue
-            
-            # 类型过滤
-            if filter_type != "全部" and fb.get("type", "") != filter_type:
-                continue
-            
-            # 评分过滤
-            if min_rating != "全部":
-                min_stars = int(min_rating[0])
-                fb_rating = fb.get("rating", 0)
-                if fb_rating < min_stars:
-                    continue
-            
-            filtered_feedbacks.append(fb)
+        # 筛选条件下推到查询引擎
+        filters = {
+            "keyword": search_term,
+            "type": filter_type if filter_type != "全部" else None,
+            "min_rating": int(min_rating[0]) if min_rating != "全部" else None
+        }
+        
+        # 筛选条件变化时回到第一页
+        if st.session_state.get('feedback_filters') != filters:
+            st.session_state.feedback_filters = filters
+            st.session_state.page_cursors = [None]
+        
+        filtered_count = feedback_system.count_feedbacks(filters)
         
         # 显示统计
-        st.info(f"📊 找到 {len(filtered_feedbacks)} 条反馈（共 {len(all_feedbacks)} 条）")
+        st.info(f"📊 找到 {filtered_count} 条反馈（共 {total_count} 条）")
         
         # 批量操作
         col1, col2, col3 = st.columns([1, 1, 2])
@@ -253,33 +250,57 @@ def show_feedback_details(feedback_system):
                 st.rerun()
         
         with col2:
-            if st.button("📥 导出数据", use_container_width=True):
-                export_data(filtered_feedbacks)
+            export_clicked = st.button("📥 导出数据", use_container_width=True)
         
-        # 分页显示
+        with col3:
+            export_format = st.selectbox("导出格式", ["jsonl.gz", "csv.gz", "jsonl", "csv"], label_visibility="collapsed")
+        
+        if export_clicked:
+            export_data(feedback_system, filters, export_format)
+        
+        # 有关键词时可按相关度排序（中文二元组倒排索引），显示命中片段
+        if search_term.strip() and st.checkbox("按相关度排序", value=False):
+            results = feedback_system.search_feedbacks(search_term, limit=20, filters=filters)
+            st.markdown(f"### 🎯 相关度最高的 {len(results)} 条反馈")
+            for i, result in enumerate(results):
+                fb = result["feedback"]
+                st.markdown(
+                    f"**#{i + 1}** {fb.get('type', '未知')} - {fb.get('timestamp', '')[:10]} "
+                    f"（相关度 {result['score']}）<br>{result['highlight']}",
+                    unsafe_allow_html=True
+                )
+                with st.expander("查看详情", expanded=False):
+                    show_feedback_detail(fb)
+            if not results:
+                st.warning("没有找到匹配的反馈记录")
+            return
+        
+        # 键集分页：page_cursors 保存每一页的起始游标
         items_per_page = 10
-        total_pages = max(1, (len(filtered_feedbacks) + items_per_page - 1) // items_per_page)
+        total_pages = max(1, (filtered_count + items_per_page - 1) // items_per_page)
+        page_cursors = st.session_state.page_cursors
+        current_page = len(page_cursors)
         
-        if 'current_page' not in st.session_state:
-            st.session_state.current_page = 1
+        page = feedback_system.query_feedbacks(filters, cursor=page_cursors[-1], limit=items_per_page)
+        page_feedbacks = page["items"]
+        start_idx = (current_page - 1) * items_per_page
         
         # 分页控制
         if total_pages > 1:
-            page_cols = st.columns([2, 1, 2])
+            page_cols = st.columns([1, 2, 1])
             with page_cols[0]:
-                page_num = st.number_input("页码", min_value=1, max_value=total_pages, 
-                                         value=st.session_state.current_page)
-                st.session_state.current_page = page_num
+                if st.button("⬅️ 上一页", disabled=current_page == 1, use_container_width=True):
+                    page_cursors.pop()
+                    st.rerun()
+            with page_cols[1]:
+                st.caption(f"第 {current_page} 页 / 共 {total_pages} 页")
             with page_cols[2]:
-                st.caption(f"共 {total_pages} 页")
-        
-        # 计算当前页数据
-        start_idx = (st.session_state.current_page - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        page_feedbacks = filtered_feedbacks[start_idx:end_idx]
+                if st.button("下一页 ➡️", disabled=page["next_cursor"] is None, use_container_width=True):
+                    page_cursors.append(page["next_cursor"])
+                    st.rerun()
         
         # 显示反馈列表
-        st.markdown(f"### 📄 反馈列表（第 {st.session_state.current_page} 页）")
+        st.markdown(f"### 📄 反馈列表（第 {current_page} 页）")
         
         for i, fb in enumerate(page_feedbacks):
             with st.expander(f"#{start_idx + i + 1} {fb.get('type', '未知')} - {fb.get('timestamp', '')[:10]}", expanded=False):
@@ -430,29 +451,84 @@ def show_feedback_detail(fb):
                     # 这里需要实现删除逻辑
                     st.error("删除功能需要数据库支持")
 
-def export_data(feedbacks):
-    """导出数据"""
-    if not feedbacks:
+def export_data(feedback_system, filters, export_format="jsonl.gz"):
+    """导出数据 - 流式写入导出文件，内存占用与导出条数无关"""
+    if not feedback_system.count_feedbacks(filters):
         st.warning("没有数据可导出")
         return
     
-    # 创建导出数据
-    export_data = {
-        "export_time": datetime.now().isoformat(),
-        "total_feedbacks": len(feedbacks),
-        "feedbacks": feedbacks
-    }
+    fmt = export_format.split(".")[0]
+    compress = export_format.endswith(".gz")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    export_path = os.path.join(EXPORT_DIR, export_file_name("feedback", fmt, compress))
     
-    # 转换为JSON
-    json_str = json.dumps(export_data, ensure_ascii=False, indent=2)
+    with st.spinner("正在导出..."):
+        count = export_to_file("feedback", export_path, fmt=fmt, compress=compress,
+                               filters=filters, feedback_system=feedback_system)
     
     # 提供下载
-    st.download_button(
-        label="📥 下载JSON文件",
-        data=json_str,
-        file_name=f"feedback_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-        mime="application/json"
-    )
+    with open(export_path, "rb") as f:
+        st.download_button(
+            label=f"📥 下载导出文件（{count} 条）",
+            data=f,
+            file_name=os.path.basename(export_path),
+            mime="application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+        )
+
+def show_profiler():
+    """采样性能分析：按需采集N秒，查看最近采集的热点函数"""
+    st.title("🔥 性能分析")
+    st.caption("采样期间每隔固定间隔记录一次各线程的调用栈，开销很低；结果保存在 data/profiles/，"
+               "可下载 .speedscope.json 到 speedscope.app 查看火焰图")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        seconds = st.number_input("采集秒数", min_value=1, max_value=300, value=15)
+    with col2:
+        interval_ms = st.selectbox("采样间隔 (毫秒)", [5, 10, 20, 50], index=1)
+    with col3:
+        target = st.selectbox("采集对象", ["所有工作进程 (agent_ui)", "后台管理进程"])
+    
+    if st.button("▶️ 开始采集", type="primary"):
+        if target.startswith("所有"):
+            sampling_profiler.request_capture(seconds, interval_ms / 1000)
+            st.success(f"已通知工作进程采集 {seconds} 秒，完成后刷新本页查看")
+        elif sampling_profiler.is_capturing():
+            st.warning("已有采集正在进行")
+        else:
+            sampling_profiler.start_capture(seconds, interval_ms / 1000, label="admin_dashboard")
+            st.success(f"开始采集 {seconds} 秒，完成后刷新本页查看")
+    
+    if st.button("🔄 刷新列表"):
+        st.rerun()
+    
+    captures = sampling_profiler.list_captures()
+    if not captures:
+        st.info("暂无采集记录")
+        return
+    
+    st.markdown("### 📄 最近的采集")
+    for capture in captures:
+        title = (f"{capture['started_at'][:19]}  {capture['label']} (pid {capture['pid']})  "
+                 f"{capture['seconds']}s / {capture['samples']} 次采样")
+        with st.expander(title, expanded=False):
+            top = capture.get("top_functions", [])
+            if top:
+                st.dataframe([
+                    {"函数": f["function"], "自身占比": f"{f['self_pct']}%", "累计占比": f"{f['total_pct']}%",
+                     "采样数": f["self"]}
+                    for f in top
+                ], use_container_width=True)
+            else:
+                st.info("采集期间没有活跃的调用栈")
+            
+            col1, col2 = st.columns(2)
+            for col, key, mime in [(col1, "speedscope_file", "application/json"), (col2, "collapsed_file", "text/plain")]:
+                path = os.path.join(sampling_profiler.PROFILE_DIR, capture[key])
+                if os.path.exists(path):
+                    with col, open(path, "rb") as f:
+                        st.download_button(f"📥 {capture[key]}", data=f, file_name=capture[key], mime=mime,
+                                           key=f"download_{capture[key]}")
 
 def show_system_management(feedback_system):
     """显示系统管理"""
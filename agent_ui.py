@@ -1,8 +1,10 @@
 # agent_ui.py - 简化反馈入口版
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import os
 import sys
 import time
+import weakref
 from datetime import datetime
 
 # 添加当前目录到路径
@@ -11,12 +13,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # ========== 导入Agent和配置 ==========
 try:
     from career_agent import CareerAgent
-    from config import get_api_key
+    from config import get_api_keys
     from feedback_system import FeedbackSystem
+    from prefetch_engine import PrefetchEngine
+    from telemetry import ACTIVE_SESSIONS, start_metrics_server
+    from sampling_profiler import watch_requests
+    from turn_executor import get_turn_executor
     
-    API_KEY = get_api_key()
-    
-    if not API_KEY:
+    # 所有会话共用进程内的密钥池（见 key_pool.py）
+    if not get_api_keys():
         st.error("❌ 未找到API密钥，请检查.env文件配置")
         st.stop()
         
@@ -27,10 +32,19 @@ except Exception as e:
     st.error(f"❌ 初始化失败: {e}")
     st.stop()
 
+# 设置了 METRICS_PORT 时启动OpenMetrics端点（每个进程只启动一次）
+start_metrics_server()
+
+# 响应后台管理页面发出的性能采样请求（每个进程只启动一个监听线程）
+watch_requests(label="agent_ui")
+
 # ========== 初始化Session State ==========
 if 'agent' not in st.session_state:
     try:
-        st.session_state.agent = CareerAgent(API_KEY)
+        st.session_state.agent = CareerAgent()
+        # 会话被Streamlit回收时Agent随之释放，活跃会话数随之减少
+        ACTIVE_SESSIONS.inc()
+        weakref.finalize(st.session_state.agent, ACTIVE_SESSIONS.dec)
     except Exception as e:
         st.error(f"❌ 创建Agent失败: {e}")
         st.stop()
@@ -41,6 +55,12 @@ if 'messages' not in st.session_state:
 if 'feedback_content' not in st.session_state:
     st.session_state.feedback_content = ""
 
+# 对话区只渲染最近的消息，更早的折叠起来按需展开，每轮的渲染量不随对话长度增长
+HISTORY_WINDOW = 20
+
+if 'history_window' not in st.session_state:
+    st.session_state.history_window = HISTORY_WINDOW
+
 # 初始化反馈系统
 feedback_system = FeedbackSystem()
 
@@ -130,6 +150,12 @@ with st.sidebar:
         except:
             pass
     
+    # 后续问题预取（用户阅读回答时在后台生成可能的追问）
+    st.toggle("⚡ 预取后续回答", key="prefetch_enabled", help="在您阅读回答时提前生成可能的后续问题，会额外消耗token")
+    if st.session_state.agent and st.session_state.agent.prefetch_engine:
+        prefetch_stats = st.session_state.agent.prefetch_engine.get_stats()
+        st.caption(f"预取命中率: {prefetch_stats['hit_rate']}% · 每次预取浪费 {prefetch_stats['tokens_wasted_per_prefetch']} token")
+    
     st.divider()
     
     # 反馈入口
@@ -180,6 +206,7 @@ with st.sidebar:
     # 对话管理
     if st.button("🗑️ 清空对话", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.history_window = HISTORY_WINDOW
         if st.session_state.agent:
             try:
                 st.session_state.agent.clear_conversation()
@@ -191,6 +218,147 @@ with st.sidebar:
     
     st.caption("💡 提示：点击下方问题快速开始对话")
 
+# ========== 对话区 ==========
+# 回答生成中：每 TURN_STREAM_INTERVAL 秒更新一次已生成的部分（只更新这一条消息），
+# 每 TURN_REFRESH_INTERVAL 秒结束本次运行并重跑对话区，期间的点击（如停止生成）在重跑时处理
+TURN_STREAM_INTERVAL = 0.2
+TURN_REFRESH_INTERVAL = 1.0
+
+def queue_question(question):
+    """按钮回调：登记问题并只重跑对话区，由对话区交给后台执行器回答"""
+    st.session_state.pending_question = question
+    st.rerun(scope="chat")
+
+def show_earlier_messages():
+    st.session_state.history_window += HISTORY_WINDOW
+
+def render_message(role, content):
+    if role == "user":
+        with st.chat_message("user", avatar="👤"):
+            st.markdown(f"""
+            <div class="user-message">
+                {content}
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        with st.chat_message("assistant", avatar="🤖"):
+            st.markdown(f"""
+            <div class="ai-message">
+                {content}
+            </div>
+            """, unsafe_allow_html=True)
+
+def cancel_turn():
+    """停止按钮回调：中断后台正在生成的回答"""
+    handle = st.session_state.get("turn_handle")
+    if handle is not None:
+        handle.cancel()
+
+def start_turn(question):
+    """把这一轮交给后台执行器，脚本线程只负责刷新显示"""
+    try:
+        st.session_state.turn_handle = get_turn_executor().submit(st.session_state.agent, question)
+    except RuntimeError as e:
+        st.toast(f"⚠️ {e}")
+
+def turn_result(handle):
+    """一轮结束后写入对话记录的回答"""
+    partial = handle.text + "\n\n" if handle.text else ""
+    if handle.outcome == "cancelled":
+        return partial + "⏹️ 已停止生成"
+    if handle.outcome == "timeout":
+        return partial + f"⏱️ 回答超时（超过 {handle.deadline} 秒），请稍后重试"
+    if handle.response is None:
+        return f"❌ 处理请求时出错: {(handle.error or '')[:100]}"
+    return handle.response
+
+def show_turn(handle):
+    """显示后台执行中的一轮（已生成的部分 + 停止按钮），结束时写入对话记录；返回是否仍在生成"""
+    render_message("user", handle.question)
+    with st.chat_message("assistant", avatar="🤖"):
+        placeholder = st.empty()
+        stop_slot = st.empty()
+        stop_slot.button("⏹️ 停止生成", key="cancel_turn", on_click=cancel_turn)
+        refresh_at = time.time() + TURN_REFRESH_INTERVAL
+        while not handle.wait(TURN_STREAM_INTERVAL):
+            if handle.text:
+                placeholder.markdown(f"""
+                <div class="ai-message">
+                    {handle.text} ▌
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                placeholder.markdown(f"🤔 AI正在思考... {handle.elapsed:.1f}s")
+            if time.time() >= refresh_at:
+                return True
+
+        response = turn_result(handle)
+        if st.session_state.get("turn_handle") is handle:
+            del st.session_state.turn_handle
+            st.session_state.messages.append({"role": "user", "content": handle.question})
+            st.session_state.messages.append({"role": "assistant", "content": response})
+        stop_slot.empty()
+        placeholder.markdown(f"""
+        <div class="ai-message">
+            {response}
+        </div>
+        """, unsafe_allow_html=True)
+    return False
+
+def refresh_chat_panel():
+    """生成中重跑对话区；整页运行中（如侧边栏操作）不允许fragment范围的rerun，改为重跑整页"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment(key="chat")
+def chat_panel():
+    st.markdown("### 💬 对话历史")
+    history = st.container()
+    followups = st.container()
+    st.markdown("---")
+    # 输入框先于历史创建（容器保证显示顺序不变），这样本次运行就能拿到提交的内容
+    user_input = st.chat_input("💭 请输入您的问题...")
+    question = user_input or st.session_state.pop("pending_question", None)
+
+    # 同一会话同时只进行一轮，生成中的新问题不再排队等待
+    if question and st.session_state.agent:
+        if st.session_state.get("turn_handle") is None:
+            start_turn(question)
+        else:
+            st.toast("⏳ 上一轮回答还在生成中，请稍候或先停止生成")
+    handle = st.session_state.get("turn_handle")
+
+    messages = st.session_state.messages
+    with history:
+        if not messages and handle is None:
+            st.info("👋 请在上方选择问题开始对话，或直接在下方输入您的问题")
+
+        hidden = len(messages) - st.session_state.history_window
+        if hidden > 0:
+            st.button(f"⬆️ 显示更早的 {hidden} 条消息", key="show_earlier_messages",
+                      on_click=show_earlier_messages)
+        for msg in messages[max(hidden, 0):]:
+            render_message(msg["role"], msg["content"])
+
+        generating = handle is not None and show_turn(handle)
+
+    # 已预取的后续问题，点击即可立即得到回答
+    if not generating and st.session_state.messages and st.session_state.agent.prefetch_engine:
+        pending_questions = st.session_state.agent.prefetch_engine.get_pending_questions()
+        if pending_questions:
+            with followups:
+                st.caption("💡 你可能还想问：")
+                follow_cols = st.columns(len(pending_questions))
+                for col, pending in zip(follow_cols, pending_questions):
+                    with col:
+                        st.button(f"⚡ {pending}", key=f"prefetch_{hash(pending)}", use_container_width=True,
+                                  on_click=queue_question, args=(pending,))
+
+    if generating:
+        refresh_chat_panel()
+
 # ========== 主界面 ==========
 # 标题
 st.markdown("""
@@ -208,6 +376,7 @@ st.markdown("### 💡 快速提问")
 categories = [
     {
         "title": "📄 简历优化",
+        "state": "resume",
         "color": "#667eea",
         "questions": [
             "如何写一份优秀的技术简历？",
@@ -217,6 +386,7 @@ categories = [
     },
     {
         "title": "💼 面试准备",
+        "state": "interview",
         "color": "#764ba2", 
         "questions": [
             "技术面试常见问题有哪些？",
@@ -226,6 +396,7 @@ categories = [
     },
     {
         "title": "🎯 职业规划",
+        "state": "career",
         "color": "#f093fb",
         "questions": [
             "如何规划我的职业发展路径？",
@@ -235,6 +406,7 @@ categories = [
     },
     {
         "title": "💰 薪资谈判",
+        "state": "salary",
         "color": "#4facfe",
         "questions": [
             "跳槽时如何谈薪资？",
@@ -244,6 +416,17 @@ categories = [
     }
 ]
 
+# 根据开关挂载/卸载预取引擎，快速提问列表用于预测同类后续问题
+if st.session_state.get("prefetch_enabled"):
+    if st.session_state.agent.prefetch_engine is None:
+        st.session_state.agent.prefetch_engine = PrefetchEngine(
+            quick_questions={category["state"]: category["questions"] for category in categories}
+        )
+elif st.session_state.agent.prefetch_engine is not None:
+    # 关闭时先结束当前轮次：取消排队中的预取，进行中的预取完成后计入浪费
+    st.session_state.agent.prefetch_engine.reset()
+    st.session_state.agent.prefetch_engine = None
+
 cols = st.columns(4)
 for idx, (col, category) in enumerate(zip(cols, categories)):
     with col:
@@ -253,79 +436,21 @@ for idx, (col, category) in enumerate(zip(cols, categories)):
         """, unsafe_allow_html=True)
         
         for question in category['questions']:
-            if st.button(
+            st.button(
                 f"💬 {question}",
                 key=f"quick_{idx}_{hash(question)}",
-                use_container_width=True
-            ):
-                try:
-                    response = st.session_state.agent.passive_chat(question)
-                    st.session_state.messages.append({"role": "user", "content": question})
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"提问失败: {str(e)[:100]}")
-        
+                use_container_width=True,
+                on_click=queue_question,
+                args=(question,)
+            )
+
         st.markdown("</div>", unsafe_allow_html=True)
 
 st.divider()
 
-# 对话历史
-st.markdown("### 💬 对话历史")
-
-if not st.session_state.messages:
-    st.info("👋 请在上方选择问题开始对话，或直接在下方输入您的问题")
-else:
-    for msg in st.session_state.messages:
-        if msg["role"] == "user":
-            with st.chat_message("user", avatar="👤"):
-                st.markdown(f"""
-                <div class="user-message">
-                    {msg["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            with st.chat_message("assistant", avatar="🤖"):
-                st.markdown(f"""
-                <div class="ai-message">
-                    {msg["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-
-# 用户输入
-st.markdown("---")
-user_input = st.chat_input("💭 请输入您的问题...")
-
-if user_input and st.session_state.agent:
-    with st.chat_message("user", avatar="👤"):
-        st.markdown(f"""
-        <div class="user-message">
-            {user_input}
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with st.chat_message("assistant", avatar="🤖"):
-        with st.spinner("🤔 AI正在思考..."):
-            try:
-                response = st.session_state.agent.passive_chat(user_input)
-                
-                st.markdown(f"""
-                <div class="ai-message">
-                    {response}
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.session_state.messages.append({"role": "user", "content": user_input})
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                
-            except Exception as e:
-                error_msg = f"❌ 处理请求时出错: {str(e)[:100]}"
-                st.error(error_msg)
-                st.session_state.messages.append({"role": "user", "content": user_input})
-                st.session_state.messages.append({"role": "assistant", "content": error_msg})
-    
-    time.sleep(0.3)
-    st.rerun()
+# 对话区（含输入框）是一个fragment：输入提问、点击后续问题或展开历史时只重跑这一块，
+# 新的一轮在后台执行器中生成、在同一次运行中流式显示，不再需要 st.rerun() 再跑一遍整个页面
+chat_panel()
 
 # 页面底部
 st.markdown("---")
@@ -0,0 +1,226 @@
+# batch_runner.py - 批量咨询运行器（离线处理合作高校批量提交的问题）
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from career_agent import CareerAgent
+from metrics_dashboard import MetricsDashboard
+from config import get_api_keys
+from telemetry import QUEUE_DEPTH, start_metrics_server
+
+LATENCY_SAMPLE_SIZE = 10000  # 计算耗时分位数的样本数上限
+
+class LatencyReservoir:
+    """逐条耗时的固定大小均匀样本（蓄水池抽样），分位数的内存占用与处理条数无关；最大值单独精确记录"""
+
+    def __init__(self, size=LATENCY_SAMPLE_SIZE, seed=None):
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.max = 0.0
+        self.rng = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        self.max = max(self.max, value)
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self.rng.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+def iter_questions(input_file):
+    """逐行流式读取输入JSONL，不把整个文件读入内存
+
+    每行格式: {"id": "可选", "question": "问题", "profile": {可选的用户信息}}
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, {"error": f"JSON格式错误: {e}"}
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            yield line_no, item
+
+def read_complete_lines(path):
+    """读取以换行结尾的完整行；崩溃时只写了一半的最后一行被截掉，续跑追加时不会与新内容拼成一行"""
+    lines = []
+    if not os.path.exists(path):
+        return lines
+
+    valid_end = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            valid_end += len(raw)
+            lines.append(raw.decode('utf-8', errors='replace').strip())
+    if valid_end < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(valid_end)
+    return lines
+
+def load_checkpoint(checkpoint_file):
+    """读取已完成的行号集合（用于崩溃后续跑）"""
+    return {int(line) for line in read_complete_lines(checkpoint_file) if line.isdigit()}
+
+def load_written(output_file):
+    """读取输出文件中已有结果的行号
+
+    结果先写入输出文件再记录检查点，两次写入之间崩溃时该行只在输出文件中，
+    续跑时与检查点合并去重，不会重复处理、重复输出
+    """
+    written = set()
+    for line in read_complete_lines(output_file):
+        try:
+            written.add(int(json.loads(line)["line"]))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return written
+
+def process_item(api_key, line_no, item):
+    """处理单个问题 - 每个问题使用独立的Agent，避免不同学生的对话互相串扰
+
+    api_key 为 None 时使用进程内共享的密钥池，请求分摊到所有配置的密钥上
+    """
+    start_time = time.time()
+    record = {"line": line_no, "id": item.get("id", line_no)}
+
+    if "error" in item:
+        record.update({"success": False, "error": item["error"], "latency": 0})
+        return record
+
+    question = item.get("question", "")
+    if not question:
+        record.update({"success": False, "error": "缺少question字段", "latency": 0})
+        return record
+
+    try:
+        agent = CareerAgent(api_key)
+        profile = item.get("profile")
+        if isinstance(profile, dict):
+            agent.user_profile.update(profile)
+
+        answer = agent.passive_chat(question)
+        record.update({
+            "question": question,
+            "answer": answer,
+            "state": agent.current_state,
+            "success": agent.last_error is None and agent.blocked is None,
+            "error": agent.last_error or (f"budget_exceeded:{agent.blocked}" if agent.blocked else None)
+        })
+    except Exception as e:
+        record.update({"question": question, "success": False, "error": str(e)})
+
+    record["latency"] = round(time.time() - start_time, 3)
+    return record
+
+def run_batch(input_file, output_file, api_key, workers=4, checkpoint_file=None, progress_every=100):
+    """批量处理问题
+
+    - 最多 workers*2 个任务同时在途，输入按需读取，内存占用与数据集大小无关
+    - 每条结果写入并刷新输出JSONL后再记录检查点，崩溃后重新运行会跳过检查点或输出文件中已有的行
+    - 结束后把吞吐量、失败数和耗时分位数写入指标数据
+    """
+    checkpoint_file = checkpoint_file or output_file + ".ckpt"
+    completed = load_checkpoint(checkpoint_file) | load_written(output_file)
+    max_in_flight = max(1, workers * 2)
+
+    summary = {
+        "input_file": input_file,
+        "output_file": output_file,
+        "workers": workers,
+        "processed": 0,
+        "failed": 0,
+        "skipped": 0
+    }
+    latencies = LatencyReservoir(LATENCY_SAMPLE_SIZE)
+
+    if completed:
+        print(f"🔁 从检查点恢复，已完成 {len(completed)} 条")
+
+    start_time = time.time()
+
+    def write_result(future, out_f, ckpt_f):
+        record = future.result()
+        out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out_f.flush()
+        ckpt_f.write(f"{record['line']}\n")
+        ckpt_f.flush()
+
+        summary["processed"] += 1
+        latencies.add(record.get("latency", 0))
+        if not record.get("success"):
+            summary["failed"] += 1
+
+        if summary["processed"] % progress_every == 0:
+            elapsed = time.time() - start_time
+            print(f"📦 已处理 {summary['processed']} 条，失败 {summary['failed']} 条，"
+                  f"{summary['processed'] / elapsed:.2f} 条/秒")
+
+    with open(output_file, 'a', encoding='utf-8') as out_f, \
+         open(checkpoint_file, 'a', encoding='utf-8') as ckpt_f, \
+         ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        for line_no, item in iter_questions(input_file):
+            if line_no in completed:
+                summary["skipped"] += 1
+                continue
+
+            # 在途任务达到上限时，先等待至少一个完成
+            while len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_result(future, out_f, ckpt_f)
+
+            pending.add(executor.submit(process_item, api_key, line_no, item))
+            QUEUE_DEPTH.labels("batch").set(len(pending))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            QUEUE_DEPTH.labels("batch").set(len(pending))
+            for future in done:
+                write_result(future, out_f, ckpt_f)
+
+    summary["elapsed"] = time.time() - start_time
+    summary["throughput"] = summary["processed"] / summary["elapsed"] if summary["elapsed"] > 0 else 0
+    summary["latencies"] = latencies.samples
+    summary["max_latency"] = latencies.max
+
+    MetricsDashboard().record_batch_run(summary)
+
+    print(f"✅ 批量处理完成：处理 {summary['processed']} 条，失败 {summary['failed']} 条，"
+          f"跳过 {summary['skipped']} 条，耗时 {summary['elapsed']:.1f}s，"
+          f"吞吐量 {summary['throughput']:.2f} 条/秒")
+    return summary
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI职业规划师 - 批量咨询运行器")
+    parser.add_argument("input", help="输入JSONL文件，每行包含 question 和可选的 id、profile")
+    parser.add_argument("output", help="输出JSONL文件（追加写入）")
+    parser.add_argument("--workers", type=int, default=4, help="并发工作线程数 (默认4)")
+    parser.add_argument("--checkpoint", default=None, help="检查点文件 (默认 <output>.ckpt)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="OpenMetrics端点端口 (默认读取 METRICS_PORT)")
+    args = parser.parse_args()
+
+    start_metrics_server(args.metrics_port)
+
+    if not get_api_keys():
+        print("❌ 请设置 DEEPSEEK_API_KEY 或 DEEPSEEK_API_KEYS 环境变量")
+        return
+
+    run_batch(args.input, args.output, None, workers=args.workers, checkpoint_file=args.checkpoint)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_chat_render.py - agent_ui 对话渲染耗时随对话长度的变化（10条 vs 500条消息）
+#
+# 启动mock服务（零延迟）和 agent_ui，通过websocket驱动一个会话连续对话，在历史达到指定条数时测量：
+#   - 一轮对话的耗时、脚本运行次数、收到的消息数和字节数（只重跑对话区fragment时应与历史长度无关）
+#   - 整页重跑（如切换侧边栏开关、刷新页面）的耗时和消息数
+#
+# 用法：
+#   python benchmarks/bench_chat_render.py
+#   python benchmarks/bench_chat_render.py --checkpoints 10,100,500 --script /path/to/old/agent_ui.py
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+import websockets
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from load_test_ui import QUESTIONS, VirtualUser, launch_app, wait_for_health
+from mock_deepseek import MockDeepSeekServer
+
+async def drive(ws_url, checkpoints, samples):
+    user = VirtualUser(ws_url, 0)
+    results = []
+    async with websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=30) as ws:
+        await user.rerun(ws)
+        messages = 0
+
+        async def turn():
+            nonlocal messages
+            states = WidgetStates()
+            widget = states.widgets.add()
+            widget.id = user.chat_input_id
+            widget.chat_input_value.data = QUESTIONS[messages // 2 % len(QUESTIONS)]
+            stats = await user.rerun(ws, states, user.chat_fragment_id)
+            messages += 2
+            return stats
+
+        for checkpoint in checkpoints:
+            while messages < checkpoint:
+                await turn()
+            turns = [await turn() for _ in range(samples)]
+            pages = [await user.rerun(ws) for _ in range(samples)]
+            results.append({
+                "messages": checkpoint,
+                "turn_ms": statistics.median(t["total"] for t in turns) * 1000,
+                "runs_per_turn": statistics.mean(t["runs"] for t in turns),
+                "turn_msgs": statistics.median(t["messages"] for t in turns),
+                "turn_kb": statistics.median(t["bytes"] for t in turns) / 1024,
+                "page_ms": statistics.median(p["total"] for p in pages) * 1000,
+                "page_msgs": statistics.median(p["messages"] for p in pages),
+                "page_kb": statistics.median(p["bytes"] for p in pages) / 1024
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="agent_ui 对话渲染基准")
+    parser.add_argument("--checkpoints", default="10,500", help="测量时的历史消息条数，逗号分隔")
+    parser.add_argument("--samples", type=int, default=5, help="每个测量点的重复次数（取中位数）")
+    parser.add_argument("--port", type=int, default=18502, help="agent_ui 端口")
+    parser.add_argument("--script", default=None, help="被测脚本（默认仓库中的 agent_ui.py，可指定旧版本对比）")
+    args = parser.parse_args()
+
+    checkpoints = sorted(int(c) for c in args.checkpoints.split(",") if c.strip())
+    server = MockDeepSeekServer(latency="fixed:0").start()
+    work_dir = tempfile.mkdtemp(prefix="agent_ui_render_")
+    app = launch_app(args.port, server.url, work_dir, args.script)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_for_health(base_url):
+            print(f"❌ {base_url} 未就绪")
+            return 1
+        results = asyncio.run(drive(base_url.replace("http", "ws", 1) + "/_stcore/stream", checkpoints, args.samples))
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'消息数':>6} | {'整轮ms':>8} | {'运行/轮':>6} | {'消息/轮':>6} | {'KB/轮':>7} | "
+          f"{'整页ms':>8} | {'消息/页':>6} | {'KB/页':>7}")
+    for r in results:
+        print(f"{r['messages']:>9} | {r['turn_ms']:>10.1f} | {r['runs_per_turn']:>9.1f} | {r['turn_msgs']:>9.0f} | "
+              f"{r['turn_kb']:>9.1f} | {r['page_ms']:>10.1f} | {r['page_msgs']:>9.0f} | {r['page_kb']:>9.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
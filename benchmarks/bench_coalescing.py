@@ -0,0 +1,123 @@
+# bench_coalescing.py - 相同请求的在途合并（single-flight）：并发突发下的上游请求数与延迟
+#
+# N 个线程同时发出完全相同的 call_deepseek（例如多位用户点了同一个快捷问题），比较：
+#   - mock服务实际收到的请求数（合并后应为1）与调用数
+#   - 每个调用的延迟、回答是否一致、流式调用是否收到完整片段
+#   - 部分等待者中途取消时，其余等待者仍拿到完整回答
+#   - 对照组：N 个不同的请求（不可合并）
+#
+# 用法：
+#   python benchmarks/bench_coalescing.py
+#   python benchmarks/bench_coalescing.py --callers 50 --latency fixed:0.5
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+def new_agent(server):
+    from career_agent import CareerAgent
+    agent = CareerAgent("mock-key")
+    agent.api_url = server.url
+    return agent
+
+def burst(server, callers, mode, distinct=False, cancel_every=0, cancel_after=0.1):
+    """callers 个线程同时调用；mode 为 stream / plain / mixed（奇数号流式）
+
+    cancel_every>0 时每隔几个流式调用在 cancel_after 秒后取消一个（第0号即发起上游调用的那个）
+    """
+    from turn_executor import CancelToken, TurnCancelled
+
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+
+    def worker(index):
+        agent = new_agent(server)
+        question = f"并发问题 #{index}" if distinct else "如何准备产品经理面试？"
+        messages = [{"role": "system", "content": "你是职业规划师"}, {"role": "user", "content": question}]
+        streaming = mode == "stream" or (mode == "mixed" and index % 2 == 1)
+        token = CancelToken() if streaming else None
+        parts = []
+        cancel = streaming and cancel_every and index % cancel_every == 0
+        if cancel:
+            threading.Timer(cancel_after, token.cancel).start()
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            content = agent.call_deepseek(messages, cancel_token=token, on_delta=parts.append if streaming else None)
+            outcome = "ok" if agent.last_error is None else "error"
+        except TurnCancelled:
+            content, outcome = None, "cancelled"
+        results[index] = {
+            "elapsed": time.perf_counter() - start,
+            "content": content,
+            "streamed": "".join(parts) if streaming else None,
+            "outcome": outcome
+        }
+
+    requests_before = server.stats["requests"]
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    completed = [r for r in results if r["outcome"] == "ok"]
+    contents = {r["content"] for r in completed}
+    stream_ok = all(r["streamed"] == r["content"] for r in completed if r["streamed"] is not None)
+    elapsed = sorted(r["elapsed"] for r in completed)
+    return {
+        "callers": callers,
+        "upstream": server.stats["requests"] - requests_before,
+        "completed": len(completed),
+        "cancelled": sum(r["outcome"] == "cancelled" for r in results),
+        "consistent": len(contents) == 1,
+        "stream_ok": stream_ok,
+        "p50_ms": statistics.median(elapsed) * 1000 if elapsed else 0.0,
+        "max_ms": elapsed[-1] * 1000 if elapsed else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="single-flight 请求合并基准（本地mock DeepSeek服务）")
+    parser.add_argument("--callers", type=int, default=20, help="每次突发的并发调用数")
+    parser.add_argument("--latency", default="fixed:0.2", help="mock首字节延迟（同 mock_deepseek.py --latency）")
+    parser.add_argument("--token-interval", type=float, default=0.005, help="mock流式片段间隔（秒）")
+    args = parser.parse_args()
+
+    from career_agent import single_flight
+
+    cases = [
+        ("非流式 相同请求", {"mode": "plain"}),
+        ("流式 相同请求", {"mode": "stream"}),
+        ("混合 相同请求", {"mode": "mixed"}),
+        ("流式 部分取消", {"mode": "stream", "cancel_every": 4}),
+        ("对照：不同请求", {"mode": "stream", "distinct": True})
+    ]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # MetricsDashboard 写入临时目录
+        server = MockDeepSeekServer(latency=args.latency, token_interval=args.token_interval).start()
+        try:
+            print(f"{'场景':<14} | {'调用':>4} | {'上游请求':>6} | {'完成':>4} | {'取消':>4} | {'回答一致':>6} | "
+                  f"{'流式完整':>6} | {'p50 ms':>8} | {'max ms':>8}")
+            for name, options in cases:
+                r = burst(server, args.callers, **options)
+                print(f"{name:<14} | {r['callers']:>6} | {r['upstream']:>10} | {r['completed']:>6} | {r['cancelled']:>6} | "
+                      f"{'-' if options.get('distinct') else '是' if r['consistent'] else '否':>8} | {'是' if r['stream_ok'] else '否':>8} | "
+                      f"{r['p50_ms']:>8.1f} | {r['max_ms']:>8.1f}")
+        finally:
+            server.stop()
+            os.chdir(cwd)
+    print(f"\n合并比例（follower / 全部调用）: {single_flight.coalescing_ratio():.1%}  {single_flight.stats}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
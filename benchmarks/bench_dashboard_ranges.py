@@ -0,0 +1,132 @@
+# bench_dashboard_ranges.py - 任意时间范围趋势图：1小时 / 1天 / 90天视图的查询与渲染耗时
+#
+# 在临时目录生成 --events 个均匀分布在最近90天的API调用（全部在列式归档中，见 metrics_archive.py），
+# 3天前插入一段1分钟的响应时间尖峰。对每个时间范围比较：
+#   - 查询耗时（完整覆盖的归档日合并预先汇总的分钟桶，其余扫描原始事件）、分辨率和发给Plotly的点数/JSON大小，
+#     对照：打开范围内的全部分区扫描原始事件分桶（两者结果应一致）
+#   - Streamlit AppTest 中切换到该范围后趋势图的完整渲染耗时
+#   - 对照：把范围内的原始事件直接画成一条曲线时的点数和Plotly JSON序列化耗时
+#     （超过 --raw-limit 个事件时按 --raw-limit 个事件的耗时线性外推）
+#
+# 用法：
+#   python benchmarks/bench_dashboard_ranges.py
+#   python benchmarks/bench_dashboard_ranges.py --events 1000000 --max-points 2000
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import plotly.graph_objects as go
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from bench_metrics_archive import generate_columns
+from metrics_archive import MetricsArchive, day_to_str
+from metrics_dashboard import SECONDS_PER_DAY, MetricsDashboard, to_epoch_seconds
+
+RANGES = {"1小时": timedelta(hours=1), "24小时": timedelta(days=1), "90天": timedelta(days=90)}
+SPIKE_LATENCY = 60.0
+
+def render_app(data_file, max_points):
+    from metrics_dashboard import MetricsDashboard
+    MetricsDashboard(data_file).show_trends(max_points=max_points)
+
+def raw_figure_seconds(columns, start_s, end_s, limit):
+    """对照：范围内每个事件一个点，返回 (点数, 序列化耗时秒, 是否外推)"""
+    mask = (columns.api_ts >= start_s) & (columns.api_ts < end_s)
+    ts = columns.api_ts[mask]
+    latency = columns.api_latency[mask]
+    sample = min(ts.size, limit)
+    start = time.perf_counter()
+    fig = go.Figure(go.Scatter(x=(ts[:sample] * 1e6).astype("datetime64[us]"), y=latency[:sample], mode="lines"))
+    fig.to_json()
+    seconds = time.perf_counter() - start
+    return int(ts.size), seconds * ts.size / max(sample, 1), sample < ts.size
+
+def main():
+    parser = argparse.ArgumentParser(description="任意时间范围趋势图基准（列式归档 + 分桶降采样）")
+    parser.add_argument("--events", type=int, default=10_000_000, help="最近90天的API调用总数")
+    parser.add_argument("--max-points", type=int, default=3000, help="每个图表的点数上限")
+    parser.add_argument("--raw-limit", type=int, default=1_000_000, help="原始事件对照最多实际序列化的点数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "metrics.json")
+        dashboard = MetricsDashboard(data_file)
+
+        start = time.perf_counter()
+        columns = generate_columns(args.events)
+        spike_s = to_epoch_seconds(datetime.now() - timedelta(days=3))
+        spike = (columns.api_ts >= spike_s) & (columns.api_ts < spike_s + 60) & columns.api_success
+        columns.api_latency[spike] = SPIKE_LATENCY
+        MetricsArchive(dashboard.archive_dir).append(columns)
+        print(f"生成并归档 {args.events} 个事件：{time.perf_counter() - start:.1f}s（尖峰 {int(spike.sum())} 个调用）")
+
+        from streamlit.testing.v1 import AppTest
+        app = AppTest.from_function(render_app, args=(data_file, args.max_points), default_timeout=600)
+        app.run()
+
+        rows = []
+        now = datetime.now()
+        for label, span in RANGES.items():
+            start_s, end_s = to_epoch_seconds(now - span), to_epoch_seconds(now)
+
+            timings = []
+            for _ in range(3):
+                t = time.perf_counter()
+                series = dashboard.get_timeseries(now - span, now, args.max_points)
+                timings.append(time.perf_counter() - t)
+            query_ms = np.median(timings) * 1000
+
+            archive = MetricsArchive(dashboard.archive_dir)
+            t = time.perf_counter()
+            parts = archive.load_range(day_to_str(np.floor(start_s / SECONDS_PER_DAY)),
+                                       day_to_str(np.floor(end_s / SECONDS_PER_DAY)))
+            scanned = parts.timeseries(start_s, end_s, args.max_points)
+            scan_ms = (time.perf_counter() - t) * 1000
+            fields = ("ts", "latency") if series["resolution"] == "raw" else ("ts", "api_calls", "latency_avg", "latency_max")
+            if not all(np.allclose(series[f], scanned[f], equal_nan=True) for f in fields):
+                print(f"⚠️ {label}：汇总桶查询与扫描原始事件的结果不一致")
+
+            renders = []
+            for i in range(3):
+                # 先切到另一个范围，保证每次都重新查询和绘制
+                app.radio(key="trend_range").set_value("6小时" if i % 2 == 0 else "7天").run()
+                t = time.perf_counter()
+                app.radio(key="trend_range").set_value(label).run()
+                renders.append(time.perf_counter() - t)
+            if app.exception:
+                print(f"渲染出错: {app.exception}")
+                return 1
+            charts = app.get("plotly_chart")
+            specs = [json.loads(chart.proto.spec) for chart in charts]
+            points = [sum(len(trace.get("x", [])) for trace in spec["data"]) for spec in specs]
+            payload_kb = sum(len(chart.proto.spec) for chart in charts) / 1024
+
+            spike_kept = None
+            if start_s <= spike_s < end_s:
+                spike_kept = np.nanmax(series["latency" if series["resolution"] == "raw" else "latency_max"]) >= SPIKE_LATENCY
+            raw_points, raw_s, extrapolated = raw_figure_seconds(columns, start_s, end_s, args.raw_limit)
+            rows.append((label, series, query_ms, scan_ms, np.median(renders) * 1000, max(points), payload_kb,
+                         spike_kept, raw_points, raw_s, extrapolated))
+
+    print(f"\n{'范围':<6} | {'范围内调用':>10} | {'分辨率':>8} | {'查询ms':>8} | {'扫描原始事件ms':>14} | {'渲染ms':>8} | "
+          f"{'单图最多点数':>10} | {'图表JSON KB':>11} | {'原始事件直接画图':>18}")
+    for label, series, query_ms, scan_ms, render_ms, points, payload_kb, _, raw_points, raw_s, extrapolated in rows:
+        resolution = "原始" if series["resolution"] == "raw" else f"{series['bucket_seconds']}s"
+        raw = f"{raw_points} 点 / {raw_s:.2f}s{'（外推）' if extrapolated else ''}"
+        print(f"{label:<8} | {series['events']:>15} | {resolution:>11} | {query_ms:>10.1f} | {scan_ms:>21.1f} | "
+              f"{render_ms:>10.1f} | {points:>16} | {payload_kb:>14.1f} | {raw:>20}")
+    for label, *rest in rows:
+        if rest[6] is not None:
+            print(f"\n{label}视图：3天前的1分钟尖峰（{SPIKE_LATENCY:g}s）{'保留在最大值曲线中' if rest[6] else '丢失'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# bench_dashboard_render.py - 数据面板渲染耗时基准（快照缓存前后对比）
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics_dashboard
+from metrics_dashboard import MetricsDashboard
+
+def generate_metrics_file(path, events=100000, days=30):
+    """生成包含 events 条API调用和会话记录的测试数据文件"""
+    now = datetime.now()
+    api_calls = []
+    sessions = []
+    daily_stats = {}
+    for i in range(events):
+        ts = now - timedelta(seconds=(days * 86400) * i / events)
+        success = i % 20 != 0
+        response_time = 1.0 + (i % 50) / 10
+        api_calls.append({
+            "timestamp": ts.isoformat(),
+            "success": success,
+            "response_time": response_time,
+            "user_input": "如何准备产品经理面试？",
+            "error_msg": None if success else "HTTP 500"
+        })
+        sessions.append({
+            "timestamp": ts.isoformat(),
+            "user_input": "如何准备产品经理面试？",
+            "response_preview": "作为职业规划师，我很乐意为您详细解析" * 5,
+            "session_duration": None
+        })
+        day = ts.strftime("%Y-%m-%d")
+        stats = daily_stats.setdefault(day, {"api_calls": 0, "successful_calls": 0, "failed_calls": 0,
+                                             "total_response_time": 0, "sessions": 0})
+        stats["api_calls"] += 1
+        stats["sessions"] += 1
+        if success:
+            stats["successful_calls"] += 1
+            stats["total_response_time"] += response_time
+        else:
+            stats["failed_calls"] += 1
+
+    successful = sum(s["successful_calls"] for s in daily_stats.values())
+    total_time = sum(s["total_response_time"] for s in daily_stats.values())
+    data = {
+        "api_calls": api_calls,
+        "sessions": sessions,
+        "user_feedback": [],
+        "performance_metrics": {
+            "total_api_calls": events,
+            "successful_calls": successful,
+            "failed_calls": events - successful,
+            "total_response_time": total_time,
+            "average_response_time": total_time / successful
+        },
+        "daily_stats": daily_stats
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def time_it(func, repeat=3):
+    """返回多次运行中最快的一次耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def render_app(data_file):
+    """Streamlit应用：渲染完整的数据面板"""
+    from metrics_dashboard import MetricsDashboard
+    MetricsDashboard(data_file).show_dashboard()
+
+def run(events=100000):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "metrics.json")
+        generate_metrics_file(data_file, events)
+        size_mb = os.path.getsize(data_file) / 1024 / 1024
+        dashboard = MetricsDashboard(data_file)
+
+        def legacy_aggregates():
+            # 旧实现：每个统计各自 load_data() 一次
+            data = dashboard.load_data()
+            dashboard.get_performance_metrics(data)
+            data = dashboard.load_data()
+            dashboard.get_recent_activity(24, data)
+            data = dashboard.load_data()
+            dashboard.get_daily_stats(7, data)
+
+        def snapshot_aggregates():
+            data = dashboard.load_snapshot()
+            dashboard.get_performance_metrics(data)
+            dashboard.get_recent_activity(24, data)
+            dashboard.get_daily_stats(7, data)
+
+        def cold_snapshot_aggregates():
+            metrics_dashboard._snapshot_cache.clear()
+            snapshot_aggregates()
+
+        results = {
+            "events": events,
+            "file_size_mb": round(size_mb, 1),
+            "legacy_3x_load_s": round(time_it(legacy_aggregates), 4),
+            "snapshot_cold_s": round(time_it(cold_snapshot_aggregates), 4),
+            "snapshot_warm_s": round(time_it(snapshot_aggregates), 4)
+        }
+
+        # 完整渲染（包含Plotly图表和Streamlit元素）
+        try:
+            from streamlit.testing.v1 import AppTest
+            app = AppTest.from_function(render_app, args=(data_file,), default_timeout=120)
+            metrics_dashboard._snapshot_cache.clear()
+            results["render_first_run_s"] = round(time_it(lambda: app.run(), repeat=1), 4)
+            results["render_rerun_s"] = round(time_it(lambda: app.run()), 4)
+        except ImportError:
+            print("⚠️ 当前Streamlit版本不支持AppTest，跳过完整渲染基准")
+
+        return results
+
+if __name__ == "__main__":
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(json.dumps(run(events), ensure_ascii=False, indent=2))
@@ -0,0 +1,60 @@
+# bench_export_memory.py - 导出峰值内存基准：一次性 json.dumps vs 流式导出
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_feedback_query import generate_feedback_file
+from bench_dashboard_render import generate_metrics_file
+from feedback_system import FeedbackSystem
+from metrics_dashboard import MetricsDashboard
+from data_exporter import export_to_file
+
+def measure(func):
+    """返回 (结果, 耗时秒, Python峰值内存MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+def run(sizes=(50000, 200000)):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            feedback_file = os.path.join(tmp, "feedback.json")
+            metrics_file = os.path.join(tmp, "metrics.json")
+            generate_feedback_file(feedback_file, size)
+            generate_metrics_file(metrics_file, size)
+            fs = FeedbackSystem(feedback_file)
+            fs.index.sync()
+            dashboard = MetricsDashboard(metrics_file)
+
+            def legacy_feedback_export():
+                # 旧实现：全部反馈拼成一个缩进JSON字符串
+                feedbacks = fs.get_all_feedbacks()
+                return len(json.dumps({"feedbacks": feedbacks}, ensure_ascii=False, indent=2))
+
+            row = {"records": size}
+            _, row["legacy_feedback_s"], row["legacy_feedback_peak_mb"] = measure(legacy_feedback_export)
+            for kind, kwargs in (("feedback", {"feedback_system": fs}), ("api_calls", {"metrics_dashboard": dashboard})):
+                for suffix in ("jsonl.gz", "csv"):
+                    path = os.path.join(tmp, f"{kind}.{suffix}")
+                    count, elapsed, peak = measure(lambda: export_to_file(kind, path, **kwargs))
+                    assert count == size, (kind, count)
+                    row[f"{kind}_{suffix}_s"] = round(elapsed, 2)
+                    row[f"{kind}_{suffix}_peak_mb"] = round(peak, 2)
+            row["legacy_feedback_s"] = round(row["legacy_feedback_s"], 2)
+            row["legacy_feedback_peak_mb"] = round(row["legacy_feedback_peak_mb"], 1)
+            results.append(row)
+    return results
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or [50000, 200000]
+    print(json.dumps(run(sizes), ensure_ascii=False, indent=2))
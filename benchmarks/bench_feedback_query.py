@@ -0,0 +1,102 @@
+# bench_feedback_query.py - 反馈详情翻页耗时基准：全量加载+Python筛选 vs SQLite索引查询
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feedback_system import FeedbackSystem
+import feedback_system as feedback_module
+
+TYPES = ["使用体验", "功能建议", "问题报告", "其他"]
+PHRASES = ["回答很详细", "请求超时了", "希望增加简历模板", "面试模拟很有帮助", "页面加载有点慢",
+           "薪资建议很实用", "希望支持语音输入", "回答太长了", "职业规划很清晰", "偶尔出现网络错误"]
+
+def generate_feedback_file(path, count):
+    """生成 count 条反馈记录"""
+    rng = random.Random(0)
+    now = datetime.now()
+    feedbacks = []
+    for i in range(count):
+        feedbacks.append({
+            "id": f"{i:08x}",
+            "timestamp": (now - timedelta(seconds=i * 7)).isoformat(),
+            "type": rng.choice(TYPES),
+            "rating": rng.randint(1, 5),
+            "content": "，".join(rng.sample(PHRASES, 3)),
+            "contact": ""
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"feedbacks": feedbacks, "summary": {}}, f, ensure_ascii=False, indent=2)
+
+def legacy_page(fs, search_term, filter_type, min_stars, page, per_page=10):
+    """旧实现：加载并排序全部反馈，Python循环筛选后切片"""
+    feedback_module._snapshot_cache.clear()
+    filtered = []
+    for fb in fs.get_all_feedbacks():
+        if search_term and search_term.lower() not in fb.get("content", "").lower():
+            continue
+        if filter_type and fb.get("type", "") != filter_type:
+            continue
+        if min_stars and fb.get("rating", 0) < min_stars:
+            continue
+        filtered.append(fb)
+    return filtered[(page - 1) * per_page:page * per_page]
+
+def indexed_page(fs, filters, page, per_page=10):
+    """新实现：沿游标翻到第 page 页（每次翻页只查询一页）"""
+    cursor = None
+    result = None
+    for _ in range(page):
+        result = fs.query_feedbacks(filters, cursor=cursor, limit=per_page)
+        cursor = result["next_cursor"]
+    return result["items"]
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def run(count=1000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "feedback.json")
+        generate_feedback_file(data_file, count)
+        fs = FeedbackSystem(data_file)
+
+        results = {"feedbacks": count}
+        _, build_s = timed(fs.index.rebuild)
+        results["index_build_s"] = round(build_s, 2)
+
+        cases = {
+            "no_filter": ({}, ("", None, None)),
+            "type_filter": ({"type": "问题报告"}, ("", "问题报告", None)),
+            "rating_filter": ({"min_rating": 5}, ("", None, 5)),
+            "keyword_fts": ({"keyword": "请求超时"}, ("请求超时", None, None)),
+            "keyword_short": ({"keyword": "超时"}, ("超时", None, None)),
+            "combined": ({"keyword": "请求超时", "type": "问题报告", "min_rating": 4}, ("请求超时", "问题报告", 4))
+        }
+        for name, (filters, legacy_args) in cases.items():
+            legacy_items, legacy_s = timed(lambda: legacy_page(fs, *legacy_args, page=1))
+            indexed_items, first_s = timed(lambda: indexed_page(fs, filters, page=1))
+            assert [fb["id"] for fb in legacy_items] == [fb["id"] for fb in indexed_items], name
+            # 单次翻页耗时：从第5页翻到第6页
+            cursor = None
+            for _ in range(5):
+                cursor = fs.query_feedbacks(filters, cursor=cursor, limit=10)["next_cursor"]
+            _, next_s = timed(lambda: fs.query_feedbacks(filters, cursor=cursor, limit=10))
+            _, count_s = timed(lambda: fs.count_feedbacks(filters))
+            results[name] = {
+                "legacy_page_ms": round(legacy_s * 1000, 1),
+                "indexed_first_page_ms": round(first_s * 1000, 2),
+                "indexed_next_page_ms": round(next_s * 1000, 2),
+                "indexed_count_ms": round(count_s * 1000, 2)
+            }
+        return results
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(json.dumps(run(count), ensure_ascii=False, indent=2))
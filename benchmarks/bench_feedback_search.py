@@ -0,0 +1,61 @@
+# bench_feedback_search.py - 反馈全文检索基准：中文二元组倒排索引的构建耗时、增量写入与查询延迟
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feedback_system import FeedbackSystem
+from bench_feedback_query import generate_feedback_file
+
+QUERIES = ["超时", "请求超时了", "简历模板", "面试", "慢", "网络错误", "希望增加语音", "薪资建议很实用"]
+
+def main():
+    parser = argparse.ArgumentParser(description="反馈全文检索基准")
+    parser.add_argument("--count", type=int, default=1_000_000, help="反馈条数 (默认100万)")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询重复次数")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data_file = os.path.join(tmp_dir, "feedback.json")
+        print(f"生成 {args.count} 条反馈...")
+        generate_feedback_file(data_file, args.count)
+        fs = FeedbackSystem(data_file)
+
+        start = time.perf_counter()
+        index = fs.get_search_index()
+        print(f"索引构建: {time.perf_counter() - start:.2f}s，{len(index.postings)} 个token")
+
+        print(f"\n{'查询':<12}{'命中首条得分':>12}{'p50(ms)':>10}{'max(ms)':>10}")
+        worst = 0.0
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = fs.search_feedbacks(query, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            worst = max(worst, timings[-1])
+            top = results[0]["score"] if results else 0
+            print(f"{query:<12}{top:>12}{timings[len(timings) // 2]:>10.1f}{timings[-1]:>10.1f}")
+
+        # 增量写入：submit_feedback 之后无需重建即可检索到新反馈
+        start = time.perf_counter()
+        fs.submit_feedback({"type": "问题报告", "rating": 2, "content": "导出报表时出现乱码"})
+        submit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        results = fs.search_feedbacks("报表乱码", limit=5)
+        query_time = (time.perf_counter() - start) * 1000
+        assert results and "乱码" in results[0]["feedback"]["content"]
+        assert fs.get_search_index() is index, "增量写入后不应重建索引"
+        print(f"\n增量写入后检索新反馈: {query_time:.1f}ms（submit_feedback {submit_time:.2f}s，含保存JSON）")
+        print(f"最慢查询: {worst:.1f}ms {'✅ <50ms' if worst < 50 else '⚠️ 超过50ms'}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench_few_shot.py - 按模式选择少样本示例 vs 固定放入两个示例：每个模式的输入token和延迟
+#
+# 每个对话模式取几条典型问题，分别用两种方式构建请求并发给mock服务（按输入token模拟预填充耗时），比较：
+#   - 请求的输入token数（mock按字符数估算，与 usage.prompt_tokens 一致）
+#   - 首个片段时间（TTFT）与完整响应时间
+#
+# 用法：
+#   python benchmarks/bench_few_shot.py
+#   python benchmarks/bench_few_shot.py --prefill-per-1k 0.5 --repeat 5
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+QUESTIONS = {
+    "resume": ["我是应届生，简历上没什么可写的，怎么办？", "我想优化我的简历"],
+    "interview": ["如何准备产品经理面试？", "面试时怎么介绍项目经验"],
+    "career": ["我做了三年行政，想转行，职业规划怎么做", "大学生未来发展方向怎么选"],
+    "skills": ["我应该学习什么技能？", "零基础想学数据分析，要学哪些课程"],
+    "salary": ["薪资谈判有什么技巧", "工作两年工资没涨，怎么谈"],
+    "general": ["我不知道自己适合做什么工作", "你好"]
+}
+
+def fixed_examples(state, user_input, profile_text=""):
+    """改造前：不论模式都放入职业倦怠、职业规划两个示例"""
+    from few_shot import load_examples
+    return load_examples("career")[:2]
+
+def measure(agent, question, repeat):
+    """返回 (输入token, TTFT中位数, 完整响应中位数)"""
+    messages = agent.prepare_messages(question)
+    ttft, total = [], []
+    for _ in range(repeat):
+        first = []
+        start = time.perf_counter()
+        agent.call_deepseek(messages, on_delta=lambda part: first or first.append(time.perf_counter() - start))
+        total.append(time.perf_counter() - start)
+        ttft.append(first[0])
+    return agent.last_usage["prompt_tokens"], statistics.median(ttft), statistics.median(total)
+
+def main():
+    parser = argparse.ArgumentParser(description="少样本示例选择基准（本地mock DeepSeek服务）")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.25, help="mock每1000个输入token增加的首token延迟（秒）")
+    parser.add_argument("--latency", default="fixed:0.1", help="mock基础延迟")
+    parser.add_argument("--repeat", type=int, default=3, help="每个问题重复次数（取中位数）")
+    args = parser.parse_args()
+
+    import career_agent
+    from career_agent import CareerAgent
+
+    cwd = os.getcwd()
+    rows = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockDeepSeekServer(latency=args.latency, token_interval=0.002, prefill_per_1k=args.prefill_per_1k) as server:
+        os.chdir(workdir)  # MetricsDashboard 写入临时目录
+        try:
+            agent = CareerAgent("mock-key")
+            agent.api_url = server.url
+            selector = career_agent.select_examples
+            for mode, select in (("fixed", fixed_examples), ("selected", selector)):
+                career_agent.select_examples = select
+                for state, questions in QUESTIONS.items():
+                    for question in questions:
+                        agent.clear_conversation()
+                        tokens, ttft, total = measure(agent, question, args.repeat)
+                        rows.setdefault(state, {}).setdefault(mode, []).append((tokens, ttft, total))
+            career_agent.select_examples = selector
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'模式':<10} | {'输入token 固定→选择':>18} | {'减少':>6} | {'TTFT ms 固定→选择':>18} | {'完整 ms 固定→选择':>18}")
+    all_fixed, all_selected = [], []
+    for state, modes in rows.items():
+        fixed, selected = modes["fixed"], modes["selected"]
+        all_fixed += fixed
+        all_selected += selected
+        f_tokens, s_tokens = statistics.mean(r[0] for r in fixed), statistics.mean(r[0] for r in selected)
+        print(f"{state:<10} | {f_tokens:>9.0f} → {s_tokens:<8.0f} | {1 - s_tokens / f_tokens:>6.0%} | "
+              f"{statistics.mean(r[1] for r in fixed) * 1000:>8.0f} → {statistics.mean(r[1] for r in selected) * 1000:<8.0f} | "
+              f"{statistics.mean(r[2] for r in fixed) * 1000:>8.0f} → {statistics.mean(r[2] for r in selected) * 1000:<8.0f}")
+    f_tokens, s_tokens = statistics.mean(r[0] for r in all_fixed), statistics.mean(r[0] for r in all_selected)
+    print(f"\n平均输入token {f_tokens:.0f} → {s_tokens:.0f}（减少 {1 - s_tokens / f_tokens:.0%}），"
+          f"TTFT {statistics.mean(r[1] for r in all_fixed) * 1000:.0f} → {statistics.mean(r[1] for r in all_selected) * 1000:.0f} ms"
+          f"（mock预填充 {args.prefill_per_1k}s/1k token）")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
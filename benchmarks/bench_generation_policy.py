@@ -0,0 +1,85 @@
+# bench_generation_policy.py - 生成策略表（按模式和输入长度限制输出）对输出token和延迟的影响
+#
+# mock服务返回一篇很长的四段式回答，并按请求的 max_tokens / stop 截断。同一组问题分别用
+# 固定参数（temperature 0.7、不限长度，即改造前）和策略表各跑一遍，调用记录写入临时的指标文件，
+# 最后用 MetricsDashboard.get_policy_stats 按策略统计输出token和延迟。
+#
+# 用法：
+#   python benchmarks/bench_generation_policy.py
+#   python benchmarks/bench_generation_policy.py --token-interval 0.02 --repeat 3
+import argparse
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+QUESTIONS = ["你好", "谢谢", "在吗", "我不知道自己适合做什么工作，毕业一年换了两份工作都不满意",
+             "我想优化我的简历", "如何准备产品经理面试？", "面试时怎么介绍项目经验，我总是讲不清楚重点，面试官经常打断",
+             "我想转行做数据分析，职业规划怎么做", "我应该学习什么技能？", "薪资谈判有什么技巧"]
+
+def long_reply(section_chars=700):
+    """四段式长回答（每段约 section_chars 个字符）"""
+    sections = ["一.共情", "二.发展建议", "三.岗位难度", "四.行动方案"]
+    filler = "结合你的情况，这里给出具体、可执行的分析和建议。"
+    return "\n".join(f"**{title}**\n" + filler * (section_chars // len(filler)) for title in sections)
+
+def main():
+    parser = argparse.ArgumentParser(description="生成策略基准（本地mock DeepSeek服务）")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="mock每个片段（约4个token）的间隔（秒）")
+    parser.add_argument("--repeat", type=int, default=2, help="每个问题重复次数")
+    args = parser.parse_args()
+
+    import career_agent
+    from career_agent import CareerAgent
+    from generation_policy import DEFAULT_POLICY
+    from metrics_dashboard import MetricsDashboard
+
+    selector = career_agent.select_policy
+
+    def fixed_policy(state, user_input, path=None):
+        # 改造前的参数，名称带上策略表本会选择的策略，便于逐项对比
+        return dict(DEFAULT_POLICY, name=f"fixed:{selector(state, user_input, path)['name']}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockDeepSeekServer(latency="fixed:0.1", token_interval=args.token_interval, reply=long_reply()) as server:
+        os.chdir(workdir)  # MetricsDashboard 写入临时目录
+        try:
+            agent = CareerAgent("mock-key")
+            agent.api_url = server.url
+            for select in (fixed_policy, selector):
+                career_agent.select_policy = select
+                for _ in range(args.repeat):
+                    for question in QUESTIONS:
+                        agent.clear_conversation()
+                        agent.passive_chat(question, on_delta=lambda part: None)
+            career_agent.select_policy = selector
+            stats = MetricsDashboard().get_policy_stats()
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'策略':<16} | {'调用':>4} | {'输出token 固定→策略':>20} | {'延迟均值ms 固定→策略':>20} | {'延迟p95 ms 固定→策略':>20}")
+    totals = {"fixed": [0, 0.0], "policy": [0, 0.0]}
+    for name, s in stats.items():
+        if name.startswith("fixed:"):
+            continue
+        f = stats[f"fixed:{name}"]
+        totals["fixed"][0] += f["avg_output_tokens"] * f["calls"]
+        totals["fixed"][1] += f["avg_latency"] * f["calls"]
+        totals["policy"][0] += s["avg_output_tokens"] * s["calls"]
+        totals["policy"][1] += s["avg_latency"] * s["calls"]
+        print(f"{name:<18} | {s['calls']:>6} | {f['avg_output_tokens']:>10.0f} → {s['avg_output_tokens']:<10.0f} | "
+              f"{f['avg_latency'] * 1000:>10.0f} → {s['avg_latency'] * 1000:<10.0f} | "
+              f"{f['p95_latency'] * 1000:>10.0f} → {s['p95_latency'] * 1000:<10.0f}")
+    calls = sum(s["calls"] for name, s in stats.items() if not name.startswith("fixed:"))
+    print(f"\n全部 {calls} 次调用：平均输出token {totals['fixed'][0] / calls:.0f} → {totals['policy'][0] / calls:.0f}，"
+          f"平均延迟 {totals['fixed'][1] / calls * 1000:.0f} → {totals['policy'][1] / calls * 1000:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# bench_hedging.py - 对冲请求对尾延迟的改善和额外开销
+#
+# mock服务的首字节延迟取长尾的对数正态分布，同一组请求分别在不对冲和对冲模式下发送，比较：
+#   - 首个片段时间（TTFT）和完整响应时间的 p50 / p95 / p99
+#   - 上游实际收到的请求数（对冲的额外开销）、对冲请求的胜出比例
+#
+# 用法：
+#   python benchmarks/bench_hedging.py
+#   python benchmarks/bench_hedging.py --requests 600 --latency lognormal:0.3,0.8 --max-rate 0.05
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+def run(server, hedger, requests, concurrency):
+    """并发发送 requests 个互不相同的流式请求，返回 (TTFT列表, 完整耗时列表, 上游请求数)"""
+    from career_agent import CareerAgent
+
+    ttft, total = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    upstream_before = server.stats["requests"]
+
+    def worker():
+        agent = CareerAgent("mock-key")
+        agent.api_url = server.url
+        agent.hedger = hedger
+        for index in counter:
+            first = []
+            start = time.perf_counter()
+            agent.call_deepseek(
+                [{"role": "user", "content": f"第{index}个问题：如何准备面试？"}],
+                on_delta=lambda part: first or first.append(time.perf_counter() - start)
+            )
+            with lock:
+                total.append(time.perf_counter() - start)
+                if first:
+                    ttft.append(first[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return ttft, total, server.stats["requests"] - upstream_before
+
+def main():
+    parser = argparse.ArgumentParser(description="对冲请求基准（本地mock DeepSeek服务）")
+    parser.add_argument("--requests", type=int, default=400, help="每种模式的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数")
+    parser.add_argument("--latency", default="lognormal:0.3,0.8", help="mock首字节延迟分布（长尾）")
+    parser.add_argument("--quantile", type=float, default=95, help="对冲阈值分位数")
+    parser.add_argument("--max-rate", type=float, default=0.1, help="对冲比例上限")
+    parser.add_argument("--min-delay", type=float, default=0.2, help="对冲阈值下限（秒）")
+    args = parser.parse_args()
+
+    from hedging import Hedger
+
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockDeepSeekServer(latency=args.latency, token_interval=0.001, seed=1) as server:
+        os.chdir(workdir)  # MetricsDashboard 写入临时目录
+        try:
+            results["不对冲"] = run(server, None, args.requests, args.concurrency) + (None,)
+            hedger = Hedger(quantile=args.quantile, max_rate=args.max_rate, min_delay=args.min_delay)
+            results["对冲"] = run(server, hedger, args.requests, args.concurrency) + (hedger.get_stats(),)
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'模式':<6} | {'TTFT p50':>9} | {'TTFT p95':>9} | {'TTFT p99':>9} | {'完整 p99':>9} | {'上游请求':>8} | {'额外开销':>8}")
+    for name, (ttft, total, upstream, stats) in results.items():
+        p50, p95, p99 = np.percentile(np.array(ttft) * 1000, [50, 95, 99])
+        print(f"{name:<6} | {p50:>9.0f} | {p95:>9.0f} | {p99:>9.0f} | {np.percentile(total, 99) * 1000:>9.0f} | "
+              f"{upstream:>10} | {upstream / len(total) - 1:>10.1%}")
+    stats = results["对冲"][3]
+    print(f"\n对冲 {stats['hedged']} 次（{stats['hedge_rate']:.1%}），其中对冲请求先响应 {stats['hedge_won']} 次；"
+          f"因比例上限跳过 {stats['rate_limited']} 次；当前阈值 {stats['threshold'] or 0:.3f}s（p{args.quantile:g}）")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
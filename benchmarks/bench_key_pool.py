@@ -0,0 +1,95 @@
+# bench_key_pool.py - API密钥池：多个密钥分摊请求后的吞吐量、429次数和失效密钥摘除
+#
+# mock服务按密钥限流（每个密钥每秒最多 --key-rps 个请求，超出返回429和 Retry-After），
+# 同样的并发负载分别用1个密钥和 --keys 个密钥发送，比较：
+#   - 成功请求数、成功吞吐量（条/秒）、返回给用户的失败数
+#   - 上游收到的429次数、各密钥分到的请求数
+# 最后一组在密钥池中混入一个无效密钥（mock返回401），检查它被摘除且不影响用户请求。
+#
+# 用法：
+#   python benchmarks/bench_key_pool.py
+#   python benchmarks/bench_key_pool.py --keys 4 --key-rps 5 --requests 300 --concurrency 16
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+def run(server, pool, requests, concurrency):
+    """并发发送 requests 个互不相同的流式请求，返回 (成功数, 失败数, 耗时)"""
+    from career_agent import CareerAgent
+
+    results = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        agent = CareerAgent(key_pool=pool)
+        agent.api_url = server.url
+        for index in counter:
+            agent.call_deepseek([{"role": "user", "content": f"第{index}个问题：如何准备面试？"}],
+                                on_delta=lambda part: None)
+            with lock:
+                results.append(agent.last_error is None)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(results), len(results) - sum(results), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="API密钥池基准（本地mock DeepSeek服务）")
+    parser.add_argument("--keys", type=int, default=3, help="密钥池中的密钥数")
+    parser.add_argument("--key-rps", type=int, default=5, help="mock对每个密钥的限流（请求/秒）")
+    parser.add_argument("--requests", type=int, default=200, help="每组请求数")
+    parser.add_argument("--concurrency", type=int, default=12, help="并发线程数")
+    parser.add_argument("--latency", default="fixed:0.2", help="mock首字节延迟分布")
+    args = parser.parse_args()
+
+    from key_pool import KeyPool
+
+    keys = [f"sk-bench-{index:04d}" for index in range(args.keys)]
+    scenarios = [
+        ("单个密钥", KeyPool(keys[:1], cooldown=1)),
+        (f"{args.keys}个密钥", KeyPool(keys, cooldown=1)),
+        (f"{args.keys}个密钥+1个失效", KeyPool(keys + ["sk-bench-revoked"], cooldown=1))
+    ]
+
+    cwd = os.getcwd()
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockDeepSeekServer(latency=args.latency, token_interval=0.001, key_rps=args.key_rps,
+                               bad_keys={"sk-bench-revoked"}) as server:
+        os.chdir(workdir)  # MetricsDashboard 写入临时目录
+        try:
+            for name, pool in scenarios:
+                before = dict(server.stats)
+                server.key_requests.clear()
+                ok, failed, elapsed = run(server, pool, args.requests, args.concurrency)
+                rows.append((name, ok, failed, elapsed, server.stats["rate_limited"] - before["rate_limited"],
+                             server.stats["unauthorized"] - before["unauthorized"], pool.get_stats()))
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'场景':<14} | {'成功':>5} | {'失败':>5} | {'成功吞吐 条/秒':>12} | {'上游429':>7} | {'上游401':>7}")
+    for name, ok, failed, elapsed, limited, unauthorized, _ in rows:
+        print(f"{name:<16} | {ok:>7} | {failed:>7} | {ok / elapsed:>17.1f} | {limited:>9} | {unauthorized:>9}")
+    for name, *_, stats in rows:
+        print(f"\n{name}：")
+        for key in stats:
+            print(f"  {key['key']:<10} {key['status']:<9} 在途上限 {key['limit']:>4}，请求 {key['requests']:>4}，"
+                  f"成功 {key['successes']:>4}，429 {key['rate_limited']:>4}，失败 {key['failures']:>2}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
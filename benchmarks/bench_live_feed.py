@@ -0,0 +1,56 @@
+# bench_live_feed.py - 实时监控刷新耗时基准：重新加载 metrics.json vs 按游标增量读取实时事件日志
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_dashboard import MetricsDashboard
+from live_metrics import LiveMetricsFeed, publish_event
+from bench_dashboard_render import generate_metrics_file
+
+def main():
+    parser = argparse.ArgumentParser(description="实时监控刷新耗时基准")
+    parser.add_argument("--events", type=int, default=100000, help="metrics.json 中的事件数")
+    parser.add_argument("--rate", type=int, default=50, help="每次刷新间隔内新增的事件数")
+    parser.add_argument("--ticks", type=int, default=20, help="刷新次数")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data_file = os.path.join(tmp_dir, "metrics.json")
+        generate_metrics_file(data_file, events=args.events)
+        dashboard = MetricsDashboard(data_file)
+        feed = LiveMetricsFeed(dashboard.live_log_file)
+
+        reload_times = []
+        poll_times = []
+        for tick in range(args.ticks):
+            for i in range(args.rate):
+                publish_event(dashboard.live_log_file, "api_call", i % 10 != 0, 0.5 + i / 100)
+
+            # 旧方式：点击刷新后重新解析整个 metrics.json
+            start = time.perf_counter()
+            dashboard.load_data()
+            reload_times.append(time.perf_counter() - start)
+
+            # 新方式：只读取新增行并更新逐秒统计
+            start = time.perf_counter()
+            feed.poll()
+            feed.per_second(120)
+            poll_times.append(time.perf_counter() - start)
+
+        reload_ms = sum(reload_times) / len(reload_times) * 1000
+        poll_ms = sum(poll_times) / len(poll_times) * 1000
+        print(f"metrics.json {args.events} 条事件，每次刷新新增 {args.rate} 条，共 {args.ticks} 次刷新")
+        print(f"重新加载 metrics.json: {reload_ms:.1f}ms/次")
+        print(f"增量读取 + 逐秒统计:   {poll_ms:.2f}ms/次（缓冲区 {len(feed.events)} 条）")
+        print(f"加速: {reload_ms / poll_ms:.0f}x")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# bench_metering.py - 用量计量与预算：滥用会话被降级/拦截后的花费，以及计量本身的开销
+#
+# 一个"滥用"会话连续发送大量长问题，若干正常会话各问几次。使用临时的计量配置，比较：
+#   - 不限预算时和启用预算时，每个会话的上游调用数、降级/拦截次数、平均输出token和花费
+#   - 全局当日软预算触发后，之后的所有会话都被降级（降级后花费增长变慢，达到硬预算后只用缓存回答）
+#   - Meter.check / Meter.charge 每次调用的耗时
+#
+# 用法：
+#   python benchmarks/bench_metering.py
+#   python benchmarks/bench_metering.py --abusive-turns 100 --session-soft 0.02 --session-hard 0.04
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from bench_generation_policy import long_reply
+from mock_deepseek import MockDeepSeekServer
+
+def write_config(path, session_soft, session_hard, daily_soft, daily_hard):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "currency": "CNY",
+            "prices": {"deepseek-chat": {"input_cache_hit": 0.5, "input_cache_miss": 2.0, "output": 8.0}},
+            "budgets": {"session": {"soft": session_soft, "hard": session_hard},
+                        "daily": {"soft": daily_soft, "hard": daily_hard}},
+            "degraded_max_tokens": 200
+        }, f)
+    # 修改时间精度不够时配置可能不被重新读取
+    os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+def run_sessions(server, meter, workdir, abusive_turns, normal_sessions, normal_turns):
+    """在新的数据目录中依次运行各会话，返回 {会话名: {"upstream", "blocked", "output_tokens", "cost"}}"""
+    from career_agent import CareerAgent
+
+    # 每个场景单独的 metrics.json，全局当日用量不受上一个场景影响
+    os.chdir(tempfile.mkdtemp(dir=workdir))
+
+    results = {}
+    plan = [("滥用会话", abusive_turns)] + [(f"正常会话{i + 1}", normal_turns) for i in range(normal_sessions)]
+    for name, turns in plan:
+        agent = CareerAgent("mock-key")
+        agent.api_url = server.url
+        agent.meter = meter
+        blocked, outputs = 0, []
+        for turn in range(turns):
+            agent.clear_conversation()
+            agent.passive_chat(f"第{turn}次：我想转行做数据分析，请详细说说职业规划怎么做、需要学哪些技能")
+            if (agent.last_error or "").startswith("budget_exceeded"):
+                blocked += 1
+            elif agent.last_usage:
+                outputs.append(agent.last_usage["completion_tokens"])
+        totals = meter.get_session(agent.session_id)
+        results[name] = {"upstream": totals["calls"], "blocked": blocked, "cost": totals["cost"],
+                         "output_tokens": sum(outputs) / len(outputs) if outputs else 0}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="用量计量与预算基准（本地mock DeepSeek服务）")
+    parser.add_argument("--abusive-turns", type=int, default=60, help="滥用会话的提问次数")
+    parser.add_argument("--normal-sessions", type=int, default=5, help="正常会话数")
+    parser.add_argument("--normal-turns", type=int, default=5, help="每个正常会话的提问次数")
+    parser.add_argument("--session-soft", type=float, default=0.08, help="会话软预算（CNY）")
+    parser.add_argument("--session-hard", type=float, default=0.12, help="会话硬预算（CNY）")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockDeepSeekServer(latency="fixed:0.01", token_interval=0, reply=long_reply()) as server:
+        config_file = os.path.join(workdir, "metering.json")
+        os.environ["METERING_FILE"] = config_file
+        try:
+            from metering import Meter
+
+            scenarios = {}
+            write_config(config_file, None, None, None, None)
+            sessions = (args.abusive_turns, args.normal_sessions, args.normal_turns)
+            scenarios["不限预算"] = run_sessions(server, Meter(), workdir, *sessions)
+            write_config(config_file, args.session_soft, args.session_hard, None, None)
+            scenarios["会话预算"] = run_sessions(server, Meter(), workdir, *sessions)
+            # 全局当日预算：软/硬预算为不限预算时总花费的20%/30%
+            total = sum(s["cost"] for s in scenarios["不限预算"].values())
+            write_config(config_file, args.session_soft, args.session_hard, total * 0.2, total * 0.3)
+            scenarios["会话+全局预算"] = run_sessions(server, Meter(), workdir, *sessions)
+
+            os.chdir(workdir)  # MetricsDashboard 写入临时目录
+            meter = Meter()
+            usage = {"prompt_tokens": 1200, "completion_tokens": 800, "prompt_cache_hit_tokens": 600}
+            start = time.perf_counter()
+            for i in range(20000):
+                meter.charge(f"s{i % 500}", usage)
+            charge_us = (time.perf_counter() - start) / 20000 * 1e6
+            start = time.perf_counter()
+            for i in range(20000):
+                meter.check(f"s{i % 500}")
+            check_us = (time.perf_counter() - start) / 20000 * 1e6
+        finally:
+            os.chdir(cwd)
+
+    for scenario, results in scenarios.items():
+        total = sum(s["cost"] for s in results.values())
+        print(f"\n[{scenario}] 总花费 {total:.4f} CNY")
+        print(f"{'会话':<10} | {'上游调用':>8} | {'拦截':>4} | {'平均输出token':>12} | {'花费 CNY':>9}")
+        for name, s in results.items():
+            print(f"{name:<12} | {s['upstream']:>12} | {s['blocked']:>6} | {s['output_tokens']:>18.0f} | {s['cost']:>10.4f}")
+    print(f"\n计量开销：charge {charge_us:.1f} µs/次，check {check_us:.1f} µs/次")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# bench_metrics_aggregation.py - 统计计算基准：逐条Python实现 vs 列式向量化实现
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_dashboard import EventColumns
+
+def generate_data(events=1000000, days=30):
+    """在内存中生成 events 条API调用和会话记录"""
+    now = datetime.now()
+    api_calls = []
+    sessions = []
+    daily_stats = {}
+    for i in range(events):
+        ts = now - timedelta(seconds=(days * 86400) * i / events)
+        timestamp = ts.isoformat()
+        success = i % 20 != 0
+        response_time = 1.0 + (i % 50) / 10
+        api_calls.append({"timestamp": timestamp, "success": success,
+                          "response_time": response_time if success else None})
+        sessions.append({"timestamp": timestamp})
+        day = ts.strftime("%Y-%m-%d")
+        stats = daily_stats.setdefault(day, {"api_calls": 0, "successful_calls": 0, "failed_calls": 0,
+                                             "total_response_time": 0, "sessions": 0})
+        stats["api_calls"] += 1
+        stats["sessions"] += 1
+        if success:
+            stats["successful_calls"] += 1
+            stats["total_response_time"] += response_time
+        else:
+            stats["failed_calls"] += 1
+    return {"api_calls": api_calls, "sessions": sessions, "daily_stats": daily_stats}
+
+def legacy_recent_activity(data, now, hours=24):
+    """旧实现：逐条 datetime.fromisoformat"""
+    cutoff_time = now - timedelta(hours=hours)
+    recent_api_calls = [c for c in data["api_calls"] if datetime.fromisoformat(c["timestamp"]) > cutoff_time]
+    recent_sessions = [s for s in data["sessions"] if datetime.fromisoformat(s["timestamp"]) > cutoff_time]
+    recent_api_count = len(recent_api_calls)
+    recent_success_count = len([c for c in recent_api_calls if c.get("success", False)])
+    return {
+        "recent_api_calls": recent_api_count,
+        "recent_sessions": len(recent_sessions),
+        "recent_success_rate": (recent_success_count / recent_api_count * 100) if recent_api_count > 0 else 0
+    }
+
+def legacy_daily_stats(data, now, days=7):
+    """旧实现：逐天遍历 daily_stats 并 insert(0, ...)"""
+    dates, api_calls, success_rates, avg_response_times, sessions = [], [], [], [], []
+    for i in range(days):
+        date = (now - timedelta(days=i)).strftime("%Y-%m-%d")
+        dates.insert(0, date)
+        stats = data["daily_stats"].get(date, {})
+        total_calls = stats.get("api_calls", 0)
+        successful = stats.get("successful_calls", 0)
+        api_calls.insert(0, total_calls)
+        success_rates.insert(0, (successful / total_calls * 100) if total_calls > 0 else 0)
+        avg_response_times.insert(0, (stats.get("total_response_time", 0) / successful) if successful > 0 else 0)
+        sessions.insert(0, stats.get("sessions", 0))
+    return {'dates': dates, 'api_calls': api_calls, 'success_rates': success_rates,
+            'avg_response_times': avg_response_times, 'sessions': sessions}
+
+def legacy_percentiles(data):
+    """旧实现中没有分位数，这里用纯Python排序作为对照"""
+    latencies = sorted(c["response_time"] for c in data["api_calls"] if c["success"] and c["response_time"])
+    return {p: latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+            for p, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def run(events=1000000):
+    data = generate_data(events)
+    # 固定“当前时间”，保证两种实现的时间窗口一致
+    now = datetime.now()
+
+    def legacy():
+        return legacy_recent_activity(data, now), legacy_daily_stats(data, now), legacy_percentiles(data)
+
+    (legacy_recent, legacy_daily, _), legacy_s = timed(legacy)
+    columns, build_s = timed(lambda: EventColumns.from_data(data))
+    aggregates, aggregate_s = timed(lambda: columns.aggregate(hours=24, days=7, now=now))
+
+    # 结果一致性检查
+    assert aggregates["recent"]["recent_api_calls"] == legacy_recent["recent_api_calls"]
+    assert aggregates["recent"]["recent_sessions"] == legacy_recent["recent_sessions"]
+    assert aggregates["daily"]["dates"] == legacy_daily["dates"]
+    assert aggregates["daily"]["api_calls"] == legacy_daily["api_calls"]
+    assert aggregates["daily"]["sessions"] == legacy_daily["sessions"]
+
+    return {
+        "events": events,
+        "legacy_python_s": round(legacy_s, 4),
+        "columns_build_s": round(build_s, 4),
+        "vectorized_aggregate_s": round(aggregate_s, 4),
+        "speedup_aggregate_only": round(legacy_s / aggregate_s, 1),
+        "speedup_including_build": round(legacy_s / (build_s + aggregate_s), 1)
+    }
+
+if __name__ == "__main__":
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(json.dumps(run(events), ensure_ascii=False, indent=2))
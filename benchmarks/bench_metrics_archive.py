@@ -0,0 +1,92 @@
+# bench_metrics_archive.py - 历史指标存储基准：JSON vs 按天分区的 .npy 列式归档
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_dashboard import EventColumns, SECONDS_PER_DAY, to_epoch_seconds
+from metrics_archive import MetricsArchive, day_to_str
+
+def generate_columns(events, days=90):
+    """生成 events 条均匀分布在最近 days 天内的事件"""
+    now_s = to_epoch_seconds(datetime.now())
+    api_ts = np.sort(now_s - np.random.default_rng(0).uniform(0, days * SECONDS_PER_DAY, events))
+    api_success = np.arange(events) % 20 != 0
+    api_latency = np.where(api_success, 1.0 + (np.arange(events) % 50) / 10, np.nan)
+    return EventColumns(api_ts, api_success, api_latency, api_ts.copy())
+
+def write_json(path, columns):
+    """按 MetricsDashboard.save_data 的格式写入JSON（仅包含事件列表）"""
+    timestamps = columns.api_ts.astype("datetime64[s]").astype(str)
+    api_calls = [
+        {"timestamp": ts, "success": bool(ok), "response_time": None if np.isnan(lat) else float(lat),
+         "user_input": None, "error_msg": None if ok else "HTTP 500"}
+        for ts, ok, lat in zip(timestamps, columns.api_success, columns.api_latency)
+    ]
+    sessions = [{"timestamp": ts, "user_input": None, "response_preview": None, "session_duration": None}
+                for ts in timestamps]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"api_calls": api_calls, "sessions": sessions}, f, ensure_ascii=False, indent=2)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def run(events, json_events):
+    tmp = tempfile.mkdtemp()
+    try:
+        results = {"events": events}
+        archive = MetricsArchive(os.path.join(tmp, "archive"))
+        columns = generate_columns(events)
+        _, results["archive_write_s"] = timed(lambda: archive.append(columns))
+        results["archive_size_mb"] = round(archive.get_size() / 1024 / 1024, 1)
+        results["archive_partitions"] = len(archive.list_days())
+
+        # 全量扫描：打开全部分区并计算统计
+        days = archive.list_days()
+        _, results["archive_full_scan_s"] = timed(
+            lambda: archive.load_range(days[0], days[-1]).aggregate(hours=24, days=len(days)))
+
+        # 范围查询：只映射最近7天的分区
+        end_day = days[-1]
+        start_day = day_to_str(np.datetime64(end_day, "D").astype(np.int64) - 6)
+        _, results["archive_7day_query_s"] = timed(
+            lambda: archive.load_range(start_day, end_day).aggregate(hours=24, days=7))
+
+        # JSON对照（JSON需要整体读入内存，事件数可单独指定）
+        json_columns = generate_columns(json_events)
+        json_path = os.path.join(tmp, "metrics.json")
+        write_json(json_path, json_columns)
+        json_size_mb = os.path.getsize(json_path) / 1024 / 1024
+        _, json_scan_s = timed(
+            lambda: EventColumns.from_data(json.load(open(json_path, encoding="utf-8"))).aggregate(hours=24, days=90))
+
+        scale = events / json_events
+        results["json_events_measured"] = json_events
+        results["json_size_mb"] = round(json_size_mb * scale, 1)
+        results["json_full_scan_s"] = round(json_scan_s * scale, 3)
+        results["json_extrapolated"] = json_events != events
+        results["size_ratio"] = round(results["json_size_mb"] / results["archive_size_mb"], 1)
+        results["full_scan_speedup"] = round(results["json_full_scan_s"] / results["archive_full_scan_s"], 1)
+        for key in ("archive_write_s", "archive_full_scan_s", "archive_7day_query_s"):
+            results[key] = round(results[key], 4)
+        return results
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON vs 列式归档 存储与扫描基准")
+    parser.add_argument("--events", type=int, default=10000000)
+    parser.add_argument("--json-events", type=int, default=None,
+                        help="JSON对照使用的事件数（默认与--events相同；内存不足时可调小，结果按比例外推）")
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, args.json_events or args.events), ensure_ascii=False, indent=2))
@@ -0,0 +1,151 @@
+# bench_profile_prompt.py - 用户画像提取对每轮提示词大小的影响（原始整句画像 vs 规范化紧凑画像）
+#
+# 按脚本回放几段多轮对话，每轮分别用两种画像构建请求消息，比较：
+#   - 系统提示中画像部分的token数、整轮请求的token数（与mock服务/usage相同的估算方式）
+#   - 画像字段覆盖率（标注的期望字段是否被提取出来）、单条消息的提取耗时
+#
+# 用法：
+#   python benchmarks/bench_profile_prompt.py
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import DEFAULT_REPLY
+
+# 每段对话为 [(用户消息, 期望提取的字段)]
+CONVERSATIONS = [
+    [
+        ("我今年28岁，本科毕业后在一家制造企业做了5年的行政工作，每天处理大量的报表和会议安排，感觉没什么成长空间",
+         {"age": 28, "degree": "本科", "years": 5}),
+        ("我学的是统计学专业，大学时用过SPSS和Excel做过一些分析，最近在自学Python和SQL",
+         {"major": "数学/统计", "skills": ["统计分析", "Excel", "Python", "SQL"]}),
+        ("我想转行做数据分析，但是担心年龄太大了，而且没有相关的项目经验，不知道公司会不会要我",
+         {"target_role": "数据分析师"}),
+        ("我应该先学什么技能？", {}),
+        ("薪资谈判有什么技巧", {})
+    ],
+    [
+        ("我是计算机科学的本科学生，现在大三，目前我很迷茫，不知道未来干什么，身边的同学有的考研有的实习",
+         {"degree": "本科", "major": "计算机"}),
+        ("我会Java和一点Vue，做过一个图书管理系统的课程设计，也参加过学校的编程比赛拿了二等奖",
+         {"skills": ["Java", "前端框架"]}),
+        ("我希望毕业后能去大厂做后端开发，需要提前准备些什么？", {"target_role": "后端工程师"}),
+        ("如何准备面试？", {}),
+        ("简历上项目经验应该怎么写，我的项目都比较简单", {})
+    ],
+    [
+        ("我做了5年的软件测试工程师，感觉这份工作重复性太高，每天都很疲惫，对技术也提不起以前的热情了。我该怎么办？",
+         {"years": 5}),
+        ("我熟悉自动化测试，会写Python脚本，也懂一些Linux和MySQL，平时和产品经理沟通比较多",
+         {"skills": ["软件测试", "Python", "Linux", "SQL", "沟通"]}),
+        ("我打算转型做产品经理，今年31岁了，硕士学历，这个年龄转行还来得及吗",
+         {"target_role": "产品经理", "age": 31, "degree": "硕士"}),
+        ("产品经理面试一般会问什么问题？", {"target_role": "产品经理"}),
+        ("需要", {})
+    ]
+]
+
+def legacy_update_profile(profile, user_input):
+    """改造前的画像更新：整句原文作为字段值，每条消息最多填一个字段"""
+    if any(word in user_input for word in ["我今年", "年龄", "岁"]):
+        profile["age"] = user_input
+    elif any(word in user_input for word in ["我学", "学历", "专业", "毕业"]):
+        profile["education"] = user_input
+    elif any(word in user_input for word in ["我工作", "经验", "从业", "在职"]):
+        profile["experience"] = user_input
+    elif any(word in user_input for word in ["我会", "技能", "擅长", "熟悉"]):
+        profile["skills"] = user_input
+    elif any(word in user_input for word in ["我想", "目标", "希望", "打算"]):
+        profile["goals"] = user_input
+
+def prompt_tokens(messages):
+    # 与 mock_deepseek 返回的 usage 相同：按字符数估算
+    return max(1, sum(len(m["content"]) for m in messages) // 2)
+
+def replay(agent, conversation, legacy):
+    """回放一段对话，返回每轮 (画像token, 请求token)"""
+    from tokens import estimate_tokens
+    from profile_extractor import format_profile
+
+    agent.clear_conversation()
+    rows = []
+    for user_input, _ in conversation:
+        agent.detect_state(user_input)
+        if legacy:
+            legacy_update_profile(agent.user_profile, user_input)
+            profile_text = json.dumps(agent.user_profile, ensure_ascii=False)
+        else:
+            agent.update_profile_from_input(user_input)
+            profile_text = format_profile(agent.user_profile)
+        messages = agent._build_messages(agent.current_state, user_input)
+        if legacy:
+            # 新版 _build_messages 已使用紧凑画像，这里换回原始JSON，其余内容保持一致
+            system = messages[0]["content"].replace(f"用户主动提供的信息：{format_profile(agent.user_profile)}",
+                                                    f"用户主动提供的信息：{profile_text}")
+            messages[0] = {"role": "system", "content": system}
+        rows.append((estimate_tokens(profile_text), prompt_tokens(messages)))
+        agent.conversation_history += [{"role": "user", "content": user_input},
+                                       {"role": "assistant", "content": DEFAULT_REPLY}]
+        agent.conversation_history = agent.conversation_history[-8:]
+    return rows
+
+def field_coverage():
+    """标注字段的提取覆盖率"""
+    from profile_extractor import extract_profile
+
+    expected = found = 0
+    for conversation in CONVERSATIONS:
+        for user_input, fields in conversation:
+            extracted = extract_profile(user_input)
+            for key, value in fields.items():
+                if key == "skills":
+                    expected += len(value)
+                    found += len(set(value) & set(extracted.get("skills", [])))
+                else:
+                    expected += 1
+                    found += extracted.get(key) == value
+    return found, expected
+
+def extraction_us(repeat):
+    from profile_extractor import extract_profile
+
+    texts = [user_input for conversation in CONVERSATIONS for user_input, _ in conversation]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            extract_profile(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="用户画像提取的提示词token基准")
+    parser.add_argument("--repeat", type=int, default=200, help="测量提取耗时的重复次数")
+    args = parser.parse_args()
+
+    from career_agent import CareerAgent
+    agent = CareerAgent("mock-key")
+
+    results = {"legacy": [], "compact": []}
+    for conversation in CONVERSATIONS:
+        results["legacy"] += replay(agent, conversation, legacy=True)
+        results["compact"] += replay(agent, conversation, legacy=False)
+
+    print(f"{'画像':<8} | {'画像token均值':>10} | {'画像token最大':>10} | {'请求token均值':>10}")
+    for name, rows in results.items():
+        print(f"{name:<10} | {statistics.mean(r[0] for r in rows):>14.1f} | {max(r[0] for r in rows):>14} | "
+              f"{statistics.mean(r[1] for r in rows):>14.1f}")
+    saved = statistics.mean(a[1] - b[1] for a, b in zip(results["legacy"], results["compact"]))
+    print(f"\n每轮平均节省 {saved:.1f} token（画像部分 "
+          f"{statistics.mean(r[0] for r in results['legacy']) - statistics.mean(r[0] for r in results['compact']):.1f}）")
+    found, expected = field_coverage()
+    print(f"字段覆盖率: {found}/{expected}（{found / expected:.0%}）  单条提取耗时: {extraction_us(args.repeat):.1f} µs")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# bench_slo.py - SLO燃烧率告警：短时故障的发现/解除时间，以及每个事件的评估开销
+#
+# 用模拟时钟生成事件流（不需要真的等待几个小时）：
+#   - 先积累 --history-days 天的正常流量（全量成功率，即面板原来的"系统健康状态"依据）
+#   - 再正常运行6小时后发生一次 --outage-minutes 分钟的故障（错误率 --outage-error-rate）
+#   - 恢复1小时后发生一次同样时长的延迟劣化（--slow-rate 的调用超过延迟阈值）
+# 输出每次告警触发/解除相对故障开始的时间，对比全量成功率在故障前后的变化；
+# 最后比较增量评估与每个事件重新扫描6小时窗口的耗时。
+#
+# 用法：
+#   python benchmarks/bench_slo.py
+#   python benchmarks/bench_slo.py --rps 5 --outage-minutes 30 --outage-error-rate 0.5
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+def main():
+    parser = argparse.ArgumentParser(description="SLO燃烧率告警基准（模拟时钟）")
+    parser.add_argument("--rps", type=float, default=2, help="每秒调用数")
+    parser.add_argument("--history-days", type=int, default=30, help="故障前的历史天数（只计入全量成功率）")
+    parser.add_argument("--outage-minutes", type=float, default=10, help="故障和延迟劣化的持续时间")
+    parser.add_argument("--outage-error-rate", type=float, default=1.0, help="故障期间的错误率")
+    parser.add_argument("--slow-rate", type=float, default=1.0, help="延迟劣化期间超过阈值的调用比例")
+    parser.add_argument("--base-error-rate", type=float, default=0.002, help="正常时的错误率")
+    args = parser.parse_args()
+
+    from slo import SLOEngine
+
+    rng = random.Random(0)
+    engine = SLOEngine(tick_seconds=0, save_interval=float("inf"))
+    step = 1 / args.rps
+    history_calls = int(args.history_days * 86400 * args.rps)
+    history_ok = history_calls - int(history_calls * args.base_error_rate)
+
+    t0 = 1_700_000_000.0
+    outage_start = t0 + 6 * 3600
+    outage_end = outage_start + args.outage_minutes * 60
+    slow_start = outage_end + 3600
+    slow_end = slow_start + args.outage_minutes * 60
+    end = slow_end + 3600
+
+    events = []
+    timeline = []
+    ts = t0
+    calls = ok = 0
+    before = None
+    record_seconds = 0.0
+    while ts < end:
+        error_rate = args.outage_error_rate if outage_start <= ts < outage_end else args.base_error_rate
+        success = rng.random() >= error_rate
+        slow = slow_start <= ts < slow_end and rng.random() < args.slow_rate
+        latency = engine.latency_threshold * rng.uniform(1.1, 2) if slow else rng.lognormvariate(np.log(2.0), 0.4)
+        start = time.perf_counter()
+        changes = engine.record(success, latency, ts)
+        record_seconds += time.perf_counter() - start
+        events.append((ts, success, latency))
+        calls += 1
+        ok += success
+        if before is None and ts >= outage_start:
+            before = (history_ok + ok) / (history_calls + calls) * 100
+        for alert in changes:
+            origin = outage_start if alert["slo"] == "availability" else slow_start
+            timeline.append((alert, (ts - origin) / 60))
+        ts += step
+    after = (history_ok + ok) / (history_calls + calls) * 100
+
+    print(f"\n故障：{args.outage_minutes:g} 分钟，错误率 {args.outage_error_rate:.0%}；"
+          f"延迟劣化：{args.outage_minutes:g} 分钟，{args.slow_rate:.0%} 的调用超过 {engine.latency_threshold:g}s")
+    print(f"全量成功率（面板原来的健康状态依据）：故障前 {before:.3f}% → 结束时 {after:.3f}%\n")
+    print(f"{'SLO':<12} | {'级别':<8} | {'状态':<8} | {'相对开始(分钟)':>14} | 燃烧率")
+    for alert, minutes in timeline:
+        print(f"{alert['slo']:<12} | {alert['severity']:<10} | {alert['status']:<10} | {minutes:>18.1f} | {alert['burn_rates']}")
+
+    # 对照：每个事件都重新扫描6小时窗口内的全部事件
+    window_events = int(6 * 3600 * args.rps)
+    ts_array = np.array([e[0] for e in events])
+    failed = np.array([not e[1] for e in events])
+    sample = range(window_events, len(events), max(1, (len(events) - window_events) // 200))
+    start = time.perf_counter()
+    for i in sample:
+        for length in (300, 3600, 21600):
+            lo = np.searchsorted(ts_array, ts_array[i] - length)
+            failed[lo:i + 1].mean()
+    rescan_us = (time.perf_counter() - start) / len(sample) * 1e6
+    start = time.perf_counter()
+    for i in sample:
+        for length in (300, 3600, 21600):
+            window = [e for e in events[i - window_events:i + 1] if e[0] > events[i][0] - length]
+            sum(not e[1] for e in window) / len(window)
+    rescan_py_us = (time.perf_counter() - start) / len(sample) * 1e6
+    print(f"\n每个事件的评估耗时：增量 {record_seconds / calls * 1e6:.1f} µs；"
+          f"重新扫描6小时窗口（{window_events} 个事件）NumPy {rescan_us:.1f} µs / 纯Python {rescan_py_us:.1f} µs")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# bench_suite.py - 可复现的端到端基准套件（本地mock DeepSeek服务，JSON结果 + 与基线比较）
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+
+QUESTIONS = ["我想优化我的简历", "如何准备产品经理面试？", "我今年28岁，想转行做数据分析", "我应该学习什么技能？",
+             "薪资谈判有什么技巧", "我学的是计算机专业，毕业两年了", "我想做产品经理", "面试时怎么介绍项目经验"]
+
+# 各模式的规模参数
+SIZES = {
+    "quick": {"turns": 20, "sessions": 3, "session_turns": 6, "threads": 4, "thread_turns": 5,
+              "storage_sizes": [1000, 10000], "render_events": 5000},
+    "full": {"turns": 50, "sessions": 5, "session_turns": 10, "threads": 8, "thread_turns": 10,
+             "storage_sizes": [1000, 10000, 50000], "render_events": 20000}
+}
+
+def metric(value, unit, better="lower"):
+    return {"value": round(float(value), 3), "unit": unit, "better": better}
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+def new_agent(server):
+    from career_agent import CareerAgent
+    agent = CareerAgent("mock-key")
+    agent.api_url = server.url
+    return agent
+
+# ========== 场景 ==========
+
+def scenario_single_turn(server, size):
+    """单轮对话：passive_chat 端到端延迟，及扣除mock延迟后的本地开销"""
+    server.configure(latency="fixed:0.05", error_rate=0.0)
+    timings = []
+    for i in range(size["turns"]):
+        agent = new_agent(server)
+        start = time.perf_counter()
+        agent.passive_chat(QUESTIONS[i % len(QUESTIONS)])
+        timings.append(time.perf_counter() - start)
+    return {
+        "p50_ms": metric(percentile_ms(timings, 50), "ms"),
+        "p95_ms": metric(percentile_ms(timings, 95), "ms"),
+        "local_overhead_ms": metric(percentile_ms(timings, 50) - 50, "ms")
+    }
+
+def scenario_multi_turn(server, size):
+    """多轮会话：同一Agent连续对话，观察每轮耗时是否随历史增长"""
+    server.configure(latency="fixed:0.05", error_rate=0.0)
+    per_turn = [[] for _ in range(size["session_turns"])]
+    for _ in range(size["sessions"]):
+        agent = new_agent(server)
+        for turn in range(size["session_turns"]):
+            start = time.perf_counter()
+            agent.passive_chat(QUESTIONS[turn % len(QUESTIONS)])
+            per_turn[turn].append(time.perf_counter() - start)
+    first = np.median(per_turn[0]) * 1000
+    last = np.median(per_turn[-1]) * 1000
+    return {
+        "first_turn_ms": metric(first, "ms"),
+        "last_turn_ms": metric(last, "ms"),
+        "session_total_ms": metric(sum(np.median(t) for t in per_turn) * 1000, "ms")
+    }
+
+def scenario_concurrent(server, size):
+    """并发负载：多线程各自持有Agent同时对话（mock延迟为对数正态分布，注入5%错误）"""
+    server.configure(latency="lognormal:0.05,0.3", error_rate=0.05, error_status=500)
+    timings = []
+    lock = threading.Lock()
+
+    def worker(index):
+        agent = new_agent(server)
+        for turn in range(size["thread_turns"]):
+            start = time.perf_counter()
+            agent.passive_chat(QUESTIONS[(index + turn) % len(QUESTIONS)])
+            with lock:
+                timings.append(time.perf_counter() - start)
+
+    errors_before = server.stats["errors"]
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(size["threads"])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    server.configure(error_rate=0.0)
+    return {
+        "throughput_turns_per_s": metric(len(timings) / elapsed, "turns/s", better="higher"),
+        "p50_ms": metric(percentile_ms(timings, 50), "ms"),
+        "p95_ms": metric(percentile_ms(timings, 95), "ms"),
+        "injected_errors": metric(server.stats["errors"] - errors_before, "count", better="info")
+    }
+
+def scenario_streaming(server, size):
+    """流式输出：直接请求mock服务，首个片段时间与完整响应时间"""
+    server.configure(latency="fixed:0.05", token_interval=0.002, error_rate=0.0)
+    first_chunk = []
+    total = []
+    for i in range(size["turns"]):
+        start = time.perf_counter()
+        response = requests.post(server.url, json={
+            "model": "deepseek-chat", "stream": True,
+            "messages": [{"role": "user", "content": QUESTIONS[i % len(QUESTIONS)]}]
+        }, stream=True, timeout=30)
+        first = None
+        for line in response.iter_lines():
+            if first is None and line.startswith(b"data:"):
+                first = time.perf_counter() - start
+            if line == b"data: [DONE]":
+                break
+        total.append(time.perf_counter() - start)
+        first_chunk.append(first)
+    return {
+        "ttft_p50_ms": metric(percentile_ms(first_chunk, 50), "ms"),
+        "total_p50_ms": metric(percentile_ms(total, 50), "ms")
+    }
+
+def scenario_storage(server, size):
+    """存储写入随数据量的变化：record_api_call 与 submit_feedback"""
+    from bench_dashboard_render import generate_metrics_file
+    from bench_feedback_query import generate_feedback_file
+    from metrics_dashboard import MetricsDashboard
+    from feedback_system import FeedbackSystem
+
+    results = {}
+    for events in size["storage_sizes"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics_file = os.path.join(tmp, "metrics.json")
+            generate_metrics_file(metrics_file, events=events)
+            dashboard = MetricsDashboard(metrics_file)
+            timings = []
+            for _ in range(9):
+                start = time.perf_counter()
+                dashboard.record_api_call(True, 1.0, "基准测试")
+                timings.append(time.perf_counter() - start)
+            results[f"record_api_call_ms@{events}"] = metric(np.median(timings) * 1000, "ms")
+
+            feedback_file = os.path.join(tmp, "feedback.json")
+            generate_feedback_file(feedback_file, events)
+            feedback_system = FeedbackSystem(feedback_file)
+            timings = []
+            for _ in range(9):
+                start = time.perf_counter()
+                feedback_system.submit_feedback({"type": "其他", "rating": 5, "content": "基准测试"})
+                timings.append(time.perf_counter() - start)
+            results[f"submit_feedback_ms@{events}"] = metric(np.median(timings) * 1000, "ms")
+    return results
+
+def scenario_dashboard_render(server, size):
+    """数据面板渲染（Streamlit AppTest）：首次渲染和重跑"""
+    from bench_dashboard_render import generate_metrics_file, render_app
+    from streamlit.testing.v1 import AppTest
+    import metrics_dashboard
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "metrics.json")
+        generate_metrics_file(data_file, events=size["render_events"])
+        app = AppTest.from_function(render_app, args=(data_file,), default_timeout=120)
+        metrics_dashboard._snapshot_cache.clear()
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        reruns = []
+        for _ in range(3):
+            start = time.perf_counter()
+            app.run()
+            reruns.append(time.perf_counter() - start)
+    return {
+        "first_render_ms": metric(first * 1000, "ms"),
+        "rerun_ms": metric(np.median(reruns) * 1000, "ms")
+    }
+
+SCENARIOS = {
+    "single_turn": scenario_single_turn,
+    "multi_turn": scenario_multi_turn,
+    "concurrent": scenario_concurrent,
+    "streaming": scenario_streaming,
+    "storage": scenario_storage,
+    "dashboard_render": scenario_dashboard_render
+}
+
+# ========== 运行与比较 ==========
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_suite(mode="quick", names=None):
+    """在临时工作目录中运行场景（Agent的 data/ 文件写到临时目录），返回结果字典"""
+    size = SIZES[mode]
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "mode": mode,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "scenarios": {}
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, MockDeepSeekServer() as server:
+        os.chdir(workdir)
+        try:
+            for name in names or SCENARIOS:
+                print(f"▶️ {name} ...", flush=True)
+                start = time.perf_counter()
+                results["scenarios"][name] = SCENARIOS[name](server, size)
+                print(f"   完成 ({time.perf_counter() - start:.1f}s)", flush=True)
+        finally:
+            os.chdir(cwd)
+        results["meta"]["mock_requests"] = server.stats["requests"]
+    return results
+
+def compare(results, baseline, tolerance=0.3, min_delta_ms=2.0):
+    """与基线比较，返回 [(场景, 指标, 基线值, 当前值, 变化率, 是否回归)]"""
+    rows = []
+    for scenario, metrics in results["scenarios"].items():
+        for name, current in metrics.items():
+            base = baseline.get("scenarios", {}).get(scenario, {}).get(name)
+            if base is None or current["better"] == "info":
+                continue
+            old, new = base["value"], current["value"]
+            change = (new - old) / old if old else 0.0
+            if current["better"] == "lower":
+                regressed = change > tolerance and (current["unit"] != "ms" or new - old > min_delta_ms)
+            else:
+                regressed = change < -tolerance
+            rows.append((scenario, name, old, new, change, regressed))
+    return rows
+
+def print_results(results, rows):
+    print(f"\n{'场景':<18}{'指标':<30}{'当前':>12}")
+    for scenario, metrics in results["scenarios"].items():
+        for name, value in metrics.items():
+            print(f"{scenario:<18}{name:<30}{value['value']:>12} {value['unit']}")
+    if rows:
+        print(f"\n{'场景':<18}{'指标':<30}{'基线':>10}{'当前':>10}{'变化':>9}")
+        for scenario, name, old, new, change, regressed in rows:
+            flag = "❌ 回归" if regressed else ""
+            print(f"{scenario:<18}{name:<30}{old:>10}{new:>10}{change * 100:>+8.1f}% {flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="AI职业规划师 - 基准套件（本地mock DeepSeek服务）")
+    parser.add_argument("--mode", choices=list(SIZES.keys()), default="quick", help="规模（默认quick）")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS.keys()), help="只运行指定场景（可重复）")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果JSON输出路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线JSON路径")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许的相对变化（默认0.3即30%%）")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果保存为基线")
+    args = parser.parse_args()
+
+    results = run_suite(args.mode, args.scenario)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    rows = []
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 已更新基线 {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("mode") != args.mode:
+            print(f"⚠️ 基线模式为 {baseline.get('meta', {}).get('mode')}，与本次 {args.mode} 不同，跳过比较")
+        else:
+            rows = compare(results, baseline, args.tolerance)
+
+    print_results(results, rows)
+    print(f"\n📄 结果已写入 {args.output}")
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
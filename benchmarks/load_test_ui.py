@@ -0,0 +1,377 @@
+# load_test_ui.py - agent_ui 无头压测（模拟N个Streamlit浏览器会话，输出容量报告）
+#
+# 直接走 Streamlit 的 websocket 协议（/_stcore/stream），每个虚拟用户：
+#   首次加载页面 -> 找到 chat_input 组件 -> 连续发送若干轮提问（中间有思考时间）
+# 每轮记录：首条消息延迟（websocket往返+脚本开始）、首次脚本运行耗时、整轮耗时（含 st.rerun 引起的二次运行）、
+# 收到的消息数和字节数；同时采样服务进程的CPU和内存（读取 /proc，无需psutil）。
+#
+# 用法：
+#   python benchmarks/load_test_ui.py                       # 自动启动mock服务和agent_ui，阶梯 1,5,10,20 个用户
+#   python benchmarks/load_test_ui.py --clients 1,10,50 --turns 5 --latency lognormal:0.8,0.4
+#   python benchmarks/load_test_ui.py --url http://127.0.0.1:8501 --pid 12345   # 压测已运行的实例
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BENCH_DIR)
+
+from mock_deepseek import MockDeepSeekServer
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "load_test_ui.json")
+QUESTIONS = ["我想优化我的简历", "如何准备产品经理面试？", "我今年28岁，想转行做数据分析", "我应该学习什么技能？",
+             "薪资谈判有什么技巧", "我学的是计算机专业，毕业两年了", "我想做产品经理", "面试时怎么介绍项目经验"]
+
+FINISHED_EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# ========== 服务进程资源采样 ==========
+
+def read_process_usage(pid):
+    """(累计CPU秒, RSS字节)，读取失败返回None（非Linux或进程已退出）"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # comm字段可能含空格，从最后一个 ')' 之后开始切分
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return cpu_seconds, int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        return None
+    return None
+
+class ResourceSampler:
+    """压测期间定时采样服务进程的CPU和RSS"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (时间, CPU秒, RSS字节)
+
+    def sample(self):
+        usage = read_process_usage(self.pid) if self.pid else None
+        if usage:
+            self.samples.append((time.perf_counter(), usage[0], usage[1]))
+
+    async def run(self, stop):
+        while not stop.is_set():
+            self.sample()
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        self.sample()
+
+    def summary(self):
+        if len(self.samples) < 2:
+            return {}
+        (t0, cpu0, rss0), (t1, cpu1, _) = self.samples[0], self.samples[-1]
+        cpu_seconds = cpu1 - cpu0
+        return {
+            "cpu_seconds": round(cpu_seconds, 3),
+            "cpu_percent": round(cpu_seconds / (t1 - t0) * 100, 1) if t1 > t0 else 0,
+            "rss_start_mb": round(rss0 / 2 ** 20, 1),
+            "rss_peak_mb": round(max(s[2] for s in self.samples) / 2 ** 20, 1)
+        }
+
+# ========== 虚拟用户 ==========
+
+def find_chat_input(msg):
+    """chat_input 组件的 (widget id, 所在fragment id)；不在fragment中时fragment id为空字符串"""
+    if msg.WhichOneof("type") != "delta" or not msg.delta.HasField("new_element"):
+        return None
+    element = msg.delta.new_element
+    if element.WhichOneof("type") == "chat_input":
+        return element.chat_input.id, msg.delta.fragment_id
+    return None
+
+class VirtualUser:
+    """一个浏览器会话：一条websocket连接对应服务端的一个ScriptRunner会话"""
+
+    def __init__(self, ws_url, index):
+        self.ws_url = ws_url
+        self.index = index
+        self.chat_input_id = None
+        self.chat_fragment_id = ""
+        self.turns = []
+        self.load = None
+        self.errors = []
+
+    async def rerun(self, ws, widget_states=None, fragment_id=""):
+        """发送一次 rerun_script 并等待脚本运行结束（跟随 st.rerun() 触发的后续运行）
+
+        和浏览器一样，fragment内的组件触发时带上 fragment_id，服务端只重跑该fragment
+        """
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        back_msg.rerun_script.page_script_hash = ""
+        back_msg.rerun_script.fragment_id = fragment_id
+        if widget_states is not None:
+            back_msg.rerun_script.widget_states.CopyFrom(widget_states)
+
+        start = time.perf_counter()
+        await ws.send(back_msg.SerializeToString())
+        first_message = first_run = None
+        runs = messages = received_bytes = 0
+        while True:
+            raw = await ws.recv()
+            now = time.perf_counter()
+            if first_message is None:
+                first_message = now - start
+            messages += 1
+            received_bytes += len(raw)
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            chat_input = find_chat_input(msg)
+            if chat_input:
+                self.chat_input_id, self.chat_fragment_id = chat_input
+            if msg.WhichOneof("type") == "script_finished":
+                runs += 1
+                if first_run is None:
+                    first_run = now - start
+                if msg.script_finished != FINISHED_EARLY_FOR_RERUN:
+                    break
+        return {
+            "first_message": first_message,
+            "first_run": first_run,
+            "total": time.perf_counter() - start,
+            "runs": runs,
+            "messages": messages,
+            "bytes": received_bytes
+        }
+
+    async def run(self, turns, think_time, start_delay=0.0):
+        await asyncio.sleep(start_delay)
+        try:
+            async with websockets.connect(self.ws_url, subprotocols=["streamlit"], max_size=None,
+                                          open_timeout=30) as ws:
+                self.load = await self.rerun(ws)
+                if not self.chat_input_id:
+                    raise RuntimeError("页面中没有找到 chat_input")
+                for turn in range(turns):
+                    states = WidgetStates()
+                    widget = states.widgets.add()
+                    widget.id = self.chat_input_id
+                    widget.chat_input_value.data = QUESTIONS[(self.index + turn) % len(QUESTIONS)]
+                    self.turns.append(await self.rerun(ws, states, self.chat_fragment_id))
+                    if think_time and turn < turns - 1:
+                        await asyncio.sleep(think_time)
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+# ========== 压测 ==========
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(np.array(samples) * 1000, q)), 1) if samples else None
+
+async def run_level(ws_url, clients, turns, think_time, ramp_up, pid):
+    """并发运行 clients 个虚拟用户，返回该档位的统计"""
+    users = [VirtualUser(ws_url, i) for i in range(clients)]
+    sampler = ResourceSampler(pid)
+    stop = asyncio.Event()
+    sampler_task = asyncio.create_task(sampler.run(stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user.run(turns, think_time, ramp_up * i / clients) for i, user in enumerate(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler_task
+
+    turn_stats = [t for user in users for t in user.turns]
+    loads = [user.load["total"] for user in users if user.load]
+    errors = [e for user in users for e in user.errors]
+    result = {
+        "clients": clients,
+        "completed_turns": len(turn_stats),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(len(turn_stats) / elapsed, 2) if elapsed else 0,
+        "page_load_p50_ms": percentile_ms(loads, 50),
+        "page_load_p95_ms": percentile_ms(loads, 95),
+        "ws_first_message_p50_ms": percentile_ms([t["first_message"] for t in turn_stats], 50),
+        "ws_first_message_p95_ms": percentile_ms([t["first_message"] for t in turn_stats], 95),
+        "rerun_p50_ms": percentile_ms([t["first_run"] for t in turn_stats], 50),
+        "rerun_p95_ms": percentile_ms([t["first_run"] for t in turn_stats], 95),
+        "turn_p50_ms": percentile_ms([t["total"] for t in turn_stats], 50),
+        "turn_p95_ms": percentile_ms([t["total"] for t in turn_stats], 95),
+        "runs_per_turn": round(float(np.mean([t["runs"] for t in turn_stats])), 2) if turn_stats else None,
+        "messages_per_turn": round(float(np.mean([t["messages"] for t in turn_stats])), 1) if turn_stats else None,
+        "kb_per_turn": round(float(np.mean([t["bytes"] for t in turn_stats])) / 1024, 1) if turn_stats else None
+    }
+
+    resources = sampler.summary()
+    if resources:
+        result.update(resources)
+        result["cpu_ms_per_turn"] = round(resources["cpu_seconds"] * 1000 / len(turn_stats), 1) if turn_stats else None
+    return result
+
+def session_memory(ws_url, pid, sessions=50):
+    """空闲会话的内存占用：打开 sessions 个会话完成首次加载并保持连接，比较前后RSS"""
+    if not pid:
+        return None
+
+    async def measure():
+        before = read_process_usage(pid)
+        connections = []
+        try:
+            for i in range(sessions):
+                ws = await websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=30)
+                connections.append(ws)
+                await VirtualUser(ws_url, i).rerun(ws)
+            await asyncio.sleep(1)
+            after = read_process_usage(pid)
+        finally:
+            for ws in connections:
+                await ws.close()
+        if not before or not after:
+            return None
+        return round((after[1] - before[1]) / sessions / 2 ** 20, 2)
+
+    return asyncio.run(measure())
+
+def estimate_capacity(levels, slo_ms, think_time, cpu_budget):
+    """容量估计：满足SLO的最大已测并发数；以及按单进程CPU预算外推的并发上限
+
+    Streamlit脚本在同一进程内执行，受GIL限制实际只能用满约一个核，cpu_budget 为可用的单核比例。
+    """
+    within_slo = [lv["clients"] for lv in levels if lv["errors"] == 0 and lv["turn_p95_ms"] is not None
+                  and lv["turn_p95_ms"] <= slo_ms]
+    estimate = {"slo_p95_ms": slo_ms, "max_tested_clients_within_slo": max(within_slo) if within_slo else 0}
+
+    measured = [lv for lv in levels if lv.get("cpu_ms_per_turn")]
+    if measured:
+        busiest = max(measured, key=lambda lv: lv["clients"])
+        cpu_per_turn = busiest["cpu_ms_per_turn"] / 1000
+        # 每个用户每 (整轮耗时 + 思考时间) 发起一轮
+        cycle = busiest["turn_p50_ms"] / 1000 + think_time
+        if cpu_per_turn > 0 and cycle > 0:
+            estimate["cpu_ms_per_turn"] = busiest["cpu_ms_per_turn"]
+            estimate["cpu_bound_clients"] = int(cpu_budget * cycle / cpu_per_turn)
+    return estimate
+
+def print_report(report):
+    columns = [("clients", "用户"), ("turns_per_s", "轮/秒"), ("ws_first_message_p50_ms", "WS首包p50"),
+               ("rerun_p50_ms", "重跑p50"), ("rerun_p95_ms", "重跑p95"), ("turn_p50_ms", "整轮p50"),
+               ("turn_p95_ms", "整轮p95"), ("runs_per_turn", "运行/轮"), ("cpu_percent", "CPU%"),
+               ("cpu_ms_per_turn", "CPUms/轮"), ("rss_peak_mb", "RSS MB"), ("errors", "错误")]
+    print("\n" + " | ".join(f"{title:>9}" for _, title in columns))
+    for level in report["levels"]:
+        print(" | ".join(f"{str(level.get(key, '-')):>9}" for key, _ in columns))
+
+    capacity = report["capacity"]
+    print(f"\n📐 整轮p95 ≤ {capacity['slo_p95_ms']:.0f}ms 的最大已测并发: {capacity['max_tested_clients_within_slo']}")
+    if "cpu_bound_clients" in capacity:
+        print(f"📐 按CPU外推的单进程并发上限: 约 {capacity['cpu_bound_clients']} 个活跃用户"
+              f"（{capacity['cpu_ms_per_turn']}ms CPU/轮，思考时间 {report['config']['think_time']}s）")
+    if report.get("idle_session_mb") is not None:
+        print(f"📐 每个空闲会话内存: 约 {report['idle_session_mb']} MB")
+
+# ========== 启动被测服务 ==========
+
+def wait_for_health(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/_stcore/health", timeout=2).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+def launch_app(port, api_url, work_dir, script=None):
+    """在临时工作目录中启动 agent_ui（数据文件写入临时目录，不污染仓库 data/）"""
+    env = dict(os.environ, DEEPSEEK_API_KEY="mock-key", DEEPSEEK_API_URL=api_url)
+    command = [sys.executable, "-m", "streamlit", "run", script or os.path.join(ROOT_DIR, "agent_ui.py"),
+               "--server.headless", "true", "--server.port", str(port),
+               "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false"]
+    return subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+def main():
+    parser = argparse.ArgumentParser(description="agent_ui 无头压测")
+    parser.add_argument("--url", default=None, help="已运行实例的地址（默认自动启动mock服务和agent_ui）")
+    parser.add_argument("--pid", type=int, default=None, help="已运行实例的进程号（用于采样CPU和内存）")
+    parser.add_argument("--port", type=int, default=18501, help="自动启动时 agent_ui 的端口")
+    parser.add_argument("--clients", default="1,5,10,20", help="并发用户阶梯，逗号分隔")
+    parser.add_argument("--turns", type=int, default=3, help="每个用户的对话轮数")
+    parser.add_argument("--think-time", type=float, default=1.0, help="两轮之间的思考时间（秒）")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="各档位内用户的启动间隔总时长（秒）")
+    parser.add_argument("--latency", default="fixed:0.5", help="mock LLM延迟分布（自动启动时生效）")
+    parser.add_argument("--slo-ms", type=float, default=3000, help="整轮耗时p95目标（毫秒）")
+    parser.add_argument("--cpu-budget", type=float, default=0.8, help="容量外推时可用的单核CPU比例")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="容量报告JSON路径")
+    args = parser.parse_args()
+
+    server = app = work_dir = None
+    pid = args.pid
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            server = MockDeepSeekServer(latency=args.latency).start()
+            work_dir = tempfile.mkdtemp(prefix="agent_ui_load_")
+            app = launch_app(args.port, server.url, work_dir)
+            pid = app.pid
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        if not wait_for_health(base_url):
+            print(f"❌ {base_url} 未就绪")
+            return 1
+        ws_url = base_url.replace("http", "ws", 1) + "/_stcore/stream"
+
+        # 预热：首次运行会导入模块、初始化缓存，不计入统计
+        asyncio.run(run_level(ws_url, 1, 1, 0, 0, None))
+
+        levels = []
+        for clients in [int(c) for c in args.clients.split(",") if c.strip()]:
+            print(f"⏱️ {clients} 个并发用户 × {args.turns} 轮 ...")
+            levels.append(asyncio.run(run_level(ws_url, clients, args.turns, args.think_time, args.ramp_up, pid)))
+
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "target": base_url,
+            "config": {"turns": args.turns, "think_time": args.think_time, "ramp_up": args.ramp_up,
+                       "latency": None if args.url else args.latency},
+            "levels": levels,
+            "idle_session_mb": session_memory(ws_url, pid),
+            "capacity": estimate_capacity(levels, args.slo_ms, args.think_time, args.cpu_budget)
+        }
+        print_report(report)
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 容量报告: {args.output}")
+        return 0
+    finally:
+        if app is not None:
+            app.terminate()
+            try:
+                app.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app.kill()
+        if server is not None:
+            server.stop()
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
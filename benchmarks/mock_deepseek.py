@@ -0,0 +1,271 @@
+# mock_deepseek.py - 本地模拟的DeepSeek chat/completions服务（可配置延迟分布、流式输出和错误注入）
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Server(ThreadingHTTPServer):
+    # 默认监听队列只有5，并发突发时多余的连接会被重置
+    request_queue_size = 128
+
+DEFAULT_REPLY = (
+    "**一.共情**\n我理解你的情况，这是很多人都会遇到的问题。\n"
+    "**二.发展建议**\n1.梳理已有经验，突出可量化的成果\n2.针对目标岗位补齐关键技能\n"
+    "**三.岗位难度**\n需要扎实的基础和持续学习的能力。\n"
+    "**四.行动方案**\n本周先完成一版简历，需要一些具体的修改建议吗？"
+)
+
+def parse_latency(spec):
+    """延迟分布描述 -> 采样函数（秒）
+
+    fixed:0.5 / uniform:0.2,1.0 / lognormal:0.8,0.4（中位数, sigma）/ 直接写数字等同 fixed
+    """
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    values = [float(v) for v in params.split(",")]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+class MockDeepSeekServer:
+    """with MockDeepSeekServer(latency="lognormal:0.8,0.4", error_rate=0.05) as server: server.url
+
+    - latency: 完整响应（非流式）或首个token前的延迟分布
+    - token_interval: 流式输出时每个片段之间的间隔（秒）
+    - error_rate / error_status: 按概率返回错误状态码（如500、429）
+    - timeout_rate: 按概率挂起 hang_seconds 秒，模拟上游超时
+    - prefill_per_1k: 每1000个输入token额外增加的首token延迟（秒），模拟长提示词的预填充耗时
+    - key_rps: 每个API密钥每秒最多接受的请求数（0为不限），超出时返回429并带 Retry-After
+    - bad_keys: 视为无效的API密钥，请求返回401
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0.05", token_interval=0.005,
+                 error_rate=0.0, error_status=500, timeout_rate=0.0, hang_seconds=30, reply=DEFAULT_REPLY, seed=0,
+                 prefill_per_1k=0.0, key_rps=0, bad_keys=()):
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "timeouts": 0, "in_flight": 0, "max_in_flight": 0,
+                      "rate_limited": 0, "unauthorized": 0}
+        self.key_requests = defaultdict(int)  # API密钥 -> 请求数
+        self.key_windows = defaultdict(deque)  # API密钥 -> 最近1秒内被接受的请求时刻
+        self.configure(latency=latency, token_interval=token_interval, error_rate=error_rate,
+                       error_status=error_status, timeout_rate=timeout_rate, hang_seconds=hang_seconds, reply=reply,
+                       prefill_per_1k=prefill_per_1k, key_rps=key_rps, bad_keys=bad_keys)
+        self.httpd = _Server((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def configure(self, **options):
+        """运行中修改配置（延迟、错误率等）"""
+        if "latency" in options:
+            self.latency_spec = options.pop("latency")
+            self.sample_latency = parse_latency(self.latency_spec)
+        for key, value in options.items():
+            setattr(self, key, value)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-deepseek", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _draw(self):
+        with self.rng_lock:
+            return self.rng.random(), max(0.0, self.sample_latency(self.rng))
+
+    def _count(self, key, delta=1):
+        with self.lock:
+            self.stats[key] += delta
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _admit(self, key):
+        """按密钥计数并检查限流；返回 None（放行）、401 或 (429, Retry-After秒)"""
+        with self.lock:
+            self.key_requests[key] += 1
+            if key in self.bad_keys:
+                self.stats["unauthorized"] += 1
+                return 401
+            if not self.key_rps:
+                return None
+            now = time.monotonic()
+            window = self.key_windows[key]
+            while window and window[0] <= now - 1:
+                window.popleft()
+            if len(window) >= self.key_rps:
+                self.stats["rate_limited"] += 1
+                return 429, window[0] + 1 - now
+            window.append(now)
+            return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，开启Nagle时第二次写要等客户端的延迟ACK（约40ms）
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid json"}})
+                    return
+
+                server._count("requests")
+                key = self.headers.get("Authorization", "").partition(" ")[2]
+                verdict = server._admit(key)
+                if verdict == 401:
+                    self._send_json(401, {"error": {"message": "invalid api key"}})
+                    return
+                if verdict is not None:
+                    self.send_response(429)
+                    self.send_header("Retry-After", f"{verdict[1]:.2f}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                server._count("in_flight")
+                try:
+                    self._handle(request)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已取消请求
+                finally:
+                    server._count("in_flight", -1)
+
+            def _handle(self, request):
+                draw, latency = server._draw()
+                if draw < server.timeout_rate:
+                    server._count("timeouts")
+                    time.sleep(server.hang_seconds)
+                    return
+                if draw < server.timeout_rate + server.error_rate:
+                    server._count("errors")
+                    time.sleep(latency)
+                    self._send_json(server.error_status, {"error": {"message": "injected error"}})
+                    return
+
+                # 按请求的 stop / max_tokens 截断回答（与用量估算一致：约2个字符1个token）
+                reply, finish_reason = server.reply, "stop"
+                for stop in request.get("stop") or []:
+                    if stop and stop in reply:
+                        reply = reply[:reply.index(stop)]
+                if request.get("max_tokens") and len(reply) > request["max_tokens"] * 2:
+                    reply, finish_reason = reply[:request["max_tokens"] * 2], "length"
+
+                prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+                usage = {
+                    "prompt_tokens": max(1, prompt_chars // 2),
+                    "completion_tokens": max(1, len(reply) // 2),
+                    "prompt_cache_hit_tokens": 0
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                completion_id = f"mock-{uuid.uuid4().hex[:12]}"
+                time.sleep(latency + usage["prompt_tokens"] / 1000 * server.prefill_per_1k)
+
+                if request.get("stream"):
+                    server._count("streamed")
+                    self._stream(completion_id, usage, reply, finish_reason)
+                    return
+
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "deepseek-chat"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage
+                })
+
+            def _stream(self, completion_id, usage, reply, finish_reason):
+                """SSE流式输出：按约8个字符一个片段，最后一个片段带usage"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                pieces = [reply[i:i + 8] for i in range(0, len(reply), 8)] or [""]
+                for index, piece in enumerate(pieces):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": {"content": piece},
+                                     "finish_reason": finish_reason if index == len(pieces) - 1 else None}]
+                    }
+                    if index == len(pieces) - 1:
+                        chunk["usage"] = usage
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if server.token_interval:
+                        time.sleep(server.token_interval)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+def main():
+    """命令行启动：DEEPSEEK_API_URL=http://127.0.0.1:8765/chat/completions streamlit run agent_ui.py"""
+    parser = argparse.ArgumentParser(description="本地模拟DeepSeek chat/completions服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="延迟分布，如 fixed:0.5 / uniform:0.2,1 / lognormal:0.8,0.4")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="流式片段间隔（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误注入概率")
+    parser.add_argument("--error-status", type=int, default=500, help="注入的错误状态码")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起（超时）注入概率")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0, help="每1000个输入token增加的首token延迟（秒）")
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(args.host, args.port, latency=args.latency, token_interval=args.token_interval,
+                                error_rate=args.error_rate, error_status=args.error_status,
+                                timeout_rate=args.timeout_rate, prefill_per_1k=args.prefill_per_1k)
+    print(f"🧪 Mock DeepSeek: {server.url}（延迟 {args.latency}，错误率 {args.error_rate}）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,52 @@
 # career_agent.py - Agent核心类（集成数据监控）
-import requests
 import json
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import os
 import time
+import copy
+import uuid
 from feedback_system import FeedbackSystem
 from metrics_dashboard import MetricsDashboard
 from career_knowledge import enhance_prompt
+from generation_policy import select_policy
+from hedging import get_hedger
+from key_pool import KeyPool, get_key_pool
+from metering import compute_cost, get_meter, load_config as load_metering_config
+from few_shot import format_examples, select_examples
+from profile_extractor import extract_profile, format_profile, merge_profile
+from telemetry import API_LATENCY, RETRIES, TOKENS
+from tracing import tracer, stage_timings
+from turn_executor import TurnCancelled, http_session
+from singleflight import SingleFlight, request_key
+
+# 进程内所有会话共用：相同的请求同时在途时合并为一次上游调用
+single_flight = SingleFlight()
+
+# 换一个密钥重发的状态码：限流和密钥失效（请求本身没有问题）
+ROTATE_STATUSES = (429, 401, 403)
+
+# 超过硬预算时的回答（只用缓存回答，见 metering.py）
+BUDGET_EXCEEDED_MESSAGES = {
+    "session": "⚠️ 本次会话的用量已达上限，暂时只能回答已准备好的后续问题，请稍后再开始新的咨询",
+    "daily": "⚠️ 今日服务用量已达上限，暂时只能回答已准备好的后续问题，请明天再来咨询"
+}
 
 class CareerAgent:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.api_url = "https://api.deepseek.com/chat/completions"
+    def __init__(self, api_key=None, key_pool=None):
+        # 默认使用进程内共享的密钥池（见 key_pool.py）；只传入一个密钥时该Agent单独使用这个密钥
+        self.key_pool = key_pool or (KeyPool([api_key]) if api_key else get_key_pool())
+        self.api_url = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
         self.conversation_history = []
         self.user_profile = {}
         self.current_state = "general"
+        self.last_error = None  # 最近一次API调用的错误信息，成功时为None
+        self.last_usage = None  # 最近一次API调用返回的usage（token用量）
+        self.blocked = None  # 最近一次调用因超过硬预算被拒绝时为预算范围（session/daily），否则为None
+        self.prefetch_engine = None  # 可选：后续问题预取引擎
+        self.hedger = get_hedger()  # 可选：对冲请求（HEDGE_REQUESTS=1 时开启）
+        self.session_id = uuid.uuid4().hex[:12]  # 用量计入的会话（清空对话不重置，预取副本共用）
+        self.meter = get_meter()  # token用量、费用与预算（见 metering.py）
         self.feedback_system = FeedbackSystem()
         self.metrics_dashboard = MetricsDashboard()  # 数据监控
     
@@ -42,79 +75,271 @@ class CareerAgent:
         return self.current_state
     
     def update_profile_from_input(self, user_input):
-        """从对话中智能提取用户信息"""
-        if any(word in user_input for word in ["我今年", "年龄", "岁"]):
-            self.user_profile["age"] = user_input
-        elif any(word in user_input for word in ["我学", "学历", "专业", "毕业"]):
-            self.user_profile["education"] = user_input
-        elif any(word in user_input for word in ["我工作", "经验", "从业", "在职"]):
-            self.user_profile["experience"] = user_input
-        elif any(word in user_input for word in ["我会", "技能", "擅长", "熟悉"]):
-            self.user_profile["skills"] = user_input
-        elif any(word in user_input for word in ["我想", "目标", "希望", "打算"]):
-            self.user_profile["goals"] = user_input
+        """从对话中提取用户信息（年龄、学历、专业、工作年限、技能、目标岗位），增量合并进画像"""
+        merge_profile(self.user_profile, extract_profile(user_input))
     
-    def call_deepseek(self, messages):
-        """调用DeepSeek API - 集成性能监控"""
+    def call_deepseek(self, messages, cancel_token=None, on_delta=None):
+        """调用DeepSeek API - 集成性能监控
+
+        传入 cancel_token 或 on_delta 时使用流式请求：每个回答片段回调 on_delta，
+        cancel_token 被取消时中断请求并抛出 TurnCancelled（见 turn_executor.py）
+        """
+        with tracer.span("call_deepseek"):
+            return self._call_deepseek(messages, cancel_token, on_delta)
+    
+    def _call_deepseek(self, messages, cancel_token=None, on_delta=None):
+        """发送请求并记录耗时、token用量和调用结果
+
+        相同的请求（同一接口、模型、消息和参数）同时在途时只发一次上游调用，
+        其余调用等待并共享结果（流式调用同样收到全部片段），见 singleflight.py
+        """
         start_time = time.time()
+        stream = cancel_token is not None or on_delta is not None
         
+        # Authorization 在每次发出请求时按从密钥池取到的密钥添加
         headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
+            "Content-Type": "application/json"
         }
         
+        # 生成参数按对话模式和输入长度从策略表选择（见 generation_policy.py）
+        policy = select_policy(self.current_state, messages[-1]["content"] if messages else "")
         data = {
             "model": "deepseek-chat",
             "messages": messages,
-            "stream": False,
-            "temperature": 0.7
+            "stream": stream,
+            "temperature": policy["temperature"]
         }
+        if policy["max_tokens"]:
+            data["max_tokens"] = policy["max_tokens"]
+        if policy["stop"]:
+            data["stop"] = policy["stop"]
+        if stream:
+            data["stream_options"] = {"include_usage": True}
+        
+        # 预算：超过软预算时缩短回答，超过硬预算时不再请求上游（见 metering.py）
+        # 被拒绝不是API失败：last_error 保持为None，由 blocked 标记，执行器记为单独的轮次结果
+        budget = self.meter.check(self.session_id)
+        self.blocked = None
+        if budget.level == "hard":
+            self.meter.record_action(budget, "blocked")
+            tracer.current_span().set_attribute("budget", f"hard:{budget.scope}")
+            self.blocked = budget.scope
+            self.last_error = None
+            self.last_usage = None
+            message = BUDGET_EXCEEDED_MESSAGES[budget.scope]
+            if on_delta is not None:
+                on_delta(message)
+            return message
+        if budget.level == "soft":
+            self.meter.record_action(budget, "degraded")
+            limit = load_metering_config()["degraded_max_tokens"]
+            data["max_tokens"] = min(data.get("max_tokens") or limit, limit)
+        # 合并键不含API密钥和流式选项：非流式的等待者也能复用流式调用的结果，反之亦然
+        key = request_key(self.api_url, {k: v for k, v in data.items() if k not in ("stream", "stream_options")})
         
         try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=120)
+            (status_code, content, usage), coalesced = single_flight.do(
+                key, lambda token, emit: self._request(headers, data, token, emit), cancel_token, on_delta
+            )
+            span = tracer.current_span()
+            span.set_attribute("coalesced", coalesced)
+            span.set_attribute("policy", policy["name"])
+            span.set_attribute("budget", budget.level)
             response_time = time.time() - start_time
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
+                self.last_error = None
+                self.last_usage = usage
                 # 记录成功的API调用
-                self.metrics_dashboard.record_api_call(
-                    success=True,
-                    response_time=response_time,
-                    user_input=messages[-1]["content"] if messages else None
-                )
-                return result["choices"][0]["message"]["content"]
+                with tracer.span("metrics.record_api_call"):
+                    self.metrics_dashboard.record_api_call(
+                        success=True,
+                        response_time=response_time,
+                        user_input=messages[-1]["content"] if messages else None,
+                        policy=policy["name"],
+                        output_tokens=(usage or {}).get("completion_tokens"),
+                        # 合并的调用共用一次上游请求，用量和费用只由发起者记录
+                        usage=None if coalesced else usage,
+                        cost=None if coalesced or not usage else compute_cost(usage, data["model"]),
+                        session_id=self.session_id
+                    )
+                return content
             else:
                 # 记录失败的API调用
+                self.last_error = f"HTTP {status_code}"
+                with tracer.span("metrics.record_api_call"):
+                    self.metrics_dashboard.record_api_call(
+                        success=False,
+                        response_time=response_time,
+                        user_input=messages[-1]["content"] if messages else None,
+                        error_msg=f"HTTP {status_code}",
+                        policy=policy["name"]
+                    )
+                return f"❌ API请求失败，请检查网络连接和API密钥"
+        except TurnCancelled as e:
+            # 取消和超时不计为API失败，由执行器作为单独的轮次结果记录
+            API_LATENCY.labels(e.reason).observe(time.time() - start_time)
+            raise
+        except Exception as e:
+            # 记录异常的API调用
+            self.last_error = str(e)
+            with tracer.span("metrics.record_api_call"):
                 self.metrics_dashboard.record_api_call(
                     success=False,
-                    response_time=response_time,
+                    response_time=time.time() - start_time,
                     user_input=messages[-1]["content"] if messages else None,
-                    error_msg=f"HTTP {response.status_code}"
+                    error_msg=str(e),
+                    policy=policy["name"]
                 )
-                return f"❌ API请求失败，请检查网络连接和API密钥"
-        except Exception as e:
-            # 记录异常的API调用
-            self.metrics_dashboard.record_api_call(
-                success=False,
-                response_time=time.time() - start_time,
-                user_input=messages[-1]["content"] if messages else None,
-                error_msg=str(e)
-            )
             return f"❌ 网络连接异常，请稍后重试"
     
-    def passive_chat(self, user_input):
-        """智能对话处理 - 集成会话记录"""
+    def _request(self, headers, data, token, emit):
+        """一次上游调用（在single-flight线程中执行），返回 (状态码, 回答, usage)
+
+        上游耗时和token用量在这里记录，合并的调用只计一次；
+        token 在所有等待者都取消后被取消，此时中断请求。开启对冲时（见 hedging.py），
+        首个响应超过阈值仍未到达会再发一份相同请求，先响应的胜出
+        """
+        start_time = time.time()
+        try:
+            if self.hedger is not None:
+                status_code, content, usage = self.hedger.run(
+                    lambda attempt_token, attempt_emit: self._attempt(headers, data, attempt_token, attempt_emit),
+                    token, emit, stream=data["stream"]
+                )
+            else:
+                status_code, content, usage = self._attempt(headers, data, token, emit)
+        except Exception as e:
+            # 被取消时连接已被关闭，读取中断引发的异常按取消处理
+            if token.cancelled:
+                raise TurnCancelled(token.reason) from e
+            API_LATENCY.labels("error").observe(time.time() - start_time)
+            raise
+        API_LATENCY.labels(status_code).observe(time.time() - start_time)
+        if status_code == 200:
+            self.record_usage(usage)
+            self.meter.charge(self.session_id, usage, data["model"])
+        return status_code, content, usage
+    
+    def _attempt(self, headers, data, token, emit):
+        """发出一份HTTP请求，返回 (状态码, 回答, usage)
+
+        密钥从密钥池中取当前负载最小的。返回429时该密钥冷却，换一个密钥（或等冷却结束）重发，
+        所有密钥的冷却（Retry-After）都超过 KEY_MAX_WAIT 时直接返回429；
+        返回401/403的密钥本次调用不再使用。最多发出 密钥数+2 次
+        """
+        tried = []
+        for attempt in range(1, len(self.key_pool) + 3):
+            lease = self.key_pool.acquire(exclude=tried, cancel_token=token)
+            status_code, retry_after = "error", None
+            try:
+                response, content, usage = self._send(
+                    dict(headers, Authorization=f"Bearer {lease.key}"), data, token, emit, lease.name
+                )
+                status_code, retry_after = response.status_code, response.headers.get("Retry-After")
+            except Exception:
+                if token.cancelled:
+                    status_code = "cancelled"
+                raise
+            finally:
+                self.key_pool.release(lease, status_code, retry_after)
+            if status_code in (401, 403):
+                tried.append(lease)
+            if status_code not in ROTATE_STATUSES or not self.key_pool.has_usable(exclude=tried):
+                break
+            RETRIES.labels(f"key_{status_code}").inc()
+        return status_code, content, usage
+    
+    def _send(self, headers, data, token, emit, key_name):
+        """用给定的请求头发出一次HTTP请求，返回 (response, 回答, usage)；非200时回答为None"""
+        with tracer.span("http", url=self.api_url, stream=data["stream"], api_key=key_name) as span:
+            if data["stream"]:
+                response, content, usage = self._post_stream(headers, data, token, emit)
+            else:
+                with token.bind():
+                    response = http_session.post(self.api_url, headers=headers, json=data, timeout=120)
+                content = usage = None
+                if response.status_code == 200:
+                    result = response.json()
+                    content = result["choices"][0]["message"]["content"]
+                    usage = result.get("usage")
+                    emit(content)  # 流式等待者一次收到完整回答
+            span.set_attribute("http.status_code", response.status_code)
+        return response, content, usage
+    
+    def _post_stream(self, headers, data, token, on_delta):
+        """流式请求：逐个SSE片段拼接回答，返回 (response, 回答, usage)；非200时回答为None"""
+        parts = []
+        usage = None
+        with token.bind():
+            response = http_session.post(self.api_url, headers=headers, json=data, timeout=120, stream=True)
+            with response:
+                if response.status_code != 200:
+                    return response, None, None
+                # read1 有多少读多少（iter_lines 会攒满固定大小的块才返回，片段无法及时显示）
+                buffer = b""
+                finished = False
+                while not finished:
+                    received = response.raw.read1(8192)
+                    token.check()
+                    if not received:
+                        break
+                    lines = (buffer + received).split(b"\n")
+                    buffer = lines.pop()
+                    for line in lines:
+                        if not line.startswith(b"data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == b"[DONE]":
+                            finished = True
+                            break
+                        chunk = json.loads(payload)
+                        usage = chunk.get("usage") or usage
+                        for choice in chunk.get("choices", []):
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                parts.append(delta)
+                                if on_delta is not None:
+                                    on_delta(delta)
+        token.check()
+        return response, "".join(parts), usage
+    
+    @staticmethod
+    def record_usage(usage):
+        """把响应中的token用量计入导出指标"""
+        if not usage:
+            return
+        TOKENS.labels("in").inc(usage.get("prompt_tokens", 0))
+        TOKENS.labels("out").inc(usage.get("completion_tokens", 0))
+        # DeepSeek上下文硬盘缓存命中的输入token
+        if usage.get("prompt_cache_hit_tokens"):
+            TOKENS.labels("in_cached").inc(usage["prompt_cache_hit_tokens"])
+    
+    def prepare_messages(self, user_input):
+        """构建本轮请求消息（状态检测、信息提取、系统提示、历史上下文）"""
         # 1. 状态检测
-        current_state = self.detect_state(user_input)
+        with tracer.span("detect_state"):
+            current_state = self.detect_state(user_input)
         
         # 2. 信息提取
-        self.update_profile_from_input(user_input)
+        with tracer.span("update_profile"):
+            self.update_profile_from_input(user_input)
         
-        # 3. 构建智能系统提示
+        with tracer.span("build_prompt"):
+            return self._build_messages(current_state, user_input)
+    
+    def _build_messages(self, current_state, user_input):
+        """拼接系统提示、最近的对话历史和当前输入"""
+        # 3. 构建智能系统提示（只放入与当前模式和输入最相关的示例）
+        profile_text = format_profile(self.user_profile)
+        examples = select_examples(current_state, user_input, profile_text)
+        span = tracer.current_span()
+        if span is not None:
+            span.set_attribute("examples", ",".join(example["id"] for example in examples))
         system_prompt = f"""你是一个全能的AI职业规划师，你的任务是倾听用户的话语并给出回答。
 
 当前对话模式：{current_state}
-用户主动提供的信息：{json.dumps(self.user_profile, ensure_ascii=False)}
+用户主动提供的信息：{profile_text}
   
 对话原则：
 1. 直接专业地回答用户问题
@@ -124,35 +349,7 @@ class CareerAgent:
 5.避免回答出现性别方面的话语，回答中不应该带有任何的歧视和偏见的话语
 6.请按以下框架组织你的回答：一.目前已有的信息，包括用户自身情况的总结或者是行业目前趋势的总结。二.发展建议，给出一些具体化的建议。三.这个岗位的难度在哪里，需要具备什么程度，做到什么程度。四.针对那些具体的建议，给出可以立即执行的行动方案
 7.回答语气需要温和，给予用户赞扬和鼓励，当用户需要进行模拟面试时，适当使用严肃语气给予压力面
-下面是一些咨询示例，请按照示例的风格和结构回答用户问题
-
-示例1：应对职业倦怠
-*用户输入：我做了5年的软件测试工程师，感觉这份工作重复性太高，每天都很疲惫，对技术也提不起以前的热情了。我该怎么办？*
-AI回复：
-**一.共情
-我完全理解你的感受。持续从事重复性工作确实容易让人感到倦怠和缺乏成长。你现在正处于一个寻求变化和新刺激的职业阶段。
-**二.用户自身总结
-你有五年的测试经验，对于技术方面有很深的理解，对于IT行业也有自己的见解，这是你自身目前的优势。
-**三.多维度的建议
-考虑到你自身的情况，我有以下几个建议给你：
-1.如果你还想坚持这份工作，你可以从外部获取兴趣，比如XX，你可以XX，我有几个可以推荐给你的学习路径
-2.如果你想要换一个职位，考虑到你在IT行业的经验，你可以考虑产品经理，你有技术能力，这是90%的产品经理不具备的，现在你需要培养产品意思，还要XX
-3.还有一些新兴岗位，例如自媒体，你五年的IT经验足够让你吸引一批志同道合的粉丝，现在你首先要做的是注册一个账号，然后仔细思考选择一个具体的方向，选择你自己的风格，需要一些具体的建议吗？
-4.你可以考虑个人接单，以你五年的IT经验，可以接一些小项目，我有几个推荐的接单平台你需要吗？
-
-示例2：咨询职业规划
-*用户输入：我是计算机科学的本科学生，目前我很迷茫，不知道未来干什么，可以给我一些建议吗？
-AI回复：
-**一.共情
-我能理解你目前的心情，作为一个大学生，你有这样的想法和压力是很正常的，你现在正处于一个迷茫期，你要做的就是找到一个目标
-**二.用户总结
-你现在处于本科阶段，你的准备时间很充足，并且你是计算机科学的学生，你未来也行更倾向于从事IT行业相关工作
-**三.多维度建议
-考虑到你的情况，我有以下几个建议给你
-1.努力学习课内知识，攻读研究生，追求更高的学历，这样可以让你未来在就业市场以及学术界更有竞争力，你现在需要XX
-2.尽早开启你的实习，积累行业经验，为秋招做好准备，我有几个适合你的岗位，你想要继续了解吗。
-
-
+{format_examples(examples)}
 
 请根据当前对话模式提供最专业的建议。"""
 
@@ -166,26 +363,69 @@ AI回复：
         # 添加当前用户输入
         messages.append({"role": "user", "content": user_input})
         
-        # 5. 调用API
-        response = self.call_deepseek(messages)
-        
-        # 6. 更新对话历史
-        self.conversation_history.append({"role": "user", "content": user_input})
-        self.conversation_history.append({"role": "assistant", "content": response})
-        
-        # 限制历史长度
-        if len(self.conversation_history) > 8:
-            self.conversation_history = self.conversation_history[-8:]
-        
-        # 🔥 记录用户会话
-        self.metrics_dashboard.record_session(user_input, response)
-        
-        # 修复：正确设置会话结束状态
-        if 'conversation_ended' in st.session_state:
-            st.session_state.conversation_ended = True
+        return messages
+    
+    def passive_chat(self, user_input, cancel_token=None, on_delta=None):
+        """智能对话处理 - 集成会话记录和分阶段追踪
+
+        cancel_token / on_delta 见 call_deepseek；被取消时抛出 TurnCancelled，本轮不写入对话历史
+        """
+        with tracer.span("passive_chat") as root:
+            messages = self.prepare_messages(user_input)
+            root.set_attribute("state", self.current_state)
+            
+            # 5. 调用API（预取命中时直接使用缓存的回答）
+            response = None
+            self.blocked = None
+            if self.prefetch_engine:
+                with tracer.span("prefetch.take"):
+                    response = self.prefetch_engine.take(user_input)
+                root.set_attribute("prefetch_hit", response is not None)
+            if response is None:
+                response = self.call_deepseek(messages, cancel_token, on_delta)
+            elif on_delta is not None:
+                on_delta(response)
+            
+            # 6. 更新对话历史（超过硬预算的拒绝提示不写入，之后的提问不会把它当作上下文）
+            with tracer.span("history"):
+                if not self.blocked:
+                    self.conversation_history.append({"role": "user", "content": user_input})
+                    self.conversation_history.append({"role": "assistant", "content": response})
+                
+                # 限制历史长度
+                if len(self.conversation_history) > 8:
+                    self.conversation_history = self.conversation_history[-8:]
+            
+            # 🔥 记录用户会话（附带此前各阶段耗时；会话写入本身的耗时只出现在导出的trace中）
+            with tracer.span("metrics.record_session"):
+                self.metrics_dashboard.record_session(
+                    user_input, response,
+                    stages=stage_timings(root), trace_id=root.trace_id, total_ms=round(root.duration_ms, 3)
+                )
+            
+            # 用户阅读回答期间，后台预取可能的后续问题（超过软预算后暂停，不再推测性地花费token）
+            if self.prefetch_engine:
+                budget = self.meter.check(self.session_id)
+                if budget.level == "ok":
+                    with tracer.span("prefetch.schedule"):
+                        self.prefetch_engine.schedule(self, user_input, response)
+                else:
+                    self.meter.record_action(budget, "prefetch_paused")
+            
+            # 修复：正确设置会话结束状态（只在Streamlit脚本线程中，后台执行器线程没有会话上下文）
+            if get_script_run_ctx(suppress_warning=True) is not None and 'conversation_ended' in st.session_state:
+                st.session_state.conversation_ended = True
         
         return response
     
+    def fork(self):
+        """复制一个共享配置、但对话状态独立的Agent（用于后台预取等推测性调用）"""
+        clone = copy.copy(self)
+        clone.conversation_history = list(self.conversation_history)
+        clone.user_profile = dict(self.user_profile)
+        clone.prefetch_engine = None
+        return clone
+    
     def get_status(self):
         """获取Agent状态"""
         return {
@@ -212,6 +452,8 @@ AI回复：
         self.conversation_history = []
         self.user_profile = {}
         self.current_state = "general"
+        if self.prefetch_engine:
+            self.prefetch_engine.reset()
     
     def get_conversation_summary(self):
         """获取对话摘要"""
@@ -232,17 +474,13 @@ AI回复：
 # 测试函数
 def test_agent():
     """测试Agent功能"""
-    import os
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    api_key = os.getenv('DEEPSEEK_API_KEY')
+    from config import get_api_keys
     
-    if not api_key:
-        print("❌ 请设置 DEEPSEEK_API_KEY 环境变量")
+    if not get_api_keys():
+        print("❌ 请设置 DEEPSEEK_API_KEY 或 DEEPSEEK_API_KEYS 环境变量")
         return
     
-    agent = CareerAgent(api_key)
+    agent = CareerAgent()
     
     # 测试对话
     test_inputs = [
@@ -28,14 +28,44 @@ def get_api_key():
     # 方法4: 如果以上都失败，返回None
     return None
 
+def _split_keys(value):
+    """密钥配置（逗号或换行分隔的字符串，或列表）-> 密钥列表"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace("\n", ",").split(",")
+    return [str(key).strip() for key in value if str(key).strip()]
+
+def get_api_keys():
+    """获取全部API密钥（密钥池使用）：DEEPSEEK_API_KEYS（逗号或换行分隔，secrets中也可写成列表）
+    加上 DEEPSEEK_API_KEY，按出现顺序去重"""
+    keys = []
+    try:
+        import streamlit as st
+        if hasattr(st, 'secrets') and 'DEEPSEEK_API_KEYS' in st.secrets:
+            keys.extend(_split_keys(st.secrets['DEEPSEEK_API_KEYS']))
+    except:
+        pass
+    keys.extend(_split_keys(os.getenv('DEEPSEEK_API_KEYS')))
+    if not keys:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+            keys.extend(_split_keys(os.getenv('DEEPSEEK_API_KEYS')))
+        except:
+            pass
+    keys.extend(_split_keys(get_api_key()))
+    return list(dict.fromkeys(keys))
+
 # 配置常量
 DEEPSEEK_API_KEY = get_api_key()
-DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+# 可用环境变量指向本地mock服务（见 benchmarks/mock_deepseek.py）
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
 
 # 验证配置
 if __name__ == "__main__":
-    if DEEPSEEK_API_KEY:
-        print("✅ API Key loaded successfully")
+    if DEEPSEEK_API_KEY or get_api_keys():
+        print(f"✅ API Key loaded successfully（共 {len(get_api_keys())} 个）")
     else:
         print("⚠️  Warning: DEEPSEEK_API_KEY not found")
         print("请设置环境变量 DEEPSEEK_API_KEY 或创建 .env 文件")
\ No newline at end of file
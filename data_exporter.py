@@ -0,0 +1,181 @@
+# data_exporter.py - 反馈与指标事件的流式导出（JSONL / CSV，可选gzip）
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+
+# 各类数据导出的列（CSV表头顺序）
+EXPORT_COLUMNS = {
+    "feedback": ["id", "timestamp", "type", "rating", "content", "contact"],
+    "api_calls": ["timestamp", "success", "response_time", "user_input", "error_msg", "policy", "output_tokens",
+                  "prompt_tokens", "cached_tokens", "cost", "session_id"],
+    "sessions": ["timestamp", "user_input", "response_preview", "session_duration"]
+}
+
+CHUNK_SIZE = 1 << 16
+
+def iter_json_array(path, key, chunk_size=CHUNK_SIZE):
+    """流式读取JSON文件顶层 key 对应数组中的元素，不把整个文件读入内存"""
+    decoder = json.JSONDecoder()
+    # 字符串值中的引号会被转义，未转义的 "key": [ 只可能是键
+    start_pattern = re.compile(r'(?<!\\)"' + re.escape(key) + r'"\s*:\s*\[')
+    skip_pattern = re.compile(r'[\s,]*')
+
+    with open(path, 'r', encoding='utf-8') as f:
+        # 1. 找到 "key": [
+        buffer = ""
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            match = start_pattern.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            if not chunk:
+                return
+            # 保留末尾一段，防止标记被切在两个块之间
+            buffer = buffer[-(len(key) + 64):]
+
+        # 2. 逐个解析数组元素
+        pos = 0
+        while True:
+            pos = skip_pattern.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield item
+
+def in_time_range(timestamp, start_time=None, end_time=None):
+    """ISO时间字符串范围判断（[start_time, end_time)，字典序即时间序）"""
+    if start_time and timestamp < start_time:
+        return False
+    if end_time and timestamp >= end_time:
+        return False
+    return True
+
+def iter_feedbacks(feedback_system, filters=None, batch_size=1000):
+    """按条件流式遍历反馈，筛选和时间范围下推到SQLite索引"""
+    return feedback_system.index.iter_query(filters, batch_size=batch_size)
+
+def iter_metric_events(metrics_dashboard, kind="api_calls", start_time=None, end_time=None):
+    """流式遍历指标事件：先输出范围内的归档分区，再输出 metrics.json 中的原始事件"""
+    if kind == "api_calls" and os.path.isdir(metrics_dashboard.archive_dir):
+        from metrics_archive import MetricsArchive
+        archive = MetricsArchive(metrics_dashboard.archive_dir)
+        for date_str in archive.list_days():
+            if start_time and date_str < start_time[:10]:
+                continue
+            if end_time and date_str > end_time[:10]:
+                continue
+            # 归档只有数值列，逐个分区读取（内存映射），内存占用以单日分区为上限
+            partition = archive.load_partition(date_str)
+            timestamps = np.round(partition.api_ts * 1e6).astype(np.int64).astype("datetime64[us]").astype(str)
+            for timestamp, success, latency in zip(timestamps, partition.api_success, partition.api_latency):
+                timestamp = str(timestamp)
+                if not in_time_range(timestamp, start_time, end_time):
+                    continue
+                yield {
+                    "timestamp": timestamp,
+                    "success": bool(success),
+                    "response_time": None if np.isnan(latency) else float(latency),
+                    "user_input": None,
+                    "error_msg": None,
+                    "policy": None,
+                    "output_tokens": None
+                }
+
+    for event in iter_json_array(metrics_dashboard.data_file, kind):
+        if in_time_range(event.get("timestamp", ""), start_time, end_time):
+            yield event
+
+def open_export_file(path, compress=None):
+    """打开导出文件（文本模式），compress 为None时按 .gz 后缀判断"""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return io.TextIOWrapper(gzip.open(path, "wb", compresslevel=6), encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def write_records(records, out, fmt, columns):
+    """逐条写出记录，返回写出的条数（内存占用与记录数无关）"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def guess_format(path):
+    """根据文件名推断导出格式"""
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+def export_to_file(kind, path, fmt=None, compress=None, filters=None, start_time=None, end_time=None,
+                   feedback_system=None, metrics_dashboard=None):
+    """把反馈或指标事件流式导出到文件，返回导出条数"""
+    fmt = fmt or guess_format(path)
+
+    if kind == "feedback":
+        if feedback_system is None:
+            from feedback_system import FeedbackSystem
+            feedback_system = FeedbackSystem()
+        filters = dict(filters or {})
+        if start_time:
+            filters["start_time"] = start_time
+        if end_time:
+            filters["end_time"] = end_time
+        records = iter_feedbacks(feedback_system, filters)
+    else:
+        if metrics_dashboard is None:
+            from metrics_dashboard import MetricsDashboard
+            metrics_dashboard = MetricsDashboard()
+        records = iter_metric_events(metrics_dashboard, kind, start_time, end_time)
+
+    with open_export_file(path, compress) as out:
+        return write_records(records, out, fmt, EXPORT_COLUMNS[kind])
+
+def export_file_name(kind, fmt, compress):
+    """生成带时间戳的导出文件名"""
+    suffix = f".{fmt}" + (".gz" if compress else "")
+    return f"{kind}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI职业规划师 - 数据流式导出")
+    parser.add_argument("kind", choices=list(EXPORT_COLUMNS.keys()), help="导出的数据类型")
+    parser.add_argument("output", help="输出文件（.jsonl/.csv，可加 .gz 压缩）")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="导出格式（默认按文件名推断）")
+    parser.add_argument("--start", default=None, help="开始时间（含），如 2025-11-01")
+    parser.add_argument("--end", default=None, help="结束时间（不含），如 2025-12-01")
+    parser.add_argument("--type", default=None, help="反馈类型（仅feedback）")
+    parser.add_argument("--min-rating", type=int, default=None, help="最低评分（仅feedback）")
+    parser.add_argument("--keyword", default=None, help="内容关键词（仅feedback）")
+    args = parser.parse_args()
+
+    filters = {"type": args.type, "min_rating": args.min_rating, "keyword": args.keyword}
+    count = export_to_file(args.kind, args.output, fmt=args.format, filters=filters,
+                           start_time=args.start, end_time=args.end)
+    print(f"✅ 已导出 {count} 条记录到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# feedback_index.py - 反馈查询引擎（SQLite索引 + 全文检索 + 键集分页）
+import json
+import os
+import sqlite3
+import tempfile
+
+# 反馈列表的排序键：时间倒序，时间相同时按ID倒序（保证键集分页稳定）
+ORDER_BY = "timestamp DESC, id DESC"
+
+class FeedbackIndex:
+    """feedback.json 的SQLite查询索引
+
+    feedback.json 仍然是数据源；索引记录同步时数据文件的修改时间和大小，
+    文件被外部修改后下次查询会自动重建。FeedbackSystem.submit_feedback 会增量写入。
+    """
+
+    def __init__(self, data_file="data/feedback.json", db_file=None):
+        self.data_file = data_file
+        self.db_file = db_file or os.path.splitext(data_file)[0] + ".db"
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def file_stat(self):
+        """数据文件的 (mtime_ns, size)，用于判断索引是否过期"""
+        try:
+            stat = os.stat(self.data_file)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return None
+
+    def _create_schema(self, conn):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS feedbacks (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE,
+                timestamp TEXT,
+                type TEXT,
+                rating INTEGER,
+                content TEXT,
+                contact TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_timestamp ON feedbacks(timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_type ON feedbacks(type, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_rating ON feedbacks(rating, timestamp, id);
+        """)
+        try:
+            # trigram分词不依赖空格，适合中文子串检索（需要SQLite 3.34+）
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS feedbacks_fts USING fts5(
+                    content, content='feedbacks', content_rowid='rowid', tokenize='trigram'
+                )
+            """)
+            self._set_meta(conn, "fts", "1")
+        except sqlite3.OperationalError:
+            self._set_meta(conn, "fts", "0")
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _insert(self, conn, feedbacks):
+        rows = [
+            (fb.get("id"), fb.get("timestamp", ""), fb.get("type", ""), fb.get("rating", 0),
+             fb.get("content", ""), fb.get("contact", ""))
+            for fb in feedbacks
+        ]
+        conn.executemany(
+            "INSERT OR REPLACE INTO feedbacks (id, timestamp, type, rating, content, contact) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def rebuild(self):
+        """从 feedback.json 全量重建索引"""
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            feedbacks = json.load(f).get("feedbacks", [])
+        stat = self.file_stat()
+
+        # 每次重建使用独立的临时文件（同目录，保证 os.replace 是原子替换），多个会话同时重建不会互相覆盖
+        fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(self.db_file) + ".",
+                                        suffix=".tmp", dir=os.path.dirname(self.db_file) or ".")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(tmp_file)
+            conn.row_factory = sqlite3.Row
+            try:
+                self._create_schema(conn)
+                self._insert(conn, feedbacks)
+                if self._get_meta(conn, "fts") == "1":
+                    conn.execute("INSERT INTO feedbacks_fts(feedbacks_fts) VALUES ('rebuild')")
+                self._set_meta(conn, "source_stat", stat)
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(tmp_file, self.db_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        print(f"🔧 反馈索引已重建，共 {len(feedbacks)} 条")
+
+    def sync(self):
+        """索引不存在或数据文件已变化时重建"""
+        if os.path.exists(self.db_file):
+            conn = self._connect()
+            try:
+                if self._get_meta(conn, "source_stat") == self.file_stat():
+                    return
+            except sqlite3.DatabaseError:
+                pass
+            finally:
+                conn.close()
+        self.rebuild()
+
+    def add(self, feedback_record, previous_stat):
+        """增量写入一条新反馈
+
+        previous_stat: 写入 feedback.json 之前的文件状态；与索引记录不一致说明索引已过期，
+        此时不做增量更新，留给下次查询重建
+        """
+        if not os.path.exists(self.db_file):
+            return
+        conn = self._connect()
+        try:
+            if self._get_meta(conn, "source_stat") != previous_stat:
+                return
+            self._insert(conn, [feedback_record])
+            if self._get_meta(conn, "fts") == "1":
+                conn.execute(
+                    "INSERT INTO feedbacks_fts(rowid, content) SELECT rowid, content FROM feedbacks WHERE id = ?",
+                    (feedback_record.get("id"),)
+                )
+            self._set_meta(conn, "source_stat", self.file_stat())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _where(self, conn, filters):
+        """把筛选条件转换为SQL条件"""
+        clauses = []
+        params = []
+        filters = filters or {}
+
+        if filters.get("type"):
+            clauses.append("type = ?")
+            params.append(filters["type"])
+        if filters.get("min_rating"):
+            clauses.append("rating >= ?")
+            params.append(int(filters["min_rating"]))
+        if filters.get("start_time"):
+            clauses.append("timestamp >= ?")
+            params.append(filters["start_time"])
+        if filters.get("end_time"):
+            clauses.append("timestamp < ?")
+            params.append(filters["end_time"])
+
+        keyword = (filters.get("keyword") or "").strip()
+        if keyword:
+            # trigram索引要求至少3个字符，更短的关键词回退到LIKE
+            if len(keyword) >= 3 and self._get_meta(conn, "fts") == "1":
+                clauses.append("rowid IN (SELECT rowid FROM feedbacks_fts WHERE feedbacks_fts MATCH ?)")
+                params.append('"' + keyword.replace('"', '""') + '"')
+            else:
+                clauses.append("content LIKE ? ESCAPE '\\'")
+                escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+
+        return clauses, params
+
+    def query(self, filters=None, cursor=None, limit=10):
+        """按条件查询反馈（时间倒序，键集分页）
+
+        filters: {"type", "min_rating", "keyword", "start_time", "end_time"}，均可选
+        cursor: 上一页返回的 next_cursor，首页为None
+        返回: {"items": [...], "next_cursor": 下一页游标或None}
+        """
+        self.sync()
+        conn = self._connect()
+        try:
+            clauses, params = self._where(conn, filters)
+            if cursor:
+                # 游标为上一页最后一条的 (timestamp, id)
+                clauses.append("(timestamp, id) < (?, ?)")
+                params.extend([cursor[0], cursor[1]])
+
+            sql = "SELECT id, timestamp, type, rating, content, contact FROM feedbacks"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            sql += f" ORDER BY {ORDER_BY} LIMIT ?"
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = (items[-1]["timestamp"], items[-1]["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def count(self, filters=None):
+        """统计满足条件的反馈数"""
+        self.sync()
+        conn = self._connect()
+        try:
+            clauses, params = self._where(conn, filters)
+            sql = "SELECT COUNT(*) FROM feedbacks"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def iter_query(self, filters=None, batch_size=1000):
+        """按批遍历所有满足条件的反馈（用于导出等场景）"""
+        cursor = None
+        while True:
+            page = self.query(filters, cursor=cursor, limit=batch_size)
+            for item in page["items"]:
+                yield item
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
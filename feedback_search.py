@@ -0,0 +1,231 @@
+# feedback_search.py - 反馈内容全文检索（中文字符二元组倒排索引，相关度排序 + 高亮）
+import html
+import math
+import re
+import threading
+from array import array
+
+import numpy as np
+
+# 中文按连续汉字切分为二元组，英文/数字按单词
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]+|[a-z0-9]+")
+
+def tokenize(text):
+    """分词：汉字串生成字符二元组（单字保留为一元），字母数字串保留为整词"""
+    tokens = []
+    for run in TOKEN_PATTERN.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+class FeedbackSearchIndex:
+    """反馈内容的倒排索引
+
+    文档编号即反馈在 feedbacks 列表中的位置（越大越新），倒排表为升序的uint32数组。
+    新反馈先追加到增量表，查询时按需合并，因此 submit_feedback 可以O(内容长度)增量更新。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = {}  # token -> np.ndarray[uint32]
+        self.pending = {}   # token -> array('I')，尚未合并的增量
+        self.feedbacks = []
+        self.source_stat = None
+        # 筛选用的逐文档列：评分、类型编号（类型名 -> 编号），查询时零拷贝转换为NumPy数组
+        self.ratings = array("i")
+        self.type_ids = array("I")
+        self.type_codes = {}
+
+    @classmethod
+    def build(cls, feedbacks, source_stat=None):
+        """从反馈列表全量构建索引"""
+        index = cls()
+        for feedback in feedbacks:
+            index._append(feedback)
+        index._merge_pending()
+        index.source_stat = source_stat
+        return index
+
+    def _append(self, feedback):
+        self._add_tokens(len(self.feedbacks), feedback.get("content", ""))
+        self.feedbacks.append(feedback)
+        try:
+            rating = int(feedback.get("rating") or 0)
+        except (TypeError, ValueError):
+            rating = 0
+        self.ratings.append(rating)
+        self.type_ids.append(self.type_codes.setdefault(feedback.get("type", ""), len(self.type_codes)))
+
+    def _add_tokens(self, doc_id, content):
+        for token in set(tokenize(content)):
+            postings = self.pending.get(token)
+            if postings is None:
+                postings = self.pending[token] = array("I")
+            postings.append(doc_id)
+
+    def _merge_pending(self, tokens=None):
+        """把增量表合并进倒排表（只合并查询用到的token）"""
+        for token in list(self.pending.keys()) if tokens is None else tokens:
+            delta = self.pending.pop(token, None)
+            if delta is None:
+                continue
+            delta = np.frombuffer(delta, dtype=np.uint32)
+            existing = self.postings.get(token)
+            self.postings[token] = delta.copy() if existing is None else np.concatenate([existing, delta])
+
+    def add(self, feedback, source_stat=None):
+        """增量加入一条新反馈"""
+        with self.lock:
+            self._append(feedback)
+            self.source_stat = source_stat
+
+    def _query_tokens(self, query):
+        """查询分词；单个汉字查询展开为包含该字的所有二元组"""
+        tokens = []
+        for token in set(tokenize(query)):
+            if len(token) == 1 and not token.isascii():
+                tokens.extend(t for t in list(self.postings) + list(self.pending) if token in t)
+            else:
+                tokens.append(token)
+        return list(set(tokens))
+
+    def search(self, query, limit=20, filters=None):
+        """相关度排序检索
+
+        得分 = 命中的查询二元组的IDF之和，完整包含查询串的文档额外加分，
+        同分按时间倒序。filters（type / min_rating）在排序前作用于全部命中文档，
+        不会因为其他类型的文档得分更高而漏掉。返回 [{"feedback", "score", "highlight"}]
+        """
+        query = (query or "").strip()
+        if not query or limit <= 0:
+            return []
+
+        with self.lock:
+            tokens = self._query_tokens(query)
+            self._merge_pending(tokens)
+            doc_count = len(self.feedbacks)
+            lists = {token: self.postings[token] for token in tokens if token in self.postings}
+            feedbacks = self.feedbacks
+            ratings = np.frombuffer(self.ratings, dtype=np.int32)[:doc_count].copy()
+            type_ids = np.frombuffer(self.type_ids, dtype=np.uint32)[:doc_count].copy()
+            type_code = self.type_codes.get((filters or {}).get("type"))
+
+        if not lists or doc_count == 0:
+            return []
+
+        # 向量化累加每个文档的得分
+        idf = {token: math.log(1 + doc_count / postings.size) for token, postings in lists.items()}
+        doc_ids = np.concatenate(list(lists.values()))
+        weights = np.concatenate([np.full(postings.size, idf[token]) for token, postings in lists.items()])
+        scores = np.bincount(doc_ids, weights=weights, minlength=doc_count)
+
+        # 筛选在排序之前作用于全部命中文档
+        keep = scores > 0
+        if filters and filters.get("type"):
+            if type_code is None:
+                return []
+            keep &= type_ids == type_code
+        if filters and filters.get("min_rating"):
+            keep &= ratings >= int(filters["min_rating"])
+        matched = np.flatnonzero(keep)  # 升序，即从旧到新
+        if matched.size == 0:
+            return []
+        scores = scores[matched]
+
+        # 完整包含查询串的文档加上所有查询token的IDF之和，排在所有不完整匹配的文档之前。
+        # 它们必然包含查询自身的全部二元组：只在这些候选中按（得分, 新旧）顺序做子串匹配，凑够 limit 条即停
+        phrase_positions = []
+        required = [t for t in set(tokenize(query)) if t.isascii() or len(t) > 1]
+        if all(token in lists for token in required):
+            if required:
+                hits = np.bincount(np.concatenate([lists[t] for t in required]), minlength=doc_count)
+                candidates = np.flatnonzero(hits[matched] == len(required))
+            else:
+                candidates = np.arange(matched.size)
+            query_lower = query.lower()
+            values = np.sort(scores[candidates])[::-1]
+            for value in values[np.r_[True, values[1:] != values[:-1]]] if values.size else values:
+                group = candidates[scores[candidates] == value]
+                for position in group[::-1]:
+                    if query_lower in feedbacks[matched[position]].get("content", "").lower():
+                        phrase_positions.append(int(position))
+                        if len(phrase_positions) >= limit:
+                            break
+                if len(phrase_positions) >= limit:
+                    break
+
+        phrase_bonus = sum(idf.values())
+        ranked = [(position, float(scores[position]) + phrase_bonus) for position in phrase_positions]
+        if len(ranked) < limit:
+            rest = np.ones(matched.size, dtype=bool)
+            rest[phrase_positions] = False
+            rest = np.flatnonzero(rest)
+            top = top_positions(scores[rest], matched[rest], limit - len(ranked))
+            ranked.extend((int(rest[i]), float(scores[rest[i]])) for i in top)
+
+        return [
+            {"feedback": feedbacks[matched[position]], "score": round(score, 3),
+             "highlight": highlight(feedbacks[matched[position]].get("content", ""), query)}
+            for position, score in ranked
+        ]
+
+def top_positions(scores, ids, k):
+    """得分最高的 k 个位置，得分优先、同分时 ids 大者（更新）优先；ids 须为升序
+
+    用 np.partition 找到第 k 大的得分，只对入选的 k 个位置排序，不对全部命中文档排序
+    """
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if scores.size > k:
+        threshold = np.partition(scores, scores.size - k)[scores.size - k]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)
+        positions = np.concatenate([above, ties[len(ties) - (k - len(above)):]])
+    else:
+        positions = np.arange(scores.size)
+    return positions[np.lexsort((ids[positions], scores[positions]))[::-1]]
+
+def highlight(content, query, context=40):
+    """生成高亮片段（HTML转义后用<mark>标出命中的查询词或二元组）"""
+    content = content or ""
+    lower = content.lower()
+    query_lower = (query or "").strip().lower()
+
+    # 优先高亮完整查询串，否则高亮命中的二元组
+    terms = [query_lower] if query_lower and query_lower in lower else sorted(set(tokenize(query)), key=len, reverse=True)
+    spans = []
+    for term in terms:
+        start = lower.find(term)
+        while term and start >= 0:
+            spans.append((start, start + len(term)))
+            start = lower.find(term, start + len(term))
+    if not spans:
+        return html.escape(content[:context * 2])
+
+    # 合并重叠区间
+    spans.sort()
+    merged = [list(spans[0])]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    # 截取第一个命中附近的片段
+    window_start = max(0, merged[0][0] - context)
+    window_end = min(len(content), merged[0][1] + context)
+    parts = ["…" if window_start > 0 else ""]
+    cursor = window_start
+    for start, end in merged:
+        if start >= window_end:
+            break
+        parts.append(html.escape(content[cursor:start]))
+        parts.append(f"<mark>{html.escape(content[start:min(end, window_end)])}</mark>")
+        cursor = min(end, window_end)
+    parts.append(html.escape(content[cursor:window_end]))
+    parts.append("…" if window_end < len(content) else "")
+    return "".join(parts)
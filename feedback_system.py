@@ -2,11 +2,29 @@ import json
 import os
 import uuid
 from datetime import datetime
+from feedback_index import FeedbackIndex
+from feedback_search import FeedbackSearchIndex
+from telemetry import CACHE_REQUESTS, STORAGE_WRITE_LATENCY
+
+# 只读快照缓存：{数据文件: ((mtime_ns, size), data, 按时间倒序的反馈列表)}
+_snapshot_cache = {}
+
+# 全文检索倒排索引缓存：{数据文件: FeedbackSearchIndex}
+_search_cache = {}
+
+def _feedback_time(fb):
+    """反馈时间（用于排序），无法解析时排在最后"""
+    ts = fb.get("timestamp", "")
+    try:
+        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except:
+        return datetime.min
 
 class FeedbackSystem:
     def __init__(self, data_file="data/feedback.json"):
         self.data_file = data_file
         self.ensure_data_file()
+        self.index = FeedbackIndex(data_file)  # SQLite查询索引（首次查询时创建）
     
     def ensure_data_file(self):
         """确保反馈数据文件存在"""
@@ -70,11 +88,33 @@ class FeedbackSystem:
                 "other": 0
             }}
     
+    def _load_snapshot(self):
+        """加载只读快照 - 文件修改时间和大小不变时直接复用已解析、已排序的数据"""
+        try:
+            stat = os.stat(self.data_file)
+            key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            data = self._load_data()
+            return data, sorted(data.get("feedbacks", []), key=_feedback_time, reverse=True)
+
+        cached = _snapshot_cache.get(self.data_file)
+        if cached and cached[0] == key:
+            CACHE_REQUESTS.labels("feedback_snapshot", "hit").inc()
+            return cached[1], cached[2]
+
+        CACHE_REQUESTS.labels("feedback_snapshot", "miss").inc()
+        data = self._load_data()
+        # 按时间排序（最新的在前），排序结果随快照缓存
+        sorted_feedbacks = sorted(data.get("feedbacks", []), key=_feedback_time, reverse=True)
+        _snapshot_cache[self.data_file] = (key, data, sorted_feedbacks)
+        return data, sorted_feedbacks
+    
     def _save_data(self, data):
         """保存数据"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with STORAGE_WRITE_LATENCY.labels("feedback").time():
+                with open(self.data_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
             return True
         except Exception as e:
             print(f"❌ 保存数据失败: {e}")
@@ -104,8 +144,14 @@ class FeedbackSystem:
             # 更新统计
             self._update_summary(data)
             
-            # 保存
+            # 保存，并增量写入查询索引
+            previous_stat = self.index.file_stat()
             if self._save_data(data):
+                self.index.add(feedback_record, previous_stat)
+                # 倒排索引与写入前的文件一致时增量更新，否则下次检索时重建
+                search_index = _search_cache.get(self.data_file)
+                if search_index is not None and search_index.source_stat == previous_stat:
+                    search_index.add(feedback_record, self.index.file_stat())
                 return feedback_id
             return None
             
@@ -162,8 +208,8 @@ class FeedbackSystem:
     def get_feedback_stats(self):
         """获取反馈统计"""
         try:
-            data = self._load_data()
-            return data["summary"]
+            data, _ = self._load_snapshot()
+            return dict(data["summary"])
         except:
             return {
                 "total_feedbacks": 0,
@@ -177,34 +223,58 @@ class FeedbackSystem:
     def get_all_feedbacks(self):
         """获取所有反馈"""
         try:
-            data = self._load_data()
-            feedbacks = data.get("feedbacks", [])
-            
-            # 按时间排序（最新的在前）
-            def get_time(fb):
-                ts = fb.get("timestamp", "")
-                try:
-                    return datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                except:
-                    return datetime.min
-            
-            return sorted(feedbacks, key=get_time, reverse=True)
+            _, sorted_feedbacks = self._load_snapshot()
+            return list(sorted_feedbacks)
         except Exception as e:
             print(f"❌ 获取所有反馈失败: {e}")
             return []
     
+    def query_feedbacks(self, filters=None, cursor=None, limit=10):
+        """按条件分页查询反馈（SQLite索引，时间倒序，键集分页）"""
+        try:
+            return self.index.query(filters, cursor=cursor, limit=limit)
+        except Exception as e:
+            print(f"❌ 查询反馈失败: {e}")
+            return {"items": [], "next_cursor": None}
+    
+    def get_search_index(self):
+        """获取内容倒排索引（数据文件变化时重建）"""
+        stat = self.index.file_stat()
+        search_index = _search_cache.get(self.data_file)
+        if search_index is None or search_index.source_stat != stat:
+            data, _ = self._load_snapshot()
+            search_index = FeedbackSearchIndex.build(data.get("feedbacks", []), source_stat=stat)
+            _search_cache[self.data_file] = search_index
+        return search_index
+    
+    def search_feedbacks(self, query, limit=20, filters=None):
+        """按内容全文检索反馈，按相关度排序并返回高亮片段"""
+        try:
+            return self.get_search_index().search(query, limit=limit, filters=filters)
+        except Exception as e:
+            print(f"❌ 检索反馈失败: {e}")
+            return []
+    
+    def count_feedbacks(self, filters=None):
+        """统计满足条件的反馈数"""
+        try:
+            return self.index.count(filters)
+        except Exception as e:
+            print(f"❌ 统计反馈失败: {e}")
+            return 0
+    
     def get_recent_feedbacks(self, limit=10):
         """获取最近反馈"""
         try:
-            all_feedbacks = self.get_all_feedbacks()
-            return all_feedbacks[:limit]
+            _, sorted_feedbacks = self._load_snapshot()
+            return sorted_feedbacks[:limit]
         except:
             return []
     
     def get_rating_distribution(self):
         """获取评分分布"""
         try:
-            feedbacks = self.get_all_feedbacks()
+            _, feedbacks = self._load_snapshot()
             distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
             
             for fb in feedbacks:
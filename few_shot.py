@@ -0,0 +1,76 @@
+# few_shot.py - 按对话模式选择少样本示例（示例库存放在 few_shot_examples/<模式>.json）
+import json
+import os
+import threading
+
+from tokens import estimate_tokens
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "few_shot_examples")
+MAX_EXAMPLES = 2              # 每轮最多放入的示例数
+EXAMPLE_TOKEN_BUDGET = 450    # 示例部分的token上限
+FALLBACK_STATE = "general"    # 当前模式没有示例文件时使用
+
+_cache = {}  # 文件路径 -> (mtime, 示例列表)
+_cache_lock = threading.Lock()
+
+def load_examples(state, directory=EXAMPLES_DIR):
+    """读取某个模式的示例列表；文件修改后下次读取自动生效，文件不存在时返回空列表
+
+    每个示例为 {"id", "title", "keywords", "user", "reply"}
+    """
+    path = os.path.join(directory, f"{state}.json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            examples = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 示例文件读取失败 {path}: {e}")
+        return cached[1] if cached else []
+    for example in examples:
+        example["_text"] = f"{example['title']}\n*用户输入：{example['user']}*\nAI回复：\n{example['reply']}"
+        example["_tokens"] = estimate_tokens(example["_text"])
+    with _cache_lock:
+        _cache[path] = (mtime, examples)
+    return examples
+
+def relevance(example, text):
+    """示例关键词在用户输入（及画像）中出现的个数"""
+    return sum(1 for keyword in example.get("keywords", []) if keyword.lower() in text)
+
+def select_examples(state, user_input, profile_text="", max_examples=MAX_EXAMPLES,
+                    token_budget=EXAMPLE_TOKEN_BUDGET, directory=EXAMPLES_DIR):
+    """选出与本轮最相关的示例（不超过 max_examples 个、合计不超过 token_budget）
+
+    第一个示例总会放入（作为回答风格的参照），之后的示例只有与输入相关时才放入；
+    相关度相同时按文件中的顺序
+    """
+    candidates = load_examples(state, directory) or load_examples(FALLBACK_STATE, directory)
+    text = f"{user_input}\n{profile_text}".lower()
+    ranked = sorted(enumerate(candidates), key=lambda item: (-relevance(item[1], text), item[0]))
+
+    selected = []
+    used = 0
+    for _, example in ranked:
+        if len(selected) >= max_examples:
+            break
+        if selected and relevance(example, text) == 0:
+            break
+        if used + example["_tokens"] > token_budget:
+            continue
+        selected.append(example)
+        used += example["_tokens"]
+    return selected
+
+def format_examples(examples):
+    """示例拼成系统提示中的一段；没有示例时返回空字符串"""
+    if not examples:
+        return ""
+    blocks = [f"示例{i}：{example['_text']}" for i, example in enumerate(examples, 1)]
+    return "下面是一些咨询示例，请按照示例的风格和结构回答用户问题\n\n" + "\n\n".join(blocks)
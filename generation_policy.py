@@ -0,0 +1,83 @@
+# generation_policy.py - 按对话模式和输入长度选择生成参数（max_tokens、temperature、stop）
+#
+# 策略表在 generation_policy.json（可用环境变量 GENERATION_POLICY_FILE 指定其他文件），运维可直接编辑，
+# 文件修改后下一次调用自动生效，无需重启。规则按顺序匹配，第一条命中的生效，都不命中时用 default：
+#   {"name": "greeting", "states": ["general"], "min_input_chars": 0, "max_input_chars": 8,
+#    "max_tokens": 200, "temperature": 0.5, "stop": ["**二"]}
+# states 省略或包含 "*" 时匹配所有模式；min/max_input_chars 省略时不限制输入长度。
+#
+# 用法：python generation_policy.py   # 按策略统计 data/metrics.json 中的输出token和延迟
+import json
+import os
+import threading
+
+POLICY_FILE = os.getenv(
+    "GENERATION_POLICY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "generation_policy.json")
+)
+# 策略文件缺失或无法解析时使用（与改造前的请求参数一致，只是不限制输出长度）
+DEFAULT_POLICY = {"name": "default", "max_tokens": None, "temperature": 0.7, "stop": []}
+
+_table = {"key": None, "default": DEFAULT_POLICY, "policies": []}
+_table_lock = threading.Lock()
+
+def _normalize(rule, fallback):
+    policy = dict(fallback)
+    policy.update({k: v for k, v in rule.items() if k in ("name", "max_tokens", "temperature", "stop")})
+    policy["stop"] = list(policy.get("stop") or [])
+    return policy
+
+def load_policies(path=None):
+    """返回 (default, [规则...])；文件修改后重新读取，读取失败时沿用上一次成功加载的策略表"""
+    path = path or POLICY_FILE
+    try:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return DEFAULT_POLICY, []
+    with _table_lock:
+        if _table["key"] == key:
+            return _table["default"], _table["policies"]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        default = _normalize(raw.get("default", {}), DEFAULT_POLICY)
+        policies = [dict(rule, **_normalize(rule, default)) for rule in raw.get("policies", [])]
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        print(f"⚠️ 生成策略读取失败 {path}: {e}")
+        with _table_lock:
+            _table["key"] = key  # 同一个错误文件不再反复解析
+            return _table["default"], _table["policies"]
+    with _table_lock:
+        _table.update(key=key, default=default, policies=policies)
+    print(f"🎛️ 已加载生成策略 {path}（{len(policies)} 条规则）")
+    return default, policies
+
+def select_policy(state, user_input, path=None):
+    """本轮使用的生成参数：{"name", "max_tokens", "temperature", "stop"}"""
+    default, policies = load_policies(path)
+    length = len((user_input or "").strip())
+    for rule in policies:
+        states = rule.get("states") or ["*"]
+        if "*" not in states and state not in states:
+            continue
+        if length < rule.get("min_input_chars", 0):
+            continue
+        if rule.get("max_input_chars") is not None and length > rule["max_input_chars"]:
+            continue
+        return {key: rule[key] for key in ("name", "max_tokens", "temperature", "stop")}
+    return {key: default[key] for key in ("name", "max_tokens", "temperature", "stop")}
+
+def main():
+    from metrics_dashboard import MetricsDashboard
+
+    stats = MetricsDashboard().get_policy_stats()
+    if not stats:
+        print("暂无带生成策略的API调用记录")
+        return
+    print(f"{'策略':<16} | {'调用':>6} | {'输出token均值':>10} | {'输出token p95':>10} | {'延迟均值s':>8} | {'延迟p95 s':>8}")
+    for name, s in stats.items():
+        print(f"{name:<18} | {s['calls']:>8} | {s['avg_output_tokens']:>14} | {s['p95_output_tokens']:>15} | "
+              f"{s['avg_latency']:>11} | {s['p95_latency']:>10}")
+
+if __name__ == "__main__":
+    main()
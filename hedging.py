@@ -0,0 +1,174 @@
+# hedging.py - 对冲请求（首个响应迟迟不来时再发一份相同请求，先响应的胜出，另一份取消）
+#
+# 默认关闭，设置环境变量 HEDGE_REQUESTS=1 开启：
+#   HEDGE_QUANTILE   发出对冲请求的等待阈值取近期首个响应耗时的分位数（默认95）
+#   HEDGE_MAX_RATE   近期请求中对冲请求的比例上限（默认0.1，即额外上游请求不超过10%）
+#   HEDGE_MIN_DELAY  阈值下限（秒，默认0.5）
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from telemetry import HEDGED_REQUESTS, HEDGE_THRESHOLD
+from turn_executor import CancelToken
+
+class _Race:
+    """一次调用中各份请求的竞争状态：第一个片段或第一个结果到达的请求胜出"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.launched = 0
+        self.winner = None
+        self.first_at = None
+        self.finished = {}  # 请求序号 -> (结果, 异常)
+
+    def claim(self, index):
+        """调用时须持有 cond"""
+        if self.winner is None:
+            self.winner = index
+            self.first_at = time.monotonic()
+            self.cond.notify_all()
+        return self.winner == index
+
+class Hedger:
+    """run(fn, token, emit) 执行一次可对冲的上游调用
+
+    - fn(token, emit) 为一份请求：token 是这份请求自己的取消令牌，emit 分发流式片段
+    - 等待阈值为近期首个响应（流式为首个片段，非流式为完整响应）耗时的分位数，样本不足时不对冲
+    - 近期 window 个请求中对冲的比例不超过 max_rate；近期请求不足 1/max_rate 个时（刚启动）按 1/max_rate 个计，
+      允许先对冲一次，不必等请求数攒够
+    - 胜出的请求确定后立即取消另一份；调用方的 token 被取消时两份都取消
+    """
+
+    def __init__(self, quantile=95, max_rate=0.1, min_delay=0.5, window=500, min_samples=20, poll_interval=0.05):
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.samples = {True: deque(maxlen=window), False: deque(maxlen=window)}  # 是否流式 -> 首个响应耗时
+        self.recent = deque(maxlen=window)  # 近期请求是否发出了对冲
+        self.stats = {"requests": 0, "hedged": 0, "hedge_won": 0, "rate_limited": 0}
+
+    def threshold(self, stream=True):
+        """当前等待阈值（秒）；样本不足时返回 None"""
+        with self.lock:
+            samples = list(self.samples[stream])
+        if len(samples) < self.min_samples:
+            return None
+        value = max(self.min_delay, float(np.percentile(samples, self.quantile)))
+        HEDGE_THRESHOLD.labels("stream" if stream else "plain").set(round(value, 3))
+        return value
+
+    def _allow(self):
+        if self.max_rate <= 0:
+            return False
+        with self.lock:
+            return sum(self.recent) + 1 <= self.max_rate * max(len(self.recent), 1 / self.max_rate)
+
+    def _launch(self, race, index, fn, emit):
+        """调用时须持有 race.cond"""
+        token = CancelToken()
+        race.launched += 1
+
+        def attempt_emit(part):
+            with race.cond:
+                forward = race.claim(index)
+            if forward:
+                emit(part)
+
+        def body():
+            try:
+                outcome = (fn(token, attempt_emit), None)
+            except Exception as e:
+                outcome = (None, e)
+            with race.cond:
+                race.finished[index] = outcome
+                # 出错的请求只有在没有其他请求还在进行时才算胜出
+                if outcome[1] is None or len(race.finished) == race.launched:
+                    race.claim(index)
+                race.cond.notify_all()
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(body,), name=f"hedge-{index}", daemon=True).start()
+        return token
+
+    def run(self, fn, token, emit, stream=True):
+        start = time.monotonic()
+        threshold = self.threshold(stream)
+        race = _Race()
+        result = "not_needed"
+        with race.cond:
+            attempts = [self._launch(race, 0, fn, emit)]
+            hedge_at = start + threshold if threshold is not None else None
+            while not token.cancelled and (race.winner is None or race.winner not in race.finished):
+                if race.winner is not None:
+                    for index, attempt in enumerate(attempts):
+                        if index != race.winner:
+                            attempt.cancel("cancelled")
+                wait = self.poll_interval
+                if race.winner is None and hedge_at is not None:
+                    remaining = hedge_at - time.monotonic()
+                    if remaining <= 0:
+                        hedge_at = None  # 每次调用只判断一次
+                        if self._allow():
+                            attempts.append(self._launch(race, 1, fn, emit))
+                        else:
+                            result = "rate_limited"
+                    else:
+                        wait = min(wait, remaining)
+                race.cond.wait(wait)
+            winner = race.winner
+
+        for index, attempt in enumerate(attempts):
+            if token.cancelled or index != winner:
+                attempt.cancel("cancelled")
+
+        with self.lock:
+            self.stats["requests"] += 1
+            self.recent.append(len(attempts) > 1)
+            if len(attempts) > 1:
+                self.stats["hedged"] += 1
+                self.stats["hedge_won"] += winner == 1
+            elif result == "rate_limited":
+                self.stats["rate_limited"] += 1
+            if race.first_at is not None and not token.cancelled and race.finished.get(winner, (None, None))[1] is None:
+                self.samples[stream].append(race.first_at - start)
+        if len(attempts) > 1:
+            result = "hedge_won" if winner == 1 else "primary_won"
+        HEDGED_REQUESTS.labels(result).inc()
+
+        token.check()
+        value, error = race.finished[winner]
+        if error is not None:
+            raise error
+        return value
+
+    def get_stats(self):
+        """累计的请求数、对冲数、对冲胜出数，以及对冲比例（额外上游请求占比）"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["threshold"] = self.threshold(True)
+        return stats
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+def get_hedger():
+    """进程内共享的对冲器；未设置 HEDGE_REQUESTS=1 时返回 None（不对冲）"""
+    global _hedger
+    if os.getenv("HEDGE_REQUESTS", "0").lower() not in ("1", "true", "yes", "on"):
+        return None
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger(
+                quantile=float(os.getenv("HEDGE_QUANTILE", "95")),
+                max_rate=float(os.getenv("HEDGE_MAX_RATE", "0.1")),
+                min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+            )
+        return _hedger
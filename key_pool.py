@@ -0,0 +1,188 @@
+# key_pool.py - API密钥池（多个DeepSeek账号分摊请求，按密钥跟踪限流和故障）
+#
+# 密钥来自 DEEPSEEK_API_KEYS（逗号或换行分隔，Streamlit secrets 中也可写成列表）和 DEEPSEEK_API_KEY，
+# 见 config.get_api_keys：
+#   - 每次请求选当前在途请求最少的可用密钥（相同时选累计请求最少的）
+#   - 返回429的密钥冷却 Retry-After 秒（响应没有该头时为 KEY_COOLDOWN，默认30秒），同时在途上限减半；
+#     之后每次成功把上限加 1/上限（AIMD），冷却结束时等待的请求不会一拥而上再次触发限流
+#   - 401/403，或连续 KEY_EJECT_AFTER 次（默认3）5xx/网络错误的密钥暂时摘除 KEY_EJECT_SECONDS 秒（默认300）
+#   - 所有密钥都在冷却或被摘除时，等待最早恢复的密钥（最多 KEY_MAX_WAIT 秒，默认5），超时后仍用它发出请求；
+#     429后只有这种等不到恢复的密钥时不再重发，直接返回429
+import os
+import threading
+import time
+
+from telemetry import KEY_IN_FLIGHT, KEY_REQUESTS
+
+def mask_key(key):
+    """指标和日志中显示的密钥名（只保留首尾几位）"""
+    return f"{key[:3]}…{key[-4:]}" if len(key) > 10 else f"…{key[-2:]}"
+
+class KeyState:
+    """单个密钥的负载、计数和冷却/摘除状态（由 KeyPool 加锁修改）"""
+
+    __slots__ = ("key", "name", "in_flight", "requests", "successes", "rate_limited", "failures",
+                 "consecutive_failures", "cooldown_until", "ejected_until", "limit")
+
+    def __init__(self, key, limit):
+        self.key = key
+        self.name = mask_key(key)
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.ejected_until = 0.0
+        self.limit = limit  # 在途请求上限（429时减半，成功时缓慢增加）
+
+    def available_at(self):
+        return max(self.cooldown_until, self.ejected_until)
+
+class KeyPool:
+    """acquire() 取一个密钥，请求结束后 release(state, status) 归还并报告结果"""
+
+    def __init__(self, keys, cooldown=30, eject_after=3, eject_seconds=300, max_wait=5, max_concurrency=32,
+                 poll_interval=0.1):
+        keys = list(dict.fromkeys(key for key in keys if key))
+        if not keys:
+            raise ValueError("密钥池至少需要一个API密钥")
+        self.keys = [KeyState(key, max_concurrency) for key in keys]
+        self.cooldown = cooldown
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def acquire(self, exclude=(), cancel_token=None):
+        """选出在途请求最少的可用密钥（exclude 中的密钥不选，除非没有别的密钥）
+
+        没有可用密钥（都在冷却、被摘除或在途请求已达上限）时等待，最多 max_wait 秒，超时后选最早恢复的；等待期间 cancel_token 被取消则抛出 TurnCancelled
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self.cond:
+            candidates = [state for state in self.keys if state not in exclude] or self.keys
+            while True:
+                now = time.monotonic()
+                ready = [state for state in candidates if state.available_at() <= now and state.in_flight < state.limit]
+                if ready or now >= deadline:
+                    break
+                if cancel_token is not None:
+                    cancel_token.check()
+                # 在途请求结束时 release 会唤醒等待者；冷却到期则靠超时醒来
+                wait = min(max(min(state.available_at() for state in candidates), now + self.poll_interval), deadline)
+                self.cond.wait(min(wait - now, self.poll_interval))
+            if ready:
+                state = min(ready, key=lambda s: (s.in_flight, s.requests))
+            else:
+                state = min(candidates, key=KeyState.available_at)
+            state.in_flight += 1
+            state.requests += 1
+        KEY_IN_FLIGHT.labels(state.name).inc()
+        return state
+
+    def has_usable(self, exclude=()):
+        """除 exclude 外是否有密钥能在 max_wait 秒内恢复（冷却或摘除在等待期限前结束）
+
+        只剩冷却时间超过等待期限的密钥时返回 False：acquire 等到期限后仍会把请求发给它，必然再次429
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self.cond:
+            return any(state.available_at() <= deadline for state in self.keys if state not in exclude)
+
+    def release(self, state, status, retry_after=None):
+        """归还密钥；status 为HTTP状态码，网络异常为 "error"，请求被取消为 "cancelled"
+
+        retry_after 为429响应的 Retry-After 头（秒）
+        """
+        now = time.monotonic()
+        with self.cond:
+            state.in_flight -= 1
+            if status == "cancelled":
+                result = "cancelled"
+            elif status == 200:
+                state.successes += 1
+                state.consecutive_failures = 0
+                state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+                result = "ok"
+            elif status == 429:
+                state.rate_limited += 1
+                state.cooldown_until = max(state.cooldown_until, now + self._retry_after(retry_after))
+                state.limit = max(1.0, state.limit / 2)
+                result = "rate_limited"
+            elif status in (401, 403):
+                # 密钥失效或被停用，重试也没有用
+                state.failures += 1
+                state.ejected_until = now + self.eject_seconds
+                result = "auth_error"
+            elif status == "error" or status >= 500:
+                state.failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.eject_after:
+                    state.ejected_until = now + self.eject_seconds
+                    state.consecutive_failures = 0
+                result = "error"
+            else:
+                # 其他4xx是请求本身的问题，与密钥无关
+                state.consecutive_failures = 0
+                result = "client_error"
+            self.cond.notify_all()
+        KEY_IN_FLIGHT.labels(state.name).dec()
+        KEY_REQUESTS.labels(state.name, result).inc()
+
+    def _retry_after(self, value):
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return self.cooldown
+
+    def get_stats(self):
+        """每个密钥的在途请求、累计请求/成功/429/失败次数和当前状态"""
+        now = time.monotonic()
+        stats = []
+        with self.cond:
+            for state in self.keys:
+                if state.ejected_until > now:
+                    status = "ejected"
+                elif state.cooldown_until > now:
+                    status = "cooldown"
+                else:
+                    status = "available"
+                stats.append({
+                    "key": state.name,
+                    "status": status,
+                    "available_in": round(max(0.0, state.available_at() - now), 1),
+                    "in_flight": state.in_flight,
+                    "limit": round(state.limit, 1),
+                    "requests": state.requests,
+                    "successes": state.successes,
+                    "rate_limited": state.rate_limited,
+                    "failures": state.failures
+                })
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_key_pool():
+    """进程内共享的密钥池（所有会话和批量任务共用）；没有配置任何密钥时抛出 ValueError"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from config import get_api_keys
+
+            _pool = KeyPool(
+                get_api_keys(),
+                cooldown=float(os.getenv("KEY_COOLDOWN", "30")),
+                eject_after=int(os.getenv("KEY_EJECT_AFTER", "3")),
+                eject_seconds=float(os.getenv("KEY_EJECT_SECONDS", "300")),
+                max_wait=float(os.getenv("KEY_MAX_WAIT", "5")),
+                max_concurrency=int(os.getenv("KEY_MAX_CONCURRENCY", "32"))
+            )
+        return _pool
@@ -0,0 +1,155 @@
+# live_metrics.py - 实时指标流（追加写事件日志 + 进程内环形缓冲区，按游标增量读取）
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 事件日志超过该大小时轮转（只保留一个旧文件），读取方按游标发现轮转后从头读
+MAX_LOG_BYTES = 8 * 1024 * 1024
+
+_write_lock = threading.Lock()
+
+# 进程内共享的实时指标流：{事件日志路径: LiveMetricsFeed}，同一进程的多个页面会话共用一个游标
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+def publish_event(log_file, kind, success=True, latency=None):
+    """追加一条实时事件（一行JSON），写入失败不影响主流程"""
+    line = json.dumps({
+        "ts": round(time.time(), 3),
+        "kind": kind,
+        "success": bool(success),
+        "latency": latency
+    }) + "\n"
+    try:
+        with _write_lock:
+            if os.path.exists(log_file) and os.path.getsize(log_file) > MAX_LOG_BYTES:
+                os.replace(log_file, log_file + ".1")
+            with open(log_file, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"写入实时事件失败: {e}")
+
+class LiveMetricsFeed:
+    """最近事件的环形缓冲区
+
+    poll() 只读取事件日志中上次游标（文件inode + 字节偏移）之后的新行，
+    与 metrics.json 的大小无关；首次打开时从日志末尾附近开始，不回放整个历史
+    """
+
+    def __init__(self, log_file, capacity=20000, backfill_bytes=256 * 1024):
+        self.log_file = log_file
+        self.events = deque(maxlen=capacity)
+        self.backfill_bytes = backfill_bytes
+        self.lock = threading.Lock()
+        self.inode = None
+        self.offset = None
+        self.seq = 0  # 已读入的事件总数，作为增量游标
+
+    def poll(self):
+        """读取新事件追加到缓冲区，返回新事件数"""
+        with self.lock:
+            try:
+                stat = os.stat(self.log_file)
+            except OSError:
+                return 0
+
+            if self.offset is None:
+                # 首次读取：回填末尾一段，跳过可能被截断的第一行
+                self.offset = max(0, stat.st_size - self.backfill_bytes)
+                skip_partial = self.offset > 0
+            elif stat.st_ino != self.inode or stat.st_size < self.offset:
+                # 日志已轮转
+                self.offset = 0
+                skip_partial = False
+            else:
+                skip_partial = False
+            self.inode = stat.st_ino
+
+            if stat.st_size == self.offset:
+                return 0
+
+            with open(self.log_file, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read(stat.st_size - self.offset)
+
+            # 只消费完整的行，写了一半的行留到下次
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                return 0
+            lines = chunk[:end].split(b"\n")[:-1]
+            if skip_partial:
+                lines = lines[1:]
+            self.offset += end
+
+            count = 0
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                self.events.append(event)
+                count += 1
+            self.seq += count
+            return count
+
+    def events_since(self, cursor):
+        """返回游标之后的事件和新游标（游标早于缓冲区时只返回缓冲区内的事件）"""
+        with self.lock:
+            new_count = min(self.seq - cursor, len(self.events)) if cursor is not None else len(self.events)
+            new_events = list(self.events)[len(self.events) - new_count:] if new_count > 0 else []
+            return new_events, self.seq
+
+    def per_second(self, seconds=120, now=None):
+        """最近 seconds 秒的逐秒统计：吞吐量、错误数/错误率、P50/P95响应时间"""
+        now = int(now if now is not None else time.time())
+        start = now - seconds + 1
+        with self.lock:
+            recent = [e for e in self.events if e.get("ts", 0) >= start and e.get("kind") == "api_call"]
+            sessions = sum(1 for e in self.events if e.get("ts", 0) >= start and e.get("kind") == "session")
+
+        result = {
+            "seconds": list(range(start - now, 1)),
+            "throughput": [0] * seconds,
+            "errors": [0] * seconds,
+            "error_rate": [0.0] * seconds,
+            "p50": [None] * seconds,
+            "p95": [None] * seconds,
+            "total_calls": len(recent),
+            "total_sessions": sessions
+        }
+        if not recent:
+            return result
+
+        ts = np.array([e["ts"] for e in recent], dtype=np.float64)
+        failed = np.array([not e.get("success", True) for e in recent], dtype=np.float64)
+        latency = np.array([e["latency"] if e.get("latency") is not None else np.nan for e in recent],
+                           dtype=np.float64)
+        bucket = np.clip((ts - start).astype(np.int64), 0, seconds - 1)
+
+        calls = np.bincount(bucket, minlength=seconds)
+        errors = np.bincount(bucket, weights=failed, minlength=seconds)
+        result["throughput"] = calls.tolist()
+        result["errors"] = errors.astype(np.int64).tolist()
+        result["error_rate"] = np.round(np.divide(errors * 100, calls, out=np.zeros(seconds), where=calls > 0), 1).tolist()
+
+        # 分位数只对有调用的秒计算
+        for second in np.unique(bucket):
+            values = latency[bucket == second]
+            values = values[~np.isnan(values)]
+            if values.size:
+                p50, p95 = np.percentile(values, [50, 95])
+                result["p50"][second] = round(float(p50), 3)
+                result["p95"][second] = round(float(p95), 3)
+        return result
+
+def get_live_feed(log_file):
+    """获取进程内共享的实时指标流"""
+    with _feeds_lock:
+        feed = _feeds.get(log_file)
+        if feed is None:
+            feed = _feeds[log_file] = LiveMetricsFeed(log_file)
+        return feed
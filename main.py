@@ -1,15 +1,24 @@
 # main.py - 控制台启动器
 import requests
 import json
-from config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL
+from config import DEEPSEEK_API_URL
+from key_pool import get_key_pool
 
 def test_api_connection():
-    """测试API连接"""
+    """测试API连接（从密钥池取一个密钥，测试后显示各密钥的状态）"""
     print("正在测试API连接...")
     
+    try:
+        pool = get_key_pool()
+    except ValueError:
+        print("❌ 请设置 DEEPSEEK_API_KEY 或 DEEPSEEK_API_KEYS 环境变量")
+        return
+    lease = pool.acquire()
+    print(f"使用密钥: {lease.name}（密钥池共 {len(pool)} 个）")
+    
     headers = {
         "Content-Type": "application/json",
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
+        "Authorization": f"Bearer {lease.key}"
     }
     
     data = {
@@ -20,8 +29,10 @@ def test_api_connection():
         "stream": False
     }
     
+    status, retry_after = "error", None
     try:
         response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data)
+        status, retry_after = response.status_code, response.headers.get("Retry-After")
         print(f"HTTP状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -33,6 +44,12 @@ def test_api_connection():
             print("错误详情:", response.text)
     except Exception as e:
         print(f"发生异常: {e}")
+    finally:
+        pool.release(lease, status, retry_after)
+    
+    for key in pool.get_stats():
+        print(f"  {key['key']}: {key['status']}，请求 {key['requests']} 次，成功 {key['successes']}，"
+              f"429 {key['rate_limited']} 次，失败 {key['failures']} 次")
 
 def show_main_menu():
     """显示主菜单"""
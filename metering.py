@@ -0,0 +1,190 @@
+# metering.py - token用量与费用计量（按调用、会话和天），会话级与全局预算控制
+#
+# 价格表和预算在 metering.json（可用环境变量 METERING_FILE 指定其他文件），修改后下一次调用自动生效：
+#   prices          各模型每百万token的价格：input_cache_hit 输入命中缓存 / input_cache_miss 未命中 / output 输出
+#   budgets         session 单个会话、daily 全局当日的预算，soft 软预算、hard 硬预算（币种见 currency，null 为不限）
+#   degraded_max_tokens  超过软预算后每次回答的 max_tokens 上限
+# 超过软预算：降低 max_tokens，暂停后续问题预取；超过硬预算：只用缓存回答（预取命中的问题照常回答），
+# 其余请求不再发往上游。全局当日用量在进程内累计，并定期与 metrics.json 的日统计对齐，多个进程共用一份预算。
+#
+# 用法：python metering.py   # 显示最近7天的用量和费用
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from telemetry import BUDGET_ACTIONS, SPEND
+
+METERING_FILE = os.getenv(
+    "METERING_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "metering.json")
+)
+# 配置文件缺失或无法解析时使用：只计费，不限预算
+DEFAULT_CONFIG = {
+    "currency": "CNY",
+    "prices": {"deepseek-chat": {"input_cache_hit": 0.5, "input_cache_miss": 2.0, "output": 8.0}},
+    "budgets": {"session": {"soft": None, "hard": None}, "daily": {"soft": None, "hard": None}},
+    "degraded_max_tokens": 400
+}
+
+# check() 的结果：level 为 ok / soft / hard，scope 为触发的预算（session / daily）
+BudgetStatus = namedtuple("BudgetStatus", ["level", "scope", "spent", "limit"])
+BUDGET_OK = BudgetStatus("ok", None, 0.0, None)
+
+_config = {"key": None, "value": DEFAULT_CONFIG}
+_config_lock = threading.Lock()
+
+def load_config(path=None):
+    """返回计量配置；文件修改后重新读取，读取失败时沿用上一次成功加载的配置"""
+    path = path or METERING_FILE
+    try:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return DEFAULT_CONFIG
+    with _config_lock:
+        if _config["key"] == key:
+            return _config["value"]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        config = dict(DEFAULT_CONFIG, **raw)
+        config["budgets"] = {scope: dict(DEFAULT_CONFIG["budgets"][scope], **raw.get("budgets", {}).get(scope, {}))
+                             for scope in ("session", "daily")}
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        print(f"⚠️ 计量配置读取失败 {path}: {e}")
+        with _config_lock:
+            _config["key"] = key
+            return _config["value"]
+    with _config_lock:
+        _config.update(key=key, value=config)
+    return config
+
+def usage_tokens(usage):
+    """usage -> (输入token, 输出token, 命中缓存的输入token)"""
+    usage = usage or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), usage.get("prompt_cache_hit_tokens", 0)
+
+def compute_cost(usage, model="deepseek-chat", config=None):
+    """按价格表计算一次调用的费用；价格表没有该模型时按第一个模型计价"""
+    prices = (config or load_config())["prices"]
+    price = prices.get(model) or next(iter(prices.values()))
+    prompt, completion, cached = usage_tokens(usage)
+    return (cached * price["input_cache_hit"] + (prompt - cached) * price["input_cache_miss"]
+            + completion * price["output"]) / 1_000_000
+
+def _new_totals():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost": 0.0}
+
+class Meter:
+    """进程内的用量累计：charge() 计入一次上游调用，check() 判断会话和全局当日预算"""
+
+    def __init__(self, data_file="data/metrics.json", max_sessions=10000, sync_interval=30):
+        self.data_file = data_file
+        self.max_sessions = max_sessions
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # 会话ID -> 累计用量（最近活跃的在后）
+        self.day = None
+        self.daily = _new_totals()
+        self.synced_at = 0.0
+
+    def charge(self, session_id, usage, model="deepseek-chat"):
+        """计入一次上游调用的用量，返回费用"""
+        if not usage:
+            return 0.0
+        cost = compute_cost(usage, model)
+        prompt, completion, cached = usage_tokens(usage)
+        with self.lock:
+            self._roll_day()
+            session = self.sessions.pop(session_id, None) or _new_totals()
+            self.sessions[session_id] = session
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            for totals in (session, self.daily):
+                totals["calls"] += 1
+                totals["prompt_tokens"] += prompt
+                totals["completion_tokens"] += completion
+                totals["cached_tokens"] += cached
+                totals["cost"] += cost
+        SPEND.labels(model).inc(cost)
+        return cost
+
+    def check(self, session_id):
+        """会话和全局当日用量对应的预算状态（先看硬预算，再看软预算）"""
+        budgets = load_config()["budgets"]
+        self._sync()
+        with self.lock:
+            self._roll_day()
+            spent = {"session": self.sessions.get(session_id, {}).get("cost", 0.0), "daily": self.daily["cost"]}
+        for level in ("hard", "soft"):
+            for scope in ("session", "daily"):
+                limit = budgets[scope].get(level)
+                if limit is not None and spent[scope] >= limit:
+                    return BudgetStatus(level, scope, spent[scope], limit)
+        return BUDGET_OK
+
+    def record_action(self, status, action):
+        """记录一次预算控制动作（degraded 降低max_tokens / blocked 只用缓存回答 / prefetch_paused）"""
+        BUDGET_ACTIONS.labels(status.scope, action).inc()
+
+    def _roll_day(self):
+        """调用时须持有 lock：跨天时清零当日用量"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self.day:
+            self.day = today
+            self.daily = _new_totals()
+            self.synced_at = 0.0
+
+    def _sync(self):
+        """定期读取 metrics.json 的当日用量（含其他进程的花费），取较大者"""
+        if time.monotonic() - self.synced_at < self.sync_interval:
+            return
+        self.synced_at = time.monotonic()
+        from metrics_dashboard import MetricsDashboard
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        recorded = MetricsDashboard(self.data_file).load_snapshot().get("daily_stats", {}).get(today, {})
+        with self.lock:
+            self._roll_day()
+            for field in ("prompt_tokens", "completion_tokens", "cached_tokens", "cost"):
+                self.daily[field] = max(self.daily[field], recorded.get(field, 0))
+
+    def get_session(self, session_id):
+        with self.lock:
+            return dict(self.sessions.get(session_id) or _new_totals())
+
+    def get_daily(self):
+        with self.lock:
+            self._roll_day()
+            return dict(self.daily)
+
+_meter = None
+_meter_lock = threading.Lock()
+
+def get_meter():
+    """进程内共享的计量器（所有会话、预取和批量任务共用）"""
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            _meter = Meter()
+        return _meter
+
+def main():
+    from metrics_dashboard import MetricsDashboard
+
+    config = load_config()
+    stats = MetricsDashboard().get_spend_stats(days=7)
+    if not stats["dates"]:
+        print("暂无用量记录")
+        return
+    print(f"{'日期':<10} | {'输入token':>10} | {'命中缓存':>10} | {'输出token':>10} | {'费用(' + config['currency'] + ')':>10}")
+    for i, date in enumerate(stats["dates"]):
+        print(f"{date:<12} | {stats['prompt_tokens'][i]:>11} | {stats['cached_tokens'][i]:>12} | "
+              f"{stats['completion_tokens'][i]:>11} | {stats['cost'][i]:>12.4f}")
+    daily = config["budgets"]["daily"]
+    print(f"\n全局当日预算：软 {daily['soft']} / 硬 {daily['hard']} {config['currency']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# metrics_archive.py - 历史指标列式归档（按天分区的NumPy .npy文件，读取时内存映射）
+import argparse
+import os
+import re
+import numpy as np
+from metrics_dashboard import (BUCKET_COLUMNS, EventColumns, SECONDS_PER_DAY, bucket_layout, bucket_series,
+                               merge_bucket_rows)
+
+# 每个分区目录下的列文件及其类型
+ARCHIVE_COLUMNS = {
+    "api_ts": np.float64,
+    "api_success": np.bool_,
+    "api_latency": np.float64,
+    "session_ts": np.float64
+}
+
+# 每个分区预先汇总的分钟桶（rollup.npy，形状 (1440, len(BUCKET_COLUMNS))），长时间范围的图表直接合并这些桶
+ROLLUP_SECONDS = 60
+ROLLUP_FILE = "rollup.npy"
+
+DAY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def day_to_str(day):
+    """epoch天数转换为 YYYY-MM-DD"""
+    return str(np.datetime64(int(day), "D"))
+
+def str_to_day(date_str):
+    """YYYY-MM-DD 转换为epoch天数"""
+    return int(np.datetime64(date_str, "D").astype(np.int64))
+
+class MetricsArchive:
+    """按天分区的列式归档
+
+    目录结构: <archive_dir>/<YYYY-MM-DD>/{api_ts,api_success,api_latency,session_ts,rollup}.npy
+    只归档数值列（时间戳、成功标志、响应时间），原始文本字段不进入归档；rollup.npy 为当天的分钟桶汇总
+    """
+
+    def __init__(self, archive_dir="data/metrics_archive"):
+        self.archive_dir = archive_dir
+
+    def list_days(self):
+        """列出已归档的日期（升序）"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(d for d in os.listdir(self.archive_dir) if DAY_PATTERN.match(d))
+
+    def _partition_dir(self, date_str):
+        return os.path.join(self.archive_dir, date_str)
+
+    def load_partition(self, date_str):
+        """以内存映射方式打开某一天的分区，不把数据读入内存"""
+        partition_dir = self._partition_dir(date_str)
+        arrays = {}
+        for name, dtype in ARCHIVE_COLUMNS.items():
+            path = os.path.join(partition_dir, f"{name}.npy")
+            if os.path.exists(path):
+                arrays[name] = np.load(path, mmap_mode="r")
+            else:
+                arrays[name] = np.empty(0, dtype=dtype)
+        return EventColumns(**arrays)
+
+    def _write_partition(self, date_str, arrays):
+        """写入分区（先写临时文件再替换）"""
+        partition_dir = self._partition_dir(date_str)
+        os.makedirs(partition_dir, exist_ok=True)
+        for name, dtype in ARCHIVE_COLUMNS.items():
+            path = os.path.join(partition_dir, f"{name}.npy")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(arrays[name], dtype=dtype))
+            os.replace(tmp_path, path)
+
+        day_start = str_to_day(date_str) * SECONDS_PER_DAY
+        rollup = EventColumns(**arrays).bucket_rows(day_start, day_start + SECONDS_PER_DAY, day_start,
+                                                    ROLLUP_SECONDS, SECONDS_PER_DAY // ROLLUP_SECONDS)
+        path = os.path.join(partition_dir, ROLLUP_FILE)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, rollup)
+        os.replace(path + ".tmp", path)
+
+    def load_rollup(self, date_str):
+        """某一天的分钟桶汇总；旧版本写入的分区没有 rollup.npy 时由原始事件现算"""
+        path = os.path.join(self._partition_dir(date_str), ROLLUP_FILE)
+        if os.path.exists(path):
+            rollup = np.load(path)
+            if rollup.shape == (SECONDS_PER_DAY // ROLLUP_SECONDS, len(BUCKET_COLUMNS)):
+                return rollup
+        day_start = str_to_day(date_str) * SECONDS_PER_DAY
+        return self.load_partition(date_str).bucket_rows(day_start, day_start + SECONDS_PER_DAY, day_start,
+                                                         ROLLUP_SECONDS, SECONDS_PER_DAY // ROLLUP_SECONDS)
+
+    def append(self, columns):
+        """把列式事件按天追加到对应分区，返回写入的API调用数
+
+        幂等：只追加时间戳晚于分区内已有最大时间戳的事件。归档后、metrics.json 裁剪前崩溃时，
+        下次归档同一批事件不会重复写入（事件按时间顺序归档，同一天的事件不会晚于已归档的事件到达）
+        """
+        api_days = np.floor(columns.api_ts / SECONDS_PER_DAY).astype(np.int64)
+        session_days = np.floor(columns.session_ts / SECONDS_PER_DAY).astype(np.int64)
+        written = 0
+
+        for day in np.union1d(api_days, session_days):
+            date_str = day_to_str(day)
+            existing = self.load_partition(date_str)
+            api_mask = api_days == day
+            session_mask = session_days == day
+            if existing.api_ts.size:
+                api_mask &= columns.api_ts > existing.api_ts.max()
+            if existing.session_ts.size:
+                session_mask &= columns.session_ts > existing.session_ts.max()
+            if not api_mask.any() and not session_mask.any():
+                continue
+            written += int(api_mask.sum())
+
+            arrays = {
+                "api_ts": np.concatenate([existing.api_ts, columns.api_ts[api_mask]]),
+                "api_success": np.concatenate([existing.api_success, columns.api_success[api_mask]]),
+                "api_latency": np.concatenate([existing.api_latency, columns.api_latency[api_mask]]),
+                "session_ts": np.concatenate([existing.session_ts, columns.session_ts[session_mask]])
+            }
+            # 释放内存映射后再覆盖文件
+            del existing
+            self._write_partition(date_str, arrays)
+
+        return written
+
+    def load_range(self, start_date, end_date):
+        """读取 [start_date, end_date] 范围内的分区（YYYY-MM-DD，含两端）
+
+        只打开范围内的分区；只有一个分区时直接返回内存映射视图（零拷贝）
+        """
+        parts = [self.load_partition(d) for d in self.list_days() if start_date <= d <= end_date]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return EventColumns.concat(parts)
+
+    def timeseries(self, live, start_s, end_s, max_points):
+        """归档加上 live（metrics.json 中的事件）在 [start_s, end_s) 内的图表序列，见 EventColumns.timeseries
+
+        分桶宽度是分钟的整数倍时，范围完整覆盖的归档日直接合并分钟桶汇总，只有首尾不完整的两天和 live 扫描原始事件，
+        90天视图的耗时与事件总数基本无关；范围内事件很少时仍返回原始事件
+        """
+        width, first, count = bucket_layout(start_s, end_s, max_points)
+        first_day = day_to_str(np.floor(start_s / SECONDS_PER_DAY))
+        last_day = day_to_str(np.floor(end_s / SECONDS_PER_DAY))
+        days = [d for d in self.list_days() if first_day <= d <= last_day]
+
+        def raw():
+            parts = [self.load_partition(d).range_slice(start_s, end_s) for d in days]
+            return EventColumns.concat(parts + [live]).timeseries(start_s, end_s, max_points)
+
+        if width % ROLLUP_SECONDS:
+            return raw()
+
+        rows = live.bucket_rows(start_s, end_s, first, width, count)
+        minutes = np.arange(SECONDS_PER_DAY // ROLLUP_SECONDS) * ROLLUP_SECONDS
+        for date_str in days:
+            day_start = str_to_day(date_str) * SECONDS_PER_DAY
+            if start_s <= day_start and day_start + SECONDS_PER_DAY <= end_s:
+                index = ((day_start + minutes - first) // width).astype(np.int64)
+                merge_bucket_rows(rows, self.load_rollup(date_str), index)
+            else:
+                merge_bucket_rows(rows, self.load_partition(date_str).bucket_rows(start_s, end_s, first, width, count),
+                                  np.arange(count))
+        if rows[:, 0].sum() + rows[:, 6].sum() <= max_points:
+            return raw()
+        return bucket_series(rows, first, width)
+
+    def get_size(self):
+        """归档占用的磁盘空间（字节）"""
+        total = 0
+        for date_str in self.list_days():
+            partition_dir = self._partition_dir(date_str)
+            for name in os.listdir(partition_dir):
+                total += os.path.getsize(os.path.join(partition_dir, name))
+        return total
+
+def main():
+    """命令行入口：把较早的事件从 metrics.json 移入列式归档"""
+    from metrics_dashboard import MetricsDashboard
+
+    parser = argparse.ArgumentParser(description="AI职业规划师 - 历史指标归档")
+    parser.add_argument("--data-file", default="data/metrics.json", help="指标数据文件")
+    parser.add_argument("--keep-days", type=int, default=7, help="metrics.json 中保留最近几天的原始事件 (默认7)")
+    args = parser.parse_args()
+
+    dashboard = MetricsDashboard(args.data_file)
+    archived = dashboard.archive_old_events(keep_days=args.keep_days)
+    print(f"✅ 已归档 {archived['api_calls']} 条API调用、{archived['sessions']} 条会话记录")
+
+if __name__ == "__main__":
+    main()
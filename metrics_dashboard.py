@@ -1,15 +1,279 @@
-# metrics_dashboard.py - 修复版（避免使用pyarrow）
+# metrics_dashboard.py - 修复版（避免使用pyarrow，历史事件可归档为NumPy列式分区）
 import streamlit as st
 import json
 import os
+import threading
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
+from live_metrics import publish_event, get_live_feed
+from slo import RULES, SLO_NAMES, get_slo_engine, load_alert_history, load_states
+from telemetry import CACHE_REQUESTS, STORAGE_WRITE_LATENCY
+
+# 多个Agent实例（如批量运行器的工作线程）共享同一个数据文件，读-改-写需要串行化
+_data_lock = threading.RLock()
+
+# 只读快照缓存：{数据文件: {"key": (mtime_ns, size), "data": 解析后的数据, "columns": 列式视图}}
+# 文件未变化时Streamlit重跑不再重复解析
+_snapshot_cache = {}
+
+SECONDS_PER_DAY = 86400
+
+# 时间范围图表：每个图表发送给Plotly的点数上限（所有曲线合计），事件更多时按时间分桶
+MAX_CHART_POINTS = 3000
+# 可选的分桶宽度（秒），选能让桶数不超过上限的最小宽度；能整除一天的宽度按本地整点对齐
+BUCKET_SECONDS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+# 时间范围选择器的预设（秒）
+RANGE_PRESETS = {
+    "1小时": 3600,
+    "6小时": 6 * 3600,
+    "24小时": SECONDS_PER_DAY,
+    "7天": 7 * SECONDS_PER_DAY,
+    "30天": 30 * SECONDS_PER_DAY,
+    "90天": 90 * SECONDS_PER_DAY
+}
+
+def format_bucket(seconds):
+    """分桶宽度的显示文本"""
+    if seconds % SECONDS_PER_DAY == 0:
+        return f"{seconds // SECONDS_PER_DAY}天"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}小时"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}分钟"
+    return f"{seconds}秒"
+
+def parse_timestamps(values):
+    """把ISO时间字符串批量转换为epoch秒（float64数组）
+
+    记录使用 datetime.now().isoformat() 写入的本地时间，按不带时区的时间处理，
+    因此按天取整得到的日期与 strftime("%Y-%m-%d") 一致
+    """
+    try:
+        parsed = np.array(values, dtype="datetime64[us]")
+    except ValueError:
+        # 含时区等NumPy无法直接解析的格式，逐条回退
+        parsed = np.array([
+            np.datetime64(datetime.fromisoformat(v.replace('Z', '+00:00')).replace(tzinfo=None), "us")
+            for v in values
+        ], dtype="datetime64[us]")
+    return parsed.astype(np.int64) / 1e6
+
+def to_epoch_seconds(dt):
+    """datetime转换为与 parse_timestamps 相同基准的epoch秒"""
+    return np.datetime64(dt.replace(tzinfo=None), "us").astype(np.int64) / 1e6
+
+class EventColumns:
+    """事件的列式内存视图：时间戳(epoch秒)、成功标志、响应时间均为NumPy数组"""
+
+    def __init__(self, api_ts, api_success, api_latency, session_ts):
+        self.api_ts = api_ts
+        self.api_success = api_success
+        self.api_latency = api_latency
+        self.session_ts = session_ts
+
+    @classmethod
+    def from_data(cls, data):
+        """从 metrics.json 的数据构建列式视图"""
+        api_calls = data.get("api_calls", [])
+        sessions = data.get("sessions", [])
+        return cls(
+            api_ts=parse_timestamps([c["timestamp"] for c in api_calls]),
+            api_success=np.array([bool(c.get("success", False)) for c in api_calls], dtype=bool),
+            # None（未记录响应时间）转换为NaN
+            api_latency=np.array([c.get("response_time") for c in api_calls], dtype=float),
+            session_ts=parse_timestamps([s["timestamp"] for s in sessions])
+        )
+
+    @classmethod
+    def concat(cls, parts):
+        """拼接多段列式视图（例如实时数据和归档分区）"""
+        return cls(
+            api_ts=np.concatenate([p.api_ts for p in parts]),
+            api_success=np.concatenate([p.api_success for p in parts]),
+            api_latency=np.concatenate([p.api_latency for p in parts]),
+            session_ts=np.concatenate([p.session_ts for p in parts])
+        )
+
+    def aggregate(self, hours=24, days=7, now=None):
+        """一次向量化计算：时间窗口计数、成功率、按天分桶和响应时间分位数"""
+        now_s = to_epoch_seconds(now or datetime.now())
+
+        # 最近 hours 小时
+        cutoff = now_s - hours * 3600
+        recent_mask = self.api_ts > cutoff
+        recent_api_count = int(recent_mask.sum())
+        recent_success_count = int((recent_mask & self.api_success).sum())
+        recent_session_count = int((self.session_ts > cutoff).sum())
+
+        # 成功调用的响应时间（与 record_api_call 一致：只统计成功且有耗时的调用）
+        latency_mask = self.api_success & (self.api_latency > 0)
+        recent_latencies = self.api_latency[latency_mask & recent_mask]
+        all_latencies = self.api_latency[latency_mask]
+
+        # 按天分桶：最近 days 天，下标0为最早的一天
+        today = np.floor(now_s / SECONDS_PER_DAY)
+        start_day = today - days + 1
+
+        def bucket(ts, weights=None, mask=None):
+            day_index = np.floor(ts / SECONDS_PER_DAY) - start_day
+            valid = (day_index >= 0) & (day_index < days)
+            if mask is not None:
+                valid &= mask
+            return np.bincount(
+                day_index[valid].astype(np.int64),
+                weights=None if weights is None else weights[valid],
+                minlength=days
+            )
+
+        daily_calls = bucket(self.api_ts)
+        daily_success = bucket(self.api_ts, mask=self.api_success)
+        daily_latency_sum = bucket(self.api_ts, weights=np.nan_to_num(self.api_latency), mask=latency_mask)
+        daily_sessions = bucket(self.session_ts)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            success_rates = np.where(daily_calls > 0, daily_success / daily_calls * 100, 0)
+            avg_response_times = np.where(daily_success > 0, daily_latency_sum / daily_success, 0)
+
+        dates = (np.arange(days) + start_day).astype("datetime64[D]").astype(str)
+
+        def percentiles(values):
+            if values.size == 0:
+                return {"p50": 0, "p95": 0, "p99": 0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+        return {
+            "recent": {
+                "recent_api_calls": recent_api_count,
+                "recent_sessions": recent_session_count,
+                "recent_success_rate": (recent_success_count / recent_api_count * 100) if recent_api_count > 0 else 0,
+                "recent_latency": percentiles(recent_latencies)
+            },
+            "daily": {
+                'dates': dates.tolist(),
+                'api_calls': daily_calls.astype(int).tolist(),
+                'success_rates': success_rates.tolist(),
+                'avg_response_times': avg_response_times.tolist(),
+                'sessions': daily_sessions.astype(int).tolist()
+            },
+            "latency": percentiles(all_latencies)
+        }
+
+    def range_slice(self, start_s, end_s):
+        """[start_s, end_s) 内的事件（副本）"""
+        api_mask = (self.api_ts >= start_s) & (self.api_ts < end_s)
+        return EventColumns(
+            api_ts=self.api_ts[api_mask],
+            api_success=self.api_success[api_mask],
+            api_latency=self.api_latency[api_mask],
+            session_ts=self.session_ts[(self.session_ts >= start_s) & (self.session_ts < end_s)]
+        )
+
+    def bucket_rows(self, start_s, end_s, first, width, count):
+        """[start_s, end_s) 内的事件按 first 起、宽 width 秒分为 count 个桶，返回 (count, len(BUCKET_COLUMNS)) 数组"""
+        events = self.range_slice(start_s, end_s)
+        rows = new_bucket_rows(count)
+        index = ((events.api_ts - first) // width).astype(np.int64)
+        timed = events.api_success & (events.api_latency > 0)
+        timed_index = index[timed]
+        timed_latency = events.api_latency[timed]
+        rows[:, 0] = np.bincount(index, minlength=count)
+        rows[:, 1] = np.bincount(index[events.api_success], minlength=count)
+        rows[:, 2] = np.bincount(timed_index, minlength=count)
+        rows[:, 3] = np.bincount(timed_index, weights=timed_latency, minlength=count)
+        np.minimum.at(rows[:, 4], timed_index, timed_latency)
+        np.maximum.at(rows[:, 5], timed_index, timed_latency)
+        rows[:, 6] = np.bincount(((events.session_ts - first) // width).astype(np.int64), minlength=count)
+        return rows
+
+    def raw_series(self):
+        """每个事件一个点（按时间排序）"""
+        order = np.argsort(self.api_ts, kind="stable")
+        return {
+            "resolution": "raw",
+            "bucket_seconds": None,
+            "events": int(self.api_ts.size),
+            "ts": self.api_ts[order],
+            "success": self.api_success[order],
+            "latency": self.api_latency[order],
+            "session_ts": np.sort(self.session_ts)
+        }
+
+    def timeseries(self, start_s, end_s, max_points=MAX_CHART_POINTS):
+        """[start_s, end_s) 内的时间序列，点数不超过 max_points
+
+        范围内的事件不多时返回原始事件（resolution="raw"，每个事件一个点），否则分桶（见 bucket_series）
+        """
+        events = self.range_slice(start_s, end_s)
+        if events.api_ts.size + events.session_ts.size <= max_points:
+            return events.raw_series()
+        width, first, count = bucket_layout(start_s, end_s, max_points)
+        return bucket_series(events.bucket_rows(start_s, end_s, first, width, count), first, width)
+
+# 分桶统计的列：调用数、成功数、有响应时间的成功调用数、响应时间之和、最小/最大响应时间、会话数
+# 前四列和会话数可直接相加，最小/最大值分别取min/max，因此预先汇总的分桶（见 metrics_archive.py）可以再合并成更宽的桶
+BUCKET_COLUMNS = ("calls", "successes", "timed", "latency_sum", "latency_min", "latency_max", "sessions")
+_SUM_COLUMNS = (0, 1, 2, 3, 6)
+
+def new_bucket_rows(count):
+    rows = np.zeros((count, len(BUCKET_COLUMNS)))
+    rows[:, 4] = np.inf
+    rows[:, 5] = -np.inf
+    return rows
+
+def merge_bucket_rows(target, rows, index):
+    """把分桶统计行按桶下标 index 合并进 target（下标越界的行忽略）"""
+    valid = (index >= 0) & (index < len(target))
+    index, rows = index[valid], rows[valid]
+    for column in _SUM_COLUMNS:
+        target[:, column] += np.bincount(index, weights=rows[:, column], minlength=len(target))
+    np.minimum.at(target[:, 4], index, rows[:, 4])
+    np.maximum.at(target[:, 5], index, rows[:, 5])
+
+def bucket_layout(start_s, end_s, max_points=MAX_CHART_POINTS):
+    """选择分桶：BUCKET_SECONDS 中能让桶数不超过 max_points // 3 的最小宽度（延迟图有平均/最小/最大三条曲线）
+
+    返回 (宽度秒, 第一个桶的起点, 桶数)
+    """
+    max_buckets = max(1, max_points // 3)
+    span = end_s - start_s
+    width = next((w for w in BUCKET_SECONDS if span / w <= max_buckets), None)
+    if width is None:
+        width = int(np.ceil(span / max_buckets / SECONDS_PER_DAY)) * SECONDS_PER_DAY
+    first = np.floor(start_s / width) * width
+    return width, first, int(np.ceil((end_s - first) / width))
+
+def bucket_series(rows, first, width):
+    """分桶统计 -> 图表序列：每桶的调用数、成功率、会话数，以及成功调用响应时间的平均值和最小/最大值
+    （min/max分桶保留尖峰，不会被平均值抹平）。没有调用的桶为NaN，图上断开而不是画成0
+    """
+    calls, successes, timed, latency_sum, latency_min, latency_max, sessions = rows.T
+    has_latency = timed > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        success_rates = np.where(calls > 0, successes / calls * 100, np.nan)
+        latency_avg = np.where(has_latency, latency_sum / timed, np.nan)
+    return {
+        "resolution": "bucket",
+        "bucket_seconds": width,
+        "events": int(calls.sum()),
+        "ts": first + np.arange(len(rows)) * width,
+        "api_calls": calls.astype(np.int64),
+        "success_rates": success_rates,
+        "latency_avg": latency_avg,
+        "latency_min": np.where(has_latency, latency_min, np.nan),
+        "latency_max": np.where(has_latency, latency_max, np.nan),
+        "sessions": sessions.astype(np.int64)
+    }
 
 class MetricsDashboard:
-    def __init__(self, data_file="data/metrics.json"):
+    def __init__(self, data_file="data/metrics.json", archive_dir=None):
         self.data_file = data_file
+        # 历史事件的列式归档目录（可选，见 metrics_archive.py）
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(data_file), "metrics_archive")
+        # 实时事件日志（追加写，面板按游标增量读取，见 live_metrics.py）
+        self.live_log_file = os.path.join(os.path.dirname(data_file), "live_events.jsonl")
         self.ensure_data_file()
     
     def ensure_data_file(self):
@@ -41,155 +305,471 @@ class MetricsDashboard:
             self.ensure_data_file()
             return self.load_data()
     
+    def load_snapshot(self):
+        """加载只读数据快照 - 以文件修改时间和大小为键缓存，一次渲染内所有统计共用
+
+        注意：返回的数据在多次调用间共享，调用方不能修改；需要修改请使用 load_data()
+        """
+        try:
+            stat = os.stat(self.data_file)
+            key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return self.load_data()
+
+        cached = _snapshot_cache.get(self.data_file)
+        if cached and cached["key"] == key:
+            CACHE_REQUESTS.labels("metrics_snapshot", "hit").inc()
+            return cached["data"]
+
+        CACHE_REQUESTS.labels("metrics_snapshot", "miss").inc()
+        data = self.load_data()
+        _snapshot_cache[self.data_file] = {"key": key, "data": data, "columns": None}
+        return data
+
+    def load_columns(self, data=None):
+        """获取事件的列式视图 - 对快照数据只构建一次"""
+        data = data if data is not None else self.load_snapshot()
+
+        cached = _snapshot_cache.get(self.data_file)
+        if cached and cached["data"] is data:
+            if cached["columns"] is None:
+                cached["columns"] = EventColumns.from_data(data)
+            return cached["columns"]
+
+        return EventColumns.from_data(data)
+
+    def load_archive_range(self, days):
+        """读取最近 days 天内已归档的事件（没有归档时返回None）"""
+        if not os.path.isdir(self.archive_dir):
+            return None
+
+        from metrics_archive import MetricsArchive
+        end_date = datetime.now().strftime("%Y-%m-%d")
+        start_date = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        return MetricsArchive(self.archive_dir).load_range(start_date, end_date)
+
+    def get_timeseries(self, start, end=None, max_points=MAX_CHART_POINTS, data=None):
+        """任意时间范围的图表数据（start/end 为 datetime，end 默认为现在），每个图表不超过 max_points 个点
+
+        有归档时由 MetricsArchive.timeseries 查询：范围完整覆盖的归档日使用预先汇总的分钟桶，不扫描原始事件
+        """
+        start_s = to_epoch_seconds(start)
+        end_s = to_epoch_seconds(end or datetime.now())
+        columns = self.load_columns(data)
+        if not os.path.isdir(self.archive_dir):
+            return columns.timeseries(start_s, end_s, max_points)
+
+        from metrics_archive import MetricsArchive
+        return MetricsArchive(self.archive_dir).timeseries(columns, start_s, end_s, max_points)
+
+    def get_aggregates(self, hours=24, days=7, data=None):
+        """一次计算面板所需的全部时间序列统计（合并查询范围内的归档分区）"""
+        columns = self.load_columns(data)
+        archived = self.load_archive_range(max(days, int(np.ceil(hours / 24)) + 1))
+        if archived is not None:
+            columns = EventColumns.concat([archived, columns])
+        return columns.aggregate(hours=hours, days=days)
+
+    def archive_old_events(self, keep_days=7):
+        """把 keep_days 天之前的原始事件移入列式归档，缩小 metrics.json
+
+        归档只保留时间戳、成功标志和响应时间，累计指标和日统计不受影响
+        """
+        from metrics_archive import MetricsArchive
+
+        with _data_lock:
+            data = self.load_data()
+            cutoff = (datetime.now() - timedelta(days=keep_days - 1)).strftime("%Y-%m-%d")
+
+            # ISO时间字符串可以直接按字典序比较
+            old_calls = [c for c in data.get("api_calls", []) if c["timestamp"] < cutoff]
+            old_sessions = [s for s in data.get("sessions", []) if s["timestamp"] < cutoff]
+            if not old_calls and not old_sessions:
+                return {"api_calls": 0, "sessions": 0}
+
+            columns = EventColumns.from_data({"api_calls": old_calls, "sessions": old_sessions})
+            MetricsArchive(self.archive_dir).append(columns)
+
+            data["api_calls"] = [c for c in data.get("api_calls", []) if c["timestamp"] >= cutoff]
+            data["sessions"] = [s for s in data.get("sessions", []) if s["timestamp"] >= cutoff]
+            data["archived_sessions"] = data.get("archived_sessions", 0) + len(old_sessions)
+            self.save_data(data)
+
+            return {"api_calls": len(old_calls), "sessions": len(old_sessions)}
+    
     def save_data(self, data):
-        """保存数据"""
+        """保存数据（先写临时文件再替换，避免写入中途崩溃损坏文件）"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with STORAGE_WRITE_LATENCY.labels("metrics").time():
+                tmp_file = self.data_file + ".tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_file, self.data_file)
         except Exception as e:
             print(f"保存数据失败: {e}")
     
-    def record_api_call(self, success=True, response_time=None, user_input=None, error_msg=None):
-        """记录API调用"""
-        try:
-            data = self.load_data()
+    def record_api_call(self, success=True, response_time=None, user_input=None, error_msg=None,
+                        policy=None, output_tokens=None, usage=None, cost=None, session_id=None):
+        """记录API调用（policy: 本次使用的生成策略名，output_tokens: 输出token数）
+
+        usage / cost: 本次上游调用的token用量和费用（见 metering.py），计入当日用量；
+        合并到其他调用的请求不传，避免重复计费
+        """
+        with _data_lock:
+            try:
+                data = self.load_data()
             
-            # 确保 api_calls 是列表
-            if "api_calls" not in data or not isinstance(data["api_calls"], list):
-                data["api_calls"] = []
+                # 确保 api_calls 是列表
+                if "api_calls" not in data or not isinstance(data["api_calls"], list):
+                    data["api_calls"] = []
             
-            api_call = {
-                "timestamp": datetime.now().isoformat(),
-                "success": success,
-                "response_time": response_time,
-                "user_input": user_input[:100] if user_input else None,
-                "error_msg": error_msg
-            }
+                api_call = {
+                    "timestamp": datetime.now().isoformat(),
+                    "success": success,
+                    "response_time": response_time,
+                    "user_input": user_input[:100] if user_input else None,
+                    "error_msg": error_msg,
+                    "policy": policy,
+                    "output_tokens": output_tokens,
+                    "session_id": session_id
+                }
+                if usage:
+                    api_call["prompt_tokens"] = usage.get("prompt_tokens", 0)
+                    api_call["cached_tokens"] = usage.get("prompt_cache_hit_tokens", 0)
+                if cost is not None:
+                    api_call["cost"] = round(cost, 6)
             
-            data["api_calls"].append(api_call)
+                data["api_calls"].append(api_call)
             
-            # 确保 performance_metrics 存在
-            if "performance_metrics" not in data:
-                data["performance_metrics"] = {
-                    "total_api_calls": 0,
-                    "successful_calls": 0,
-                    "failed_calls": 0,
-                    "total_response_time": 0,
-                    "average_response_time": 0
-                }
+                # 确保 performance_metrics 存在
+                if "performance_metrics" not in data:
+                    data["performance_metrics"] = {
+                        "total_api_calls": 0,
+                        "successful_calls": 0,
+                        "failed_calls": 0,
+                        "total_response_time": 0,
+                        "average_response_time": 0
+                    }
             
-            # 更新性能指标
-            data["performance_metrics"]["total_api_calls"] += 1
-            if success:
-                data["performance_metrics"]["successful_calls"] += 1
-                if response_time:
-                    data["performance_metrics"]["total_response_time"] += response_time
-                    if data["performance_metrics"]["successful_calls"] > 0:
-                        data["performance_metrics"]["average_response_time"] = (
-                            data["performance_metrics"]["total_response_time"] / 
-                            data["performance_metrics"]["successful_calls"]
-                        )
-            else:
-                data["performance_metrics"]["failed_calls"] += 1
+                # 更新性能指标
+                data["performance_metrics"]["total_api_calls"] += 1
+                if success:
+                    data["performance_metrics"]["successful_calls"] += 1
+                    if response_time:
+                        data["performance_metrics"]["total_response_time"] += response_time
+                        if data["performance_metrics"]["successful_calls"] > 0:
+                            data["performance_metrics"]["average_response_time"] = (
+                                data["performance_metrics"]["total_response_time"] / 
+                                data["performance_metrics"]["successful_calls"]
+                            )
+                else:
+                    data["performance_metrics"]["failed_calls"] += 1
             
-            # 确保 daily_stats 存在
-            if "daily_stats" not in data:
-                data["daily_stats"] = {}
+                # 确保 daily_stats 存在
+                if "daily_stats" not in data:
+                    data["daily_stats"] = {}
             
-            # 更新日统计
-            today = datetime.now().strftime("%Y-%m-%d")
-            if today not in data["daily_stats"]:
-                data["daily_stats"][today] = {
-                    "api_calls": 0,
-                    "successful_calls": 0,
-                    "failed_calls": 0,
-                    "total_response_time": 0,
-                    "sessions": 0
-                }
+                # 更新日统计
+                today = datetime.now().strftime("%Y-%m-%d")
+                if today not in data["daily_stats"]:
+                    data["daily_stats"][today] = {
+                        "api_calls": 0,
+                        "successful_calls": 0,
+                        "failed_calls": 0,
+                        "total_response_time": 0,
+                        "sessions": 0
+                    }
             
-            data["daily_stats"][today]["api_calls"] += 1
-            if success:
-                data["daily_stats"][today]["successful_calls"] += 1
-                if response_time:
-                    data["daily_stats"][today]["total_response_time"] += response_time
-            else:
-                data["daily_stats"][today]["failed_calls"] += 1
+                data["daily_stats"][today]["api_calls"] += 1
+                if success:
+                    data["daily_stats"][today]["successful_calls"] += 1
+                    if response_time:
+                        data["daily_stats"][today]["total_response_time"] += response_time
+                else:
+                    data["daily_stats"][today]["failed_calls"] += 1
+                if usage:
+                    daily = data["daily_stats"][today]
+                    daily["prompt_tokens"] = daily.get("prompt_tokens", 0) + usage.get("prompt_tokens", 0)
+                    daily["completion_tokens"] = daily.get("completion_tokens", 0) + usage.get("completion_tokens", 0)
+                    daily["cached_tokens"] = daily.get("cached_tokens", 0) + usage.get("prompt_cache_hit_tokens", 0)
+                    daily["cost"] = round(daily.get("cost", 0) + (cost or 0), 6)
             
-            self.save_data(data)
+                self.save_data(data)
+                # SLO燃烧率随事件增量更新（见 slo.py）；先于写实时事件，首次创建引擎回填日志时不会重复计入本次调用
+                get_slo_engine(os.path.dirname(self.data_file)).record(success, response_time)
+                publish_event(self.live_log_file, "api_call", success, response_time)
             
-        except Exception as e:
-            print(f"记录API调用失败: {e}")
+            except Exception as e:
+                print(f"记录API调用失败: {e}")
     
-    def record_session(self, user_input=None, response=None):
-        """记录用户会话"""
-        try:
-            data = self.load_data()
+    def record_session(self, user_input=None, response=None, stages=None, trace_id=None, total_ms=None):
+        """记录用户会话
+
+        stages: 本轮各阶段耗时 [{"name", "start_ms", "duration_ms", "depth"}]（见 tracing.stage_timings）
+        """
+        with _data_lock:
+            try:
+                data = self.load_data()
             
-            # 确保 sessions 是列表
-            if "sessions" not in data or not isinstance(data["sessions"], list):
-                data["sessions"] = []
+                # 确保 sessions 是列表
+                if "sessions" not in data or not isinstance(data["sessions"], list):
+                    data["sessions"] = []
             
-            session = {
-                "timestamp": datetime.now().isoformat(),
-                "user_input": user_input[:100] if user_input else None,
-                "response_preview": response[:200] if response else None,
-                "session_duration": None
-            }
+                session = {
+                    "timestamp": datetime.now().isoformat(),
+                    "user_input": user_input[:100] if user_input else None,
+                    "response_preview": response[:200] if response else None,
+                    "session_duration": None
+                }
+                if stages is not None:
+                    session["trace_id"] = trace_id
+                    session["total_ms"] = total_ms
+                    session["stages"] = stages
             
-            data["sessions"].append(session)
+                data["sessions"].append(session)
             
-            # 确保 daily_stats 存在
-            if "daily_stats" not in data:
-                data["daily_stats"] = {}
+                # 确保 daily_stats 存在
+                if "daily_stats" not in data:
+                    data["daily_stats"] = {}
             
-            # 更新日统计
-            today = datetime.now().strftime("%Y-%m-%d")
-            if today in data["daily_stats"]:
-                data["daily_stats"][today]["sessions"] += 1
+                # 更新日统计
+                today = datetime.now().strftime("%Y-%m-%d")
+                if today in data["daily_stats"]:
+                    data["daily_stats"][today]["sessions"] += 1
             
-            self.save_data(data)
+                self.save_data(data)
+                publish_event(self.live_log_file, "session")
             
-        except Exception as e:
-            print(f"记录会话失败: {e}")
+            except Exception as e:
+                print(f"记录会话失败: {e}")
     
     def record_feedback(self, feedback_data):
         """记录用户反馈"""
-        try:
-            data = self.load_data()
+        with _data_lock:
+            try:
+                data = self.load_data()
             
-            # 确保 user_feedback 是列表
-            if "user_feedback" not in data or not isinstance(data["user_feedback"], list):
-                data["user_feedback"] = []
+                # 确保 user_feedback 是列表
+                if "user_feedback" not in data or not isinstance(data["user_feedback"], list):
+                    data["user_feedback"] = []
             
-            feedback_record = {
-                "timestamp": datetime.now().isoformat(),
-                "rating": feedback_data.get("rating"),
-                "type": feedback_data.get("type"),
-                "content_preview": feedback_data.get("content", "")[:100]
-            }
+                feedback_record = {
+                    "timestamp": datetime.now().isoformat(),
+                    "rating": feedback_data.get("rating"),
+                    "type": feedback_data.get("type"),
+                    "content_preview": feedback_data.get("content", "")[:100]
+                }
             
-            data["user_feedback"].append(feedback_record)
-            self.save_data(data)
+                data["user_feedback"].append(feedback_record)
+                self.save_data(data)
             
+            except Exception as e:
+                print(f"记录反馈失败: {e}")
+
+    def record_batch_run(self, summary):
+        """记录一次批量咨询运行（吞吐量、失败数、耗时分位数）
+
+        只保存逐条耗时的汇总，不保存每条耗时，上千条的批量任务不会让 metrics.json 持续膨胀；
+        summary["latencies"] 为逐条耗时（或其抽样，见 batch_runner.LatencyReservoir），max_latency 缺省时取其最大值
+        """
+        with _data_lock:
+            try:
+                data = self.load_data()
+
+                # 确保 batch_runs 是列表
+                if "batch_runs" not in data or not isinstance(data["batch_runs"], list):
+                    data["batch_runs"] = []
+
+                latencies = summary.get("latencies", [])
+                if latencies:
+                    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                else:
+                    p50 = p95 = p99 = 0
+                batch_record = {
+                    "timestamp": datetime.now().isoformat(),
+                    "input_file": summary.get("input_file"),
+                    "output_file": summary.get("output_file"),
+                    "workers": summary.get("workers"),
+                    "processed": summary.get("processed", 0),
+                    "failed": summary.get("failed", 0),
+                    "skipped": summary.get("skipped", 0),
+                    "elapsed": round(summary.get("elapsed", 0), 3),
+                    "throughput": round(summary.get("throughput", 0), 3),
+                    "p50_latency": round(float(p50), 3),
+                    "p95_latency": round(float(p95), 3),
+                    "p99_latency": round(float(p99), 3),
+                    "max_latency": round(float(summary.get("max_latency", max(latencies, default=0))), 3)
+                }
+
+                data["batch_runs"].append(batch_record)
+                self.save_data(data)
+
+            except Exception as e:
+                print(f"记录批量运行失败: {e}")
+
+    def record_prefetch(self, prefetch_round):
+        """记录一轮后续问题预取的结果"""
+        with _data_lock:
+            try:
+                data = self.load_data()
+
+                # 确保 prefetch_rounds 是列表
+                if "prefetch_rounds" not in data or not isinstance(data["prefetch_rounds"], list):
+                    data["prefetch_rounds"] = []
+
+                data["prefetch_rounds"].append({
+                    "timestamp": datetime.now().isoformat(),
+                    "prefetched": prefetch_round.get("prefetched", 0),
+                    "hit": prefetch_round.get("hit", False),
+                    "tokens_used": prefetch_round.get("tokens_used", 0),
+                    "tokens_wasted": prefetch_round.get("tokens_wasted", 0)
+                })
+                self.save_data(data)
+
+            except Exception as e:
+                print(f"记录预取结果失败: {e}")
+
+    def record_turn_outcome(self, outcome, elapsed=None, user_input=None):
+        """记录未正常结束的对话轮次（outcome: cancelled 用户取消 / timeout 超过单轮时限）"""
+        with _data_lock:
+            try:
+                data = self.load_data()
+
+                # 确保 turn_outcomes 是列表
+                if "turn_outcomes" not in data or not isinstance(data["turn_outcomes"], list):
+                    data["turn_outcomes"] = []
+
+                data["turn_outcomes"].append({
+                    "timestamp": datetime.now().isoformat(),
+                    "outcome": outcome,
+                    "elapsed": round(elapsed, 3) if elapsed is not None else None,
+                    "user_input": user_input[:100] if user_input else None
+                })
+                self.save_data(data)
+
+            except Exception as e:
+                print(f"记录轮次结果失败: {e}")
+
+    def get_turn_outcome_stats(self, data=None):
+        """取消/超时轮次统计（总数、今日数、取消前平均等待秒数）"""
+        data = data if data is not None else self.load_snapshot()
+        today = datetime.now().strftime("%Y-%m-%d")
+        stats = {}
+        for outcome in ("cancelled", "timeout"):
+            records = [r for r in data.get("turn_outcomes", []) if r.get("outcome") == outcome]
+            elapsed = [r["elapsed"] for r in records if r.get("elapsed") is not None]
+            stats[outcome] = {
+                "total": len(records),
+                "today": len([r for r in records if r.get("timestamp", "").startswith(today)]),
+                "avg_elapsed": round(sum(elapsed) / len(elapsed), 2) if elapsed else 0
+            }
+        return stats
+
+    def get_prefetch_stats(self, data=None):
+        """获取预取统计：命中率和每次预取浪费的token"""
+        try:
+            data = data if data is not None else self.load_snapshot()
+            rounds = data.get("prefetch_rounds", [])
+
+            total_rounds = len(rounds)
+            hits = len([r for r in rounds if r.get("hit")])
+            prefetched = sum(r.get("prefetched", 0) for r in rounds)
+            tokens_used = sum(r.get("tokens_used", 0) for r in rounds)
+            tokens_wasted = sum(r.get("tokens_wasted", 0) for r in rounds)
+
+            return {
+                "rounds": total_rounds,
+                "hit_rate": round(hits / total_rounds * 100, 2) if total_rounds > 0 else 0,
+                "prefetched": prefetched,
+                "tokens_used": tokens_used,
+                "tokens_wasted": tokens_wasted,
+                "tokens_wasted_per_prefetch": round(tokens_wasted / prefetched, 1) if prefetched > 0 else 0
+            }
         except Exception as e:
-            print(f"记录反馈失败: {e}")
-    
-    def get_performance_metrics(self):
+            print(f"获取预取统计失败: {e}")
+            return {
+                "rounds": 0,
+                "hit_rate": 0,
+                "prefetched": 0,
+                "tokens_used": 0,
+                "tokens_wasted": 0,
+                "tokens_wasted_per_prefetch": 0
+            }
+
+    def get_policy_stats(self, data=None):
+        """按生成策略统计成功调用的输出token和延迟（均值、p95），按调用数降序"""
+        data = data if data is not None else self.load_snapshot()
+        groups = {}
+        for call in data.get("api_calls", []):
+            if call.get("policy") and call.get("success"):
+                groups.setdefault(call["policy"], []).append(call)
+
+        stats = {}
+        for name, calls in sorted(groups.items(), key=lambda item: -len(item[1])):
+            tokens = np.array([c["output_tokens"] for c in calls if c.get("output_tokens") is not None], dtype=float)
+            latency = np.array([c["response_time"] for c in calls if c.get("response_time") is not None], dtype=float)
+            stats[name] = {
+                "calls": len(calls),
+                "avg_output_tokens": round(float(tokens.mean()), 1) if tokens.size else 0,
+                "p95_output_tokens": round(float(np.percentile(tokens, 95)), 1) if tokens.size else 0,
+                "avg_latency": round(float(latency.mean()), 3) if latency.size else 0,
+                "p95_latency": round(float(np.percentile(latency, 95)), 3) if latency.size else 0
+            }
+        return stats
+
+    def get_spend_stats(self, days=7, data=None):
+        """最近 days 天的token用量和费用（按天），今日按小时累计的费用，以及今日花费最多的会话"""
+        data = data if data is not None else self.load_snapshot()
+        daily_stats = data.get("daily_stats", {})
+        dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days - 1, -1, -1)]
+        stats = {"dates": dates}
+        for field in ("prompt_tokens", "completion_tokens", "cached_tokens", "cost"):
+            stats[field] = [daily_stats.get(date, {}).get(field, 0) for date in dates]
+
+        today = dates[-1]
+        hourly = np.zeros(24)
+        sessions = {}
+        for call in data.get("api_calls", []):
+            if call.get("cost") is None or not call.get("timestamp", "").startswith(today):
+                continue
+            hourly[int(call["timestamp"][11:13])] += call["cost"]
+            session = sessions.setdefault(call.get("session_id") or "-", {"calls": 0, "cost": 0.0, "tokens": 0})
+            session["calls"] += 1
+            session["cost"] += call["cost"]
+            session["tokens"] += call.get("prompt_tokens", 0) + (call.get("output_tokens") or 0)
+        stats["hourly_cumulative_cost"] = [round(float(v), 6) for v in np.cumsum(hourly)[:datetime.now().hour + 1]]
+        stats["top_sessions"] = sorted(
+            ({"session_id": sid, **s, "cost": round(s["cost"], 6)} for sid, s in sessions.items()),
+            key=lambda s: -s["cost"]
+        )[:10]
+        prompt = stats["prompt_tokens"][-1]
+        stats["cache_hit_rate"] = round(stats["cached_tokens"][-1] / prompt * 100, 1) if prompt else 0
+        return stats
+
+    def get_slowest_turns(self, date=None, limit=5, data=None):
+        """某一天（默认今天）耗时最长、带分阶段耗时的对话轮次"""
+        data = data if data is not None else self.load_snapshot()
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        turns = [
+            s for s in data.get("sessions", [])
+            if s.get("stages") and s.get("timestamp", "").startswith(date)
+        ]
+        turns.sort(key=lambda s: s.get("total_ms") or 0, reverse=True)
+        return turns[:limit]
+
+    def get_performance_metrics(self, data=None):
         """获取性能指标"""
         try:
-            data = self.load_data()
+            data = data if data is not None else self.load_snapshot()
             
-            # 确保 performance_metrics 存在
-            if "performance_metrics" not in data:
-                data["performance_metrics"] = {
-                    "total_api_calls": 0,
-                    "successful_calls": 0,
-                    "failed_calls": 0,
-                    "total_response_time": 0,
-                    "average_response_time": 0
-                }
-            
-            metrics = data["performance_metrics"]
+            # 快照只读，缺失时使用默认值
+            metrics = data.get("performance_metrics") or {
+                "total_api_calls": 0,
+                "successful_calls": 0,
+                "failed_calls": 0,
+                "total_response_time": 0,
+                "average_response_time": 0
+            }
             
             # 计算成功率
             if metrics["total_api_calls"] > 0:
@@ -203,7 +783,7 @@ class MetricsDashboard:
                 "failed_calls": metrics["failed_calls"],
                 "success_rate": round(success_rate, 2),
                 "average_response_time": round(metrics["average_response_time"], 2) if metrics["average_response_time"] > 0 else 0,
-                "total_sessions": len(data.get("sessions", [])),
+                "total_sessions": len(data.get("sessions", [])) + data.get("archived_sessions", 0),
                 "total_feedback": len(data.get("user_feedback", []))
             }
         except Exception as e:
@@ -218,29 +798,14 @@ class MetricsDashboard:
                 "total_feedback": 0
             }
     
-    def get_recent_activity(self, hours=24):
+    def get_recent_activity(self, hours=24, data=None):
         """获取最近活动"""
         try:
-            data = self.load_data()
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            
-            recent_api_calls = [
-                call for call in data.get("api_calls", [])
-                if datetime.fromisoformat(call["timestamp"]) > cutoff_time
-            ]
-            
-            recent_sessions = [
-                session for session in data.get("sessions", [])
-                if datetime.fromisoformat(session["timestamp"]) > cutoff_time
-            ]
-            
-            recent_api_count = len(recent_api_calls)
-            recent_success_count = len([c for c in recent_api_calls if c.get("success", False)])
-            
+            recent = self.get_aggregates(hours=hours, days=1, data=data)["recent"]
             return {
-                "recent_api_calls": recent_api_count,
-                "recent_sessions": len(recent_sessions),
-                "recent_success_rate": (recent_success_count / recent_api_count * 100) if recent_api_count > 0 else 0
+                "recent_api_calls": recent["recent_api_calls"],
+                "recent_sessions": recent["recent_sessions"],
+                "recent_success_rate": recent["recent_success_rate"]
             }
         except Exception as e:
             print(f"获取最近活动失败: {e}")
@@ -250,47 +815,10 @@ class MetricsDashboard:
                 "recent_success_rate": 0
             }
     
-    def get_daily_stats(self, days=7):
-        """获取日统计数据 - 简化版"""
+    def get_daily_stats(self, days=7, data=None):
+        """获取日统计数据 - 由事件列按天向量化分桶"""
         try:
-            data = self.load_data()
-            
-            if "daily_stats" not in data:
-                data["daily_stats"] = {}
-            
-            # 获取最近days天的数据
-            dates = []
-            api_calls = []
-            success_rates = []
-            avg_response_times = []
-            sessions = []
-            
-            for i in range(days):
-                date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-                dates.insert(0, date)
-                
-                if date in data["daily_stats"]:
-                    stats = data["daily_stats"][date]
-                    total_calls = stats.get("api_calls", 0)
-                    successful = stats.get("successful_calls", 0)
-                    
-                    api_calls.insert(0, total_calls)
-                    success_rates.insert(0, (successful / total_calls * 100) if total_calls > 0 else 0)
-                    avg_response_times.insert(0, (stats.get("total_response_time", 0) / successful) if successful > 0 else 0)
-                    sessions.insert(0, stats.get("sessions", 0))
-                else:
-                    api_calls.insert(0, 0)
-                    success_rates.insert(0, 0)
-                    avg_response_times.insert(0, 0)
-                    sessions.insert(0, 0)
-            
-            return {
-                'dates': dates,
-                'api_calls': api_calls,
-                'success_rates': success_rates,
-                'avg_response_times': avg_response_times,
-                'sessions': sessions
-            }
+            return self.get_aggregates(days=days, data=data)["daily"]
                 
         except Exception as e:
             print(f"获取日统计数据失败: {e}")
@@ -308,10 +836,12 @@ class MetricsDashboard:
         st.markdown("实时监控AI职业规划师的性能指标和使用情况")
         
         try:
-            # 获取数据
-            metrics = self.get_performance_metrics()
-            recent_activity = self.get_recent_activity(24)
-            daily_data = self.get_daily_stats(7)
+            # 获取数据（一次渲染只加载一次快照，所有统计由同一快照计算）
+            data = self.load_snapshot()
+            metrics = self.get_performance_metrics(data)
+            aggregates = self.get_aggregates(hours=24, days=7, data=data)
+            recent_activity = aggregates["recent"]
+            daily_data = aggregates["daily"]
             
             if not daily_data['dates']:
                 st.info("暂无数据可显示，请先使用Agent进行一些对话")
@@ -349,77 +879,8 @@ class MetricsDashboard:
                     "满意度监控"
                 )
             
-            # 图表区域
-            st.subheader("📊 趋势分析")
-            
-            # API性能图表
-            fig1 = go.Figure()
-            fig1.add_trace(go.Scatter(
-                x=daily_data['dates'], 
-                y=daily_data['success_rates'],
-                mode='lines+markers',
-                name='API成功率',
-                line=dict(color='#00ff88', width=3)
-            ))
-            fig1.update_layout(
-                title='API 成功率趋势 (7天)',
-                xaxis_title='日期',
-                yaxis_title='成功率 (%)',
-                template='plotly_dark'
-            )
-            st.plotly_chart(fig1, use_container_width=True)
-            
-            # 响应时间图表
-            fig2 = go.Figure()
-            fig2.add_trace(go.Scatter(
-                x=daily_data['dates'], 
-                y=daily_data['avg_response_times'],
-                mode='lines+markers',
-                name='平均响应时间',
-                line=dict(color='#ffaa00', width=3)
-            ))
-            fig2.update_layout(
-                title='平均响应时间趋势 (7天)',
-                xaxis_title='日期',
-                yaxis_title='响应时间 (秒)',
-                template='plotly_dark'
-            )
-            st.plotly_chart(fig2, use_container_width=True)
-            
-            # 使用情况图表
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # API调用量柱状图
-                fig3 = go.Figure()
-                fig3.add_trace(go.Bar(
-                    x=daily_data['dates'], 
-                    y=daily_data['api_calls'],
-                    name='API调用量',
-                    marker_color='#636efa'
-                ))
-                fig3.update_layout(
-                    title='每日API调用量',
-                    xaxis_title='日期',
-                    yaxis_title='调用次数'
-                )
-                st.plotly_chart(fig3, use_container_width=True)
-            
-            with col2:
-                # 会话数图表
-                fig4 = go.Figure()
-                fig4.add_trace(go.Bar(
-                    x=daily_data['dates'],
-                    y=daily_data['sessions'],
-                    name='用户会话数',
-                    marker_color='#ef553b'
-                ))
-                fig4.update_layout(
-                    title='每日用户会话数',
-                    xaxis_title='日期',
-                    yaxis_title='会话数'
-                )
-                st.plotly_chart(fig4, use_container_width=True)
+            # 图表区域（可选时间范围，按范围和事件量自动选择分辨率）
+            self.show_trends()
             
             # 详细数据
             st.subheader("📋 详细统计数据")
@@ -466,9 +927,81 @@ class MetricsDashboard:
                     time_status = "🔴 较慢"
                 
                 st.info(f"**响应时间**: {time_status} ({avg_time}s)")
-            
+
+            # SLO燃烧率告警（只反映最近的窗口，短时故障也会触发）
+            self.show_slo_alerts()
+
+            # 预取效果
+            prefetch_stats = self.get_prefetch_stats(data)
+            if prefetch_stats['rounds'] > 0:
+                st.subheader("⚡ 后续问题预取")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("预取命中率", f"{prefetch_stats['hit_rate']}%", f"{prefetch_stats['rounds']} 轮")
+                with col2:
+                    st.metric("预取token消耗", prefetch_stats['tokens_used'])
+                with col3:
+                    st.metric("每次预取浪费token", prefetch_stats['tokens_wasted_per_prefetch'])
+
+            # 取消和超时的轮次
+            turn_outcomes = self.get_turn_outcome_stats(data)
+            if turn_outcomes["cancelled"]["total"] or turn_outcomes["timeout"]["total"]:
+                st.subheader("⏹️ 取消与超时")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("用户取消", turn_outcomes["cancelled"]["total"], f"{turn_outcomes['cancelled']['today']} (今日)")
+                with col2:
+                    st.metric("超时", turn_outcomes["timeout"]["total"], f"{turn_outcomes['timeout']['today']} (今日)")
+                with col3:
+                    st.metric("取消前平均等待", f"{turn_outcomes['cancelled']['avg_elapsed']}s")
+
+            # 各生成策略的输出长度和延迟
+            policy_stats = self.get_policy_stats(data)
+            if policy_stats:
+                st.subheader("🎛️ 生成策略")
+                st.dataframe(
+                    [{"策略": name, "调用数": s["calls"], "输出token均值": s["avg_output_tokens"],
+                      "输出token p95": s["p95_output_tokens"], "延迟均值(s)": s["avg_latency"],
+                      "延迟p95(s)": s["p95_latency"]} for name, s in policy_stats.items()],
+                    use_container_width=True, hide_index=True
+                )
+
+            # token用量与费用（含预算线，见 metering.py）
+            spend_stats = self.get_spend_stats(days=7, data=data)
+            if any(spend_stats["cost"]):
+                self.show_spend(spend_stats)
+
+            # 慢对话分阶段瀑布图
+            slowest_turns = self.get_slowest_turns(data=data)
+            if slowest_turns:
+                st.subheader("🐢 今日最慢对话（分阶段耗时）")
+                labels = [
+                    f"{turn['timestamp'][11:19]} {turn['total_ms'] / 1000:.2f}s - {(turn.get('user_input') or '')[:20]}"
+                    for turn in slowest_turns
+                ]
+                selected = st.selectbox("选择对话", range(len(slowest_turns)), format_func=lambda i: labels[i])
+                stages = slowest_turns[selected]["stages"]
+                fig = go.Figure(go.Bar(
+                    y=["  " * stage["depth"] + stage["name"] for stage in stages],
+                    x=[stage["duration_ms"] for stage in stages],
+                    base=[stage["start_ms"] for stage in stages],
+                    orientation='h',
+                    text=[f"{stage['duration_ms']:.1f}ms" for stage in stages],
+                    textposition='auto',
+                    marker_color='#636efa'
+                ))
+                fig.update_layout(
+                    title=f"trace {slowest_turns[selected].get('trace_id', '')[:16]}",
+                    xaxis_title='时间 (毫秒)',
+                    yaxis=dict(autorange='reversed'),
+                    template='plotly_dark',
+                    height=max(250, 40 * len(stages))
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
             # 实时监控
             st.subheader("🕒 实时监控")
+            self.show_live_metrics()
             if st.button("🔄 刷新数据"):
                 st.rerun()
             
@@ -477,11 +1010,307 @@ class MetricsDashboard:
             st.write(f"- API调用: {recent_activity['recent_api_calls']} 次")
             st.write(f"- 用户会话: {recent_activity['recent_sessions']} 次")
             st.write(f"- 成功率: {recent_activity['recent_success_rate']:.1f}%")
+            recent_latency = recent_activity['recent_latency']
+            st.write(f"- 响应时间: P50 {recent_latency['p50']}s / P95 {recent_latency['p95']}s / P99 {recent_latency['p99']}s")
+
+            # 事件导出（流式写文件，不在内存中拼接整个导出内容）
+            with st.expander("📥 导出事件数据"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    kind = st.selectbox("数据类型", ["api_calls", "sessions"])
+                with col2:
+                    export_format = st.selectbox("导出格式", ["jsonl.gz", "csv.gz", "jsonl", "csv"])
+                with col3:
+                    export_days = st.number_input("最近天数", min_value=1, max_value=365, value=7)
+
+                if st.button("生成导出文件"):
+                    from data_exporter import export_to_file, export_file_name
+                    fmt = export_format.split(".")[0]
+                    compress = export_format.endswith(".gz")
+                    export_dir = os.path.join(os.path.dirname(self.data_file), "exports")
+                    os.makedirs(export_dir, exist_ok=True)
+                    export_path = os.path.join(export_dir, export_file_name(kind, fmt, compress))
+                    start_time = (datetime.now() - timedelta(days=int(export_days))).isoformat()
+                    count = export_to_file(kind, export_path, fmt=fmt, compress=compress,
+                                           start_time=start_time, metrics_dashboard=self)
+                    with open(export_path, "rb") as f:
+                        st.download_button(
+                            label=f"📥 下载导出文件（{count} 条）",
+                            data=f,
+                            file_name=os.path.basename(export_path),
+                            mime="application/gzip" if compress else "text/plain"
+                        )
             
         except Exception as e:
             st.error(f"显示数据面板时出错: {e}")
             st.info("请检查数据文件是否完整")
 
+    def show_trends(self, max_points=MAX_CHART_POINTS):
+        """趋势图：预设或自定义时间范围，查询结果分桶后每个图表不超过 max_points 个点
+
+        使用 st.fragment 时切换时间范围只重跑这一块；旧版Streamlit没有 fragment 时随整页重跑
+        """
+        def render():
+            st.subheader("📊 趋势分析")
+            options = list(RANGE_PRESETS) + ["自定义"]
+            choice = st.radio("时间范围", options, index=options.index("7天"), horizontal=True, key="trend_range")
+            now = datetime.now()
+            if choice == "自定义":
+                dates = st.date_input("日期范围", value=(now.date() - timedelta(days=6), now.date()),
+                                      max_value=now.date(), key="trend_dates")
+                if len(dates) != 2:
+                    st.info("请选择开始和结束日期")
+                    return
+                start = datetime.combine(dates[0], datetime.min.time())
+                end = min(datetime.combine(dates[1], datetime.min.time()) + timedelta(days=1), now)
+                label = f"{dates[0]} ~ {dates[1]}"
+            else:
+                start, end = now - timedelta(seconds=RANGE_PRESETS[choice]), now
+                label = f"最近{choice}"
+
+            series = self.get_timeseries(start, end, max_points=max_points)
+            x = (series["ts"] * 1e6).astype("datetime64[us]")
+            if series["resolution"] == "raw":
+                st.caption(f"{label}：{series['events']} 次API调用、{len(series['session_ts'])} 个会话，显示原始事件")
+                if series["events"] == 0:
+                    st.info("该时间范围内没有API调用")
+                    return
+                failed = ~series["success"]
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(x=x[~failed], y=series["latency"][~failed], mode='markers',
+                                         name='成功调用', marker=dict(color='#00ff88', size=6)))
+                fig.add_trace(go.Scatter(x=x[failed], y=np.zeros(int(failed.sum())), mode='markers',
+                                         name='失败调用', marker=dict(color='#ef553b', size=9, symbol='x')))
+                fig.update_layout(
+                    title=f'API调用响应时间 ({label})',
+                    xaxis_title='时间',
+                    yaxis_title='响应时间 (秒)',
+                    template='plotly_dark'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                return
+
+            st.caption(f"{label}：{series['events']} 次API调用，按{format_bucket(series['bucket_seconds'])}分桶"
+                       f"（{len(series['ts'])} 个桶）")
+
+            # API成功率
+            fig1 = go.Figure()
+            fig1.add_trace(go.Scatter(
+                x=x,
+                y=series['success_rates'],
+                mode='lines',
+                name='API成功率',
+                line=dict(color='#00ff88', width=2)
+            ))
+            fig1.update_layout(
+                title=f'API 成功率趋势 ({label})',
+                xaxis_title='时间',
+                yaxis_title='成功率 (%)',
+                template='plotly_dark'
+            )
+            st.plotly_chart(fig1, use_container_width=True)
+
+            # 响应时间：平均值和每桶最小/最大值的范围带
+            fig2 = go.Figure()
+            fig2.add_trace(go.Scatter(x=x, y=series['latency_min'], mode='lines', name='最小',
+                                      line=dict(width=0), showlegend=False))
+            fig2.add_trace(go.Scatter(x=x, y=series['latency_max'], mode='lines', name='最小~最大',
+                                      line=dict(width=0), fill='tonexty', fillcolor='rgba(255,170,0,0.25)'))
+            fig2.add_trace(go.Scatter(x=x, y=series['latency_avg'], mode='lines', name='平均响应时间',
+                                      line=dict(color='#ffaa00', width=2)))
+            fig2.update_layout(
+                title=f'响应时间趋势 ({label})',
+                xaxis_title='时间',
+                yaxis_title='响应时间 (秒)',
+                template='plotly_dark'
+            )
+            st.plotly_chart(fig2, use_container_width=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig3 = go.Figure()
+                fig3.add_trace(go.Bar(x=x, y=series['api_calls'], name='API调用量', marker_color='#636efa'))
+                fig3.update_layout(
+                    title=f'API调用量（每{format_bucket(series["bucket_seconds"])}）',
+                    xaxis_title='时间',
+                    yaxis_title='调用次数'
+                )
+                st.plotly_chart(fig3, use_container_width=True)
+            with col2:
+                fig4 = go.Figure()
+                fig4.add_trace(go.Bar(x=x, y=series['sessions'], name='用户会话数', marker_color='#ef553b'))
+                fig4.update_layout(
+                    title=f'用户会话数（每{format_bucket(series["bucket_seconds"])}）',
+                    xaxis_title='时间',
+                    yaxis_title='会话数'
+                )
+                st.plotly_chart(fig4, use_container_width=True)
+
+        fragment = getattr(st, "fragment", None)
+        if fragment is not None:
+            fragment(render)()
+        else:
+            render()
+
+    def show_slo_alerts(self):
+        """活跃的SLO告警、各窗口燃烧率和最近的告警记录"""
+        data_dir = os.path.dirname(self.data_file)
+        state, alerts = load_states(data_dir)
+        st.subheader("🚨 SLO 告警")
+        if state is None:
+            st.info("暂无SLO状态（记录API调用的进程启动后生成）")
+            return
+        for alert in sorted(alerts, key=lambda a: a["severity"] != "critical"):
+            since = datetime.fromtimestamp(alert["ts"]).strftime("%H:%M:%S")
+            if alert["severity"] == "critical":
+                st.error(f"**[critical]** {alert['message']}（{since} 起）")
+            else:
+                st.warning(f"**[warning]** {alert['message']}（{since} 起）")
+        if not alerts:
+            st.success("🟢 没有活跃的SLO告警")
+
+        rows = []
+        for slo, windows in state["burn_rates"].items():
+            target = state["targets"][slo]
+            name = SLO_NAMES[slo] + (f"（≤{state['latency_threshold']:g}s）" if slo == "latency" else "")
+            rows.append({"SLO": name, "目标": f"{target:.2%}",
+                         **{f"燃烧率 {window}": rate for window, rate in windows.items()}})
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        st.caption("告警规则：" + "；".join(
+            f"{severity} = {long_window}与{short_window}燃烧率都 ≥ {threshold}"
+            for severity, long_window, short_window, threshold in RULES
+        ) + f"。窗口内调用数：{state['events']}")
+
+        history = load_alert_history(data_dir, limit=10)
+        if history:
+            with st.expander("最近的告警记录"):
+                st.dataframe(
+                    [{"时间": datetime.fromtimestamp(a["ts"]).strftime("%m-%d %H:%M:%S"), "状态": a["status"],
+                      "级别": a["severity"], "说明": a["message"]} for a in history],
+                    use_container_width=True, hide_index=True
+                )
+
+    def show_spend(self, spend_stats):
+        """用量与费用：今日指标、每日费用与token构成、今日累计费用对比全局预算、花费最多的会话"""
+        from metering import load_config
+
+        config = load_config()
+        currency = config["currency"]
+        daily_budget = config["budgets"]["daily"]
+        st.subheader("💰 用量与费用")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("今日费用", f"{spend_stats['cost'][-1]:.2f} {currency}",
+                      f"7天 {sum(spend_stats['cost']):.2f} {currency}")
+        with col2:
+            st.metric("今日输入token", spend_stats["prompt_tokens"][-1], f"缓存命中 {spend_stats['cache_hit_rate']}%")
+        with col3:
+            st.metric("今日输出token", spend_stats["completion_tokens"][-1])
+        with col4:
+            if daily_budget.get("hard"):
+                used = spend_stats["cost"][-1] / daily_budget["hard"]
+                st.metric("当日预算已用", f"{used * 100:.1f}%", f"硬预算 {daily_budget['hard']} {currency}")
+            else:
+                st.metric("当日预算已用", "不限")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = go.Figure(go.Bar(x=spend_stats["dates"], y=spend_stats["cost"], marker_color='#ffaa00', name='费用'))
+            fig.update_layout(title=f'每日费用 ({currency})', xaxis_title='日期', yaxis_title=currency)
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = go.Figure()
+            uncached = [p - c for p, c in zip(spend_stats["prompt_tokens"], spend_stats["cached_tokens"])]
+            for name, values, color in (("输入（命中缓存）", spend_stats["cached_tokens"], '#00cc96'),
+                                        ("输入（未命中）", uncached, '#636efa'),
+                                        ("输出", spend_stats["completion_tokens"], '#ef553b')):
+                fig.add_trace(go.Bar(x=spend_stats["dates"], y=values, name=name, marker_color=color))
+            fig.update_layout(title='每日token构成', barmode='stack', xaxis_title='日期', yaxis_title='token')
+            st.plotly_chart(fig, use_container_width=True)
+
+        fig = go.Figure(go.Scatter(
+            x=[f"{hour:02d}:00" for hour in range(len(spend_stats["hourly_cumulative_cost"]))],
+            y=spend_stats["hourly_cumulative_cost"],
+            mode='lines+markers', name='累计费用', line=dict(color='#ffaa00', width=3)
+        ))
+        for level, color in (("soft", "orange"), ("hard", "red")):
+            if daily_budget.get(level) is not None:
+                fig.add_hline(y=daily_budget[level], line_dash="dash", line_color=color,
+                              annotation_text=f"{'软' if level == 'soft' else '硬'}预算 {daily_budget[level]}")
+        fig.update_layout(title=f'今日累计费用 ({currency})', xaxis_title='小时', yaxis_title=currency,
+                          template='plotly_dark')
+        st.plotly_chart(fig, use_container_width=True)
+
+        if spend_stats["top_sessions"]:
+            st.dataframe(
+                [{"会话": s["session_id"], "调用数": s["calls"], "token": s["tokens"], f"费用({currency})": s["cost"]}
+                 for s in spend_stats["top_sessions"]],
+                use_container_width=True, hide_index=True
+            )
+
+    def show_live_metrics(self, window_seconds=120, refresh_seconds=2):
+        """实时指标：逐秒吞吐量、错误率和响应时间
+
+        使用 st.fragment 定时只重跑这一块，每次只读取事件日志的新增部分，
+        不重新加载 metrics.json；旧版Streamlit没有 fragment 时退化为随整页刷新
+        """
+        feed = get_live_feed(self.live_log_file)
+
+        def render():
+            feed.poll()
+            _, cursor = feed.events_since(st.session_state.get("live_metrics_cursor"))
+            new_events = cursor - st.session_state.get("live_metrics_cursor", cursor)
+            st.session_state.live_metrics_cursor = cursor
+            live = feed.per_second(seconds=window_seconds)
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric(f"API调用 ({window_seconds}s)", live["total_calls"], f"+{new_events} 新事件")
+            with col2:
+                st.metric("当前吞吐", f"{live['throughput'][-1]}/s",
+                          f"峰值 {max(live['throughput'])}/s")
+            with col3:
+                error_rate = sum(live["errors"]) / live["total_calls"] * 100 if live["total_calls"] else 0
+                st.metric("错误率", f"{error_rate:.1f}%")
+            with col4:
+                st.metric(f"会话 ({window_seconds}s)", live["total_sessions"])
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(x=live["seconds"], y=live["throughput"], name="吞吐量 (次/秒)",
+                                 marker_color='#636efa'))
+            fig.add_trace(go.Scatter(x=live["seconds"], y=live["error_rate"], name="错误率 (%)",
+                                     yaxis="y2", mode="lines", line=dict(color='#ef553b')))
+            fig.update_layout(
+                title=f'逐秒吞吐量与错误率 (最近{window_seconds}秒)',
+                xaxis_title='秒（相对当前）',
+                yaxis=dict(title='次/秒'),
+                yaxis2=dict(title='错误率 (%)', overlaying='y', side='right', range=[0, 100]),
+                template='plotly_dark',
+                height=320
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=live["seconds"], y=live["p50"], name="P50", mode="lines+markers",
+                                     connectgaps=False, line=dict(color='#00ff88')))
+            fig.add_trace(go.Scatter(x=live["seconds"], y=live["p95"], name="P95", mode="lines+markers",
+                                     connectgaps=False, line=dict(color='#ffaa00')))
+            fig.update_layout(
+                title='逐秒响应时间',
+                xaxis_title='秒（相对当前）',
+                yaxis_title='响应时间 (秒)',
+                template='plotly_dark',
+                height=320
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        live_enabled = st.toggle("实时刷新", value=True, key="live_metrics_enabled")
+        fragment = getattr(st, "fragment", None)
+        if live_enabled and fragment is not None:
+            fragment(run_every=refresh_seconds)(render)()
+        else:
+            render()
+
 def main():
     """数据面板主函数"""
     dashboard = MetricsDashboard()
@@ -0,0 +1,211 @@
+# prefetch_engine.py - 后续问题预取引擎（利用用户阅读回答的空闲时间）
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from telemetry import CACHE_REQUESTS, QUEUE_DEPTH
+from tokens import estimate_tokens
+from tracing import tracer
+
+# 用户对“需要...吗？”这类提议的简短肯定回复
+AFFIRMATIVE_REPLIES = ["需要", "需要的", "是的", "好的", "好", "要", "可以", "想", "想要", "嗯", "继续"]
+
+def normalize_question(text):
+    """归一化问题文本：去掉空白和标点，便于匹配"""
+    return re.sub(r"[\s，。！？、,.!?：:；;“”\"'（）()…~]", "", text or "").lower()
+
+def extract_offers(response):
+    """从回答中提取主动提供的选项，例如“需要一些具体的建议吗？”"""
+    offers = []
+    # 按句切分，保留以“吗？”结尾的提议句
+    for sentence in re.split(r"[。！\n]", response or ""):
+        # 去掉列表序号，例如“4.”、“2、”
+        sentence = re.sub(r"^\d+[.、]", "", sentence.strip(" *-\t"))
+        match = re.search(r"([^，,：:]*?)(你|您)?(需要|想要|想|要)([^，,：:]*?)吗[？?]", sentence)
+        if not match:
+            continue
+        wanted = match.group(4).strip()
+        # 例如“我有几个推荐的接单平台你需要吗？”，提议的内容在动词前面
+        if not wanted:
+            wanted = re.sub(r"^(我有|有)", "", match.group(1).strip())
+        if wanted:
+            offers.append(f"是的，请给我{wanted}")
+    return offers
+
+class PrefetchEngine:
+    def __init__(self, quick_questions=None, top_n=2, token_budget=20000, max_workers=2, wait_timeout=120):
+        """
+        quick_questions: {对话模式: [快速提问列表]}，用于预测同一类别的后续问题
+        top_n: 每轮最多预取的问题数
+        token_budget: 预取可消耗的总token上限（超出后不再预取）
+        """
+        self.quick_questions = quick_questions or {}
+        self.top_n = top_n
+        self.token_budget = token_budget
+        self.wait_timeout = wait_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.round = {}  # 当前轮次：{归一化问题: {"question", "future", "tokens"}}
+        self.offer_key = None  # 当前轮次中回答自身提议的第一个选项（用于匹配“需要”等简短回复）
+        self.metrics_dashboard = None  # 首次预取时沿用Agent的数据监控
+        self.stats = {
+            "rounds": 0,
+            "prefetched": 0,
+            "hits": 0,
+            "misses": 0,
+            "tokens_used": 0,
+            "tokens_wasted": 0
+        }
+
+    def predict(self, state, user_input, response):
+        """预测最可能的top_n个后续问题：优先回答自身的提议，其次同类快速提问"""
+        candidates = extract_offers(response)
+        candidates.extend(self.quick_questions.get(state, []))
+
+        predictions = []
+        seen = {normalize_question(user_input)}
+        for question in candidates:
+            key = normalize_question(question)
+            if key and key not in seen:
+                seen.add(key)
+                predictions.append(question)
+            if len(predictions) >= self.top_n:
+                break
+        return predictions
+
+    def schedule(self, agent, user_input, response):
+        """在后台生成预测的后续问题的回答"""
+        self._retire_round(hit=False)
+
+        predictions = self.predict(agent.current_state, user_input, response)
+        offers = extract_offers(response)
+
+        self.metrics_dashboard = agent.metrics_dashboard
+
+        with self.lock:
+            self.stats["rounds"] += 1
+            self.offer_key = normalize_question(offers[0]) if offers else None
+            for question in predictions:
+                if self.stats["tokens_used"] >= self.token_budget:
+                    print("⚠️ 预取token预算已用完，停止预取")
+                    break
+                entry = {"question": question, "tokens": 0, "served": False}
+                entry["future"] = self.executor.submit(self._generate, agent.fork(), question, entry)
+                QUEUE_DEPTH.labels("prefetch").inc()
+                entry["future"].add_done_callback(lambda f: QUEUE_DEPTH.labels("prefetch").dec())
+                self.round[normalize_question(question)] = entry
+                self.stats["prefetched"] += 1
+
+    def _generate(self, agent, question, entry):
+        """使用独立的Agent副本生成回答，不影响真实对话状态"""
+        with tracer.span("prefetch.generate"):
+            messages = agent.prepare_messages(question)
+            answer = agent.call_deepseek(messages)
+
+        usage = agent.last_usage or {}
+        tokens = usage.get("total_tokens") or (
+            sum(estimate_tokens(m["content"]) for m in messages) + estimate_tokens(answer)
+        )
+        with self.lock:
+            entry["tokens"] = tokens
+            self.stats["tokens_used"] += tokens
+
+        # 失败或超过硬预算被拒绝的回答不缓存，命中时回退到正常调用
+        if agent.last_error is not None or agent.blocked:
+            return None
+        return answer
+
+    def take(self, user_input):
+        """如果用户的问题已被预取，返回缓存的回答；否则返回None
+
+        没有进行中的预取轮次时（首轮提问、预算用完后等）不计入命中率
+        """
+        key = normalize_question(user_input)
+        with self.lock:
+            if not self.round:
+                return None
+            if key in [normalize_question(r) for r in AFFIRMATIVE_REPLIES] and self.offer_key:
+                key = self.offer_key
+            entry = self.round.get(key)
+
+        answer = None
+        if entry is not None:
+            try:
+                # 预取仍在进行时等待其完成，仍比重新请求更快
+                answer = entry["future"].result(timeout=self.wait_timeout)
+            except FutureTimeoutError:
+                answer = None
+            except Exception as e:
+                print(f"预取结果获取失败: {e}")
+                answer = None
+
+        with self.lock:
+            if answer is not None:
+                entry["served"] = True
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        CACHE_REQUESTS.labels("prefetch", "hit" if answer is not None else "miss").inc()
+
+        self._retire_round(hit=answer is not None)
+        return answer
+
+    def _retire_round(self, hit):
+        """结束当前轮次：未被使用的预取计为浪费，并写入指标数据"""
+        with self.lock:
+            entries = list(self.round.values())
+            self.round = {}
+            self.offer_key = None
+
+        if not entries:
+            return
+
+        tokens_used = 0
+        tokens_wasted = 0
+        for entry in entries:
+            # 尚未开始的预取直接取消，不再消耗token
+            if entry["future"].cancel():
+                continue
+            if entry["future"].done():
+                tokens_used += entry["tokens"]
+                if not entry["served"]:
+                    tokens_wasted += entry["tokens"]
+            else:
+                # 正在进行的请求无法撤回，完成后计入浪费
+                entry["future"].add_done_callback(lambda f, e=entry: self._add_wasted(e["tokens"]))
+
+        with self.lock:
+            self.stats["tokens_wasted"] += tokens_wasted
+
+        # 写指标文件放到后台，避免阻塞当前回答
+        if self.metrics_dashboard is not None:
+            threading.Thread(target=self.metrics_dashboard.record_prefetch, args=({
+                "prefetched": len(entries),
+                "hit": hit,
+                "tokens_used": tokens_used,
+                "tokens_wasted": tokens_wasted
+            },), daemon=True).start()
+
+    def _add_wasted(self, tokens):
+        """累计浪费的token"""
+        with self.lock:
+            self.stats["tokens_wasted"] += tokens
+
+    def get_pending_questions(self):
+        """获取当前轮次已预取的后续问题（供界面展示为快捷按钮）"""
+        with self.lock:
+            return [entry["question"] for entry in self.round.values()]
+
+    def reset(self):
+        """清空对话时丢弃所有预取结果"""
+        self._retire_round(hit=False)
+
+    def get_stats(self):
+        """获取预取统计：命中率、每次预取浪费的token"""
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups * 100, 2) if lookups > 0 else 0
+        stats["tokens_wasted_per_prefetch"] = (
+            round(stats["tokens_wasted"] / stats["prefetched"], 1) if stats["prefetched"] > 0 else 0
+        )
+        return stats
@@ -0,0 +1,258 @@
+# profile_extractor.py - 用户画像提取（正则 + 关键词表，从每条消息中提取规范化字段）
+import re
+
+from tokens import estimate_tokens
+
+# 画像字段及在提示词中的名称（按重要性排序，超出token预算时从后往前舍弃）
+PROFILE_FIELDS = {
+    "target_role": "目标岗位",
+    "years": "工作年限",
+    "degree": "学历",
+    "major": "专业",
+    "skills": "技能",
+    "age": "年龄"
+}
+
+MAX_SKILLS = 10            # 技能列表最多保留的个数（新提到的排在后面，超出时丢弃最早的）
+PROFILE_TOKEN_BUDGET = 60  # 提示词中画像部分的token上限
+
+# ========== 关键词表 ==========
+# 每项为 (规范名称, [别名...])，按顺序匹配，较长/较具体的别名放在前面
+
+DEGREES = [
+    ("博士", ["博士", "phd", "读博"]),
+    ("硕士", ["硕士", "研究生", "研一", "研二", "研三", "读研", "master", "mba"]),
+    ("本科", ["本科", "学士", "大一", "大二", "大三", "大四", "大学生", "本科生"]),
+    ("大专", ["大专", "专科", "高职"]),
+    ("高中及以下", ["高中", "中专", "职高", "初中"])
+]
+
+MAJORS = [
+    ("计算机", ["计算机科学", "计算机", "软件工程", "网络工程", "信息安全", "cs"]),
+    ("人工智能", ["人工智能"]),
+    ("数据科学", ["数据科学", "大数据"]),
+    ("电子信息", ["电子信息", "通信工程", "电子工程", "自动化"]),
+    ("数学/统计", ["数学", "统计学", "统计", "应用数学"]),
+    ("机械", ["机械"]),
+    ("土木", ["土木"]),
+    ("金融", ["金融"]),
+    ("会计/财务", ["会计", "财务管理", "审计"]),
+    ("经济学", ["经济学", "国际贸易", "经济"]),
+    ("工商管理", ["工商管理", "企业管理"]),
+    ("市场营销", ["市场营销"]),
+    ("法学", ["法学", "法律"]),
+    ("新闻传播", ["新闻", "传播学", "广告学"]),
+    ("中文", ["汉语言文学", "汉语言", "中文"]),
+    ("外语", ["英语", "日语", "翻译"]),
+    ("设计", ["视觉传达", "工业设计", "设计", "美术"]),
+    ("心理学", ["心理学"]),
+    ("医学", ["临床医学", "医学", "护理", "药学"]),
+    ("生物/化学", ["生物", "化学", "材料"]),
+    ("教育", ["师范", "教育学"])
+]
+
+SKILLS = [
+    ("Python", ["python"]),
+    ("Java", ["java(?!script)"]),
+    ("C++", [r"c\+\+", "cpp"]),
+    ("Go", ["golang", r"go语言"]),
+    ("JavaScript", ["javascript", "js(?!on)"]),
+    ("TypeScript", ["typescript"]),
+    ("前端框架", ["react", "vue", "angular"]),
+    ("SQL", ["sql", "mysql", "数据库"]),
+    ("Linux", ["linux"]),
+    ("Excel", ["excel"]),
+    ("Tableau/PowerBI", ["tableau", "power ?bi"]),
+    ("机器学习", ["机器学习", "machine learning"]),
+    ("深度学习", ["深度学习", "pytorch", "tensorflow"]),
+    ("数据分析", ["数据分析"]),
+    ("统计分析", ["统计分析", "spss"]),
+    ("产品设计", ["产品设计", "原型设计", "axure", "需求分析"]),
+    ("UI设计", ["ui设计", "figma", "sketch", "photoshop", "ps"]),
+    ("项目管理", ["项目管理", "pmp", "敏捷"]),
+    ("软件测试", ["自动化测试", "软件测试", "测试用例"]),
+    ("英语", ["英语", "雅思", "托福", "六级", "四级"]),
+    ("写作", ["写作", "文案"]),
+    ("沟通", ["沟通"]),
+    ("新媒体运营", ["新媒体", "短视频", "自媒体"])
+]
+
+ROLES = [
+    ("产品经理", ["产品经理", "产品助理", "pm"]),
+    ("数据分析师", ["数据分析师", "数据分析", "商业分析", "bi"]),
+    ("数据科学家", ["数据科学家", "数据挖掘"]),
+    ("算法工程师", ["算法工程师", "算法", "机器学习工程师", "ai工程师"]),
+    ("前端工程师", ["前端"]),
+    ("后端工程师", ["后端", "服务端"]),
+    ("测试工程师", ["测试工程师", "软件测试", "测试开发", "测试"]),
+    ("运维工程师", ["运维", "sre"]),
+    ("软件工程师", ["软件工程师", "开发工程师", "程序员", "软件开发", "开发"]),
+    ("UI/UX设计师", ["ui设计", "ux", "交互设计", "设计师"]),
+    ("运营", ["新媒体运营", "用户运营", "内容运营", "运营"]),
+    ("市场营销", ["市场营销", "市场", "品牌"]),
+    ("销售", ["销售", "商务拓展", "bd"]),
+    ("人力资源", ["人力资源", "hr", "招聘"]),
+    ("财务", ["财务", "会计", "审计"]),
+    ("项目经理", ["项目经理"]),
+    ("咨询顾问", ["咨询顾问", "咨询"]),
+    ("教师", ["教师", "老师"]),
+    ("公务员", ["公务员", "考公", "体制内"]),
+    ("自媒体", ["自媒体", "博主"])
+]
+
+def _compile(table):
+    """关键词表编译为 [(规范名称, 正则)]；英文别名按单词边界匹配，避免 "go" 命中 "google"""
+    compiled = []
+    for name, aliases in table:
+        patterns = [rf"(?<![a-z]){alias}(?![a-z])" if re.match(r"[a-z]", alias) else alias for alias in aliases]
+        compiled.append((name, re.compile("|".join(patterns), re.IGNORECASE)))
+    return compiled
+
+_DEGREES = _compile(DEGREES)
+_MAJORS = _compile(MAJORS)
+_SKILLS = _compile(SKILLS)
+_ROLES = _compile(ROLES)
+
+# ========== 数字 ==========
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUMBER = r"(\d+(?:\.\d+)?|[零一二两三四五六七八九十]+半?|半)"
+
+def parse_number(text):
+    """阿拉伯数字或简单中文数字（如 "28"、"二十八"、"两"、"两岁半" 中的 "两半"）转为数值"""
+    if re.fullmatch(r"\d+(?:\.\d+)?", text):
+        return float(text)
+    half = 0.5 if text.endswith("半") else 0.0
+    text = text.rstrip("半")
+    if not text:
+        return half
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        value = (_CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    else:
+        value = _CN_DIGITS.get(text[-1], 0)
+    return value + half
+
+def _whole(value):
+    return int(value) if value == int(value) else value
+
+# ========== 提取 ==========
+
+_AGE_PATTERNS = [
+    re.compile(rf"{_NUMBER}\s*(?:周)?岁"),
+    re.compile(rf"(?:我今年|今年|年龄)[是:：\s]*{_NUMBER}(?!\s*年)")
+]
+_YEARS_PATTERNS = [
+    re.compile(rf"{_NUMBER}\s*年(半)?多?(?:的)?(?:工作|从业|相关|开发|行业)?经验"),
+    re.compile(rf"(?:工作|从业|入行|干|做|在职)了?\s*{_NUMBER}\s*年(半)?"),
+    re.compile(rf"毕业(?:了)?\s*{_NUMBER}\s*年(半)?")
+]
+_FRESH_GRADUATE = re.compile(r"应届|刚毕业|没有工作经验|零经验|还没工作|在校")
+_MAJOR_PATTERN = re.compile(r"(?:学的是|读的是|专业是|学|读|主修)([一-龥A-Za-z]{1,10}?)(?:专业|系|方向)")
+# 表示意向的词之后出现的岗位才算目标岗位（“做了5年测试”是现状，“想转行做产品经理”是目标）
+_INTENT_PATTERN = re.compile(r"(?:想|希望|打算|准备|计划|目标是?|想要|转行|转型|转到|转向|跳槽到|应聘|求职|投递|面试|成为|当上?)([^，。,.!?！？；;]{0,20})")
+# 岗位后面跟着“面试/岗位/offer”时同样是目标岗位（“产品经理面试一般问什么”）
+_TARGET_SUFFIX_PATTERN = re.compile(r"([^，。,.!?！？；;]{0,10})(?:面试|岗位|职位|的offer)", re.IGNORECASE)
+# 出现这些词时才在整句中查找专业（避免“我想学数据分析”之类被当成专业）
+_MAJOR_HINT = re.compile(r"专业|学的是|读的是|主修|毕业于|学生|本科|硕士|博士|学历")
+
+def _first_match(compiled, text):
+    for name, pattern in compiled:
+        if pattern.search(text):
+            return name
+    return None
+
+def extract_profile(text):
+    """从一条消息中提取规范化的画像字段（只返回识别到的字段）"""
+    fields = {}
+    if not text:
+        return fields
+
+    for pattern in _AGE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            age = parse_number(match.group(1))
+            if 14 <= age <= 70:
+                fields["age"] = int(age)
+                break
+
+    for pattern in _YEARS_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            years = parse_number(match.group(1)) + (0.5 if match.group(2) else 0)
+            if 0 <= years <= 50:
+                fields["years"] = _whole(years)
+                break
+    if "years" not in fields and _FRESH_GRADUATE.search(text):
+        fields["years"] = 0
+
+    degree = _first_match(_DEGREES, text)
+    if degree:
+        fields["degree"] = degree
+
+    # 先在“学的是XX专业”这类片段里找，再在整句里找
+    match = _MAJOR_PATTERN.search(text)
+    major = _first_match(_MAJORS, match.group(1)) if match else None
+    if major is None and _MAJOR_HINT.search(text):
+        major = _first_match(_MAJORS, text)
+    if major:
+        fields["major"] = major
+
+    # 意向片段里的岗位是目标岗位，不算已掌握的技能（“想转行做数据分析”）
+    current = text
+    for match in [*_INTENT_PATTERN.finditer(text), *_TARGET_SUFFIX_PATTERN.finditer(text)]:
+        role = _first_match(_ROLES, match.group(1))
+        if role:
+            fields.setdefault("target_role", role)
+            current = current.replace(match.group(0), "，")
+
+    skills = [name for name, pattern in _SKILLS if pattern.search(current)]
+    if skills:
+        fields["skills"] = skills
+
+    return fields
+
+def merge_profile(profile, fields):
+    """把新提取的字段合并进画像（原地修改）：单值字段以最新为准，技能取并集"""
+    for key, value in fields.items():
+        if key == "skills":
+            skills = [s for s in profile.get("skills", []) if s not in value] + value
+            profile["skills"] = skills[-MAX_SKILLS:]
+        else:
+            profile[key] = value
+    return profile
+
+def _format_value(key, value):
+    if key == "skills" and isinstance(value, list):
+        return "、".join(value)
+    if key == "years":
+        return f"{value}年" if value else "应届/无经验"
+    if key == "age":
+        return f"{value}岁"
+    return str(value)
+
+def format_profile(profile, max_tokens=PROFILE_TOKEN_BUDGET):
+    """画像的紧凑文本（用于系统提示），不超过 max_tokens
+
+    例如 "目标岗位:数据分析师；工作年限:2年；专业:计算机；技能:Python、SQL"。
+    超出预算时先减少技能个数，再从最不重要的字段开始舍弃；
+    外部传入的其他字段（如批量处理的profile）排在已知字段之后，值会被截断
+    """
+    items = [(key, PROFILE_FIELDS[key], profile[key]) for key in PROFILE_FIELDS if profile.get(key) not in (None, "", [])]
+    items += [(key, key, str(value)[:20]) for key, value in profile.items() if key not in PROFILE_FIELDS and value]
+    if not items:
+        return "暂无"
+
+    def render(items):
+        return "；".join(f"{label}:{_format_value(key, value)}" for key, label, value in items)
+
+    text = render(items)
+    while estimate_tokens(text) > max_tokens and items:
+        skills = next((i for i, item in enumerate(items) if item[0] == "skills" and len(item[2]) > 1), None)
+        if skills is not None:
+            key, label, value = items[skills]
+            items[skills] = (key, label, value[1:])  # 先丢最早提到的技能
+        else:
+            items.pop()
+        text = render(items)
+    return text or "暂无"
@@ -0,0 +1,296 @@
+# sampling_profiler.py - 按需开启的采样分析器（输出collapsed栈和speedscope文件，供火焰图查看）
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = "data/profiles"
+REQUEST_FILE = "request.json"
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _stack(frame, limit=200):
+    """从叶子帧回溯，返回根在前的函数名元组"""
+    names = []
+    while frame is not None and len(names) < limit:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(names))
+
+class ThreadSampler:
+    """后台线程定时读取 sys._current_frames()，采样进程内所有线程（默认后端）"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.exclude_threads = set()  # 不采样的线程（例如正在 sleep 等待采集结束的调用方）
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id in self.exclude_threads:
+                    continue
+                stack = _stack(frame)
+                # 空闲等待的线程不计入（只看真正在干活的栈）
+                if stack and stack[-1].startswith(("wait ", "select ", "_wait_for_tstate_lock ", "poll ")):
+                    continue
+                self.stacks[(f"thread:{names.get(thread_id, thread_id)}",) + stack] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+class SignalSampler:
+    """ITIMER_PROF信号采样（只采样主线程、按CPU时间计时，需在主线程中启动，如命令行批处理）"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._previous = None
+
+    def _handler(self, signum, frame):
+        self.stacks[("thread:MainThread",) + _stack(frame)] += 1
+        self.samples += 1
+
+    def start(self):
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("signal后端只能在主线程中启动")
+        self._previous = signal.signal(signal.SIGPROF, self._handler)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+        return self.stacks
+
+# 可插拔后端：名称 -> 类（构造参数为采样间隔，需实现 start() 和返回 Counter 的 stop()）
+BACKENDS = {"thread": ThreadSampler}
+if hasattr(signal, "setitimer"):
+    BACKENDS["signal"] = SignalSampler
+
+def register_backend(name, backend_class):
+    """注册自定义采样后端"""
+    BACKENDS[name] = backend_class
+
+def write_collapsed(stacks, path):
+    """collapsed栈格式（每行 “根;...;叶 次数”，flamegraph.pl / speedscope 均可读取）"""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(";".join(stack) + f" {count}\n")
+
+def write_speedscope(stacks, path, name, interval):
+    """speedscope采样格式"""
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for stack, count in stacks.most_common():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame})
+            indexes.append(frame_index[frame])
+        samples.append(indexes)
+        weights.append(round(count * interval, 6))
+    document = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 6),
+            "samples": samples,
+            "weights": weights
+        }],
+        "name": name,
+        "exporter": "career_agent.sampling_profiler"
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False)
+
+def top_functions(stacks, limit=10):
+    """热点函数：self为栈顶（正在执行）的采样数，total为出现在栈中的采样数"""
+    self_counts = Counter()
+    total_counts = Counter()
+    total = sum(stacks.values())
+    for stack, count in stacks.items():
+        frames = [f for f in stack if not f.startswith("thread:")]
+        if not frames:
+            continue
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        {
+            "function": frame,
+            "self": count,
+            "self_pct": round(count / total * 100, 1) if total else 0,
+            "total_pct": round(total_counts[frame] / total * 100, 1) if total else 0
+        }
+        for frame, count in self_counts.most_common(limit)
+    ]
+
+def save_capture(stacks, samples, started_at, label, backend, interval, profile_dir=PROFILE_DIR):
+    """写出 .collapsed / .speedscope.json / .meta.json，返回元数据"""
+    os.makedirs(profile_dir, exist_ok=True)
+    base = f"{started_at.strftime('%Y%m%d_%H%M%S')}_{label}_{os.getpid()}"
+    collapsed_path = os.path.join(profile_dir, base + ".collapsed")
+    speedscope_path = os.path.join(profile_dir, base + ".speedscope.json")
+    write_collapsed(stacks, collapsed_path)
+    write_speedscope(stacks, speedscope_path, base, interval)
+
+    meta = {
+        "name": base,
+        "label": label,
+        "pid": os.getpid(),
+        "backend": backend,
+        "started_at": started_at.isoformat(),
+        "seconds": round((datetime.now() - started_at).total_seconds(), 1),
+        "interval": interval,
+        "samples": samples,
+        "stack_samples": sum(stacks.values()),
+        "collapsed_file": os.path.basename(collapsed_path),
+        "speedscope_file": os.path.basename(speedscope_path),
+        "top_functions": top_functions(stacks)
+    }
+    with open(os.path.join(profile_dir, base + ".meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"🔥 性能采样完成: {base}（{samples} 次采样）")
+    return meta
+
+# 同一进程同时只允许一个采集
+_capture_lock = threading.Lock()
+
+def capture(seconds, interval=0.01, backend="thread", profile_dir=PROFILE_DIR, label=None):
+    """采集 seconds 秒并保存，返回元数据；已有采集进行中时返回None"""
+    if not _capture_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = BACKENDS[backend](interval)
+        if isinstance(sampler, ThreadSampler):
+            sampler.exclude_threads.add(threading.get_ident())
+        started_at = datetime.now()
+        sampler.start()
+        time.sleep(seconds)
+        stacks = sampler.stop()
+        label = label or os.path.basename(sys.argv[0]) or "python"
+        return save_capture(stacks, sampler.samples, started_at, label, backend, interval, profile_dir)
+    finally:
+        _capture_lock.release()
+
+def start_capture(seconds, interval=0.01, backend="thread", profile_dir=PROFILE_DIR, label=None):
+    """在后台线程中采集，立即返回"""
+    thread = threading.Thread(
+        target=capture, args=(seconds, interval, backend, profile_dir, label), name="profile-capture", daemon=True
+    )
+    thread.start()
+    return thread
+
+def is_capturing():
+    return _capture_lock.locked()
+
+def request_capture(seconds, interval=0.01, profile_dir=PROFILE_DIR):
+    """请求所有在监听的工作进程（如 agent_ui）采集 seconds 秒"""
+    os.makedirs(profile_dir, exist_ok=True)
+    request = {"id": f"{time.time():.6f}", "seconds": seconds, "interval": interval}
+    tmp_path = os.path.join(profile_dir, REQUEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(request, f)
+    os.replace(tmp_path, os.path.join(profile_dir, REQUEST_FILE))
+    return request
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+def watch_requests(label, profile_dir=PROFILE_DIR, poll_interval=1.0):
+    """在后台轮询采集请求文件（每个进程只启动一个监听线程），只响应启动之后发出的请求"""
+    with _watchers_lock:
+        if profile_dir in _watchers:
+            return
+        _watchers[profile_dir] = True
+
+    request_path = os.path.join(profile_dir, REQUEST_FILE)
+
+    def read_request_id():
+        try:
+            with open(request_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def run():
+        seen = read_request_id()
+        seen_id = seen["id"] if seen else None
+        while True:
+            time.sleep(poll_interval)
+            request = read_request_id()
+            if request and request.get("id") != seen_id:
+                seen_id = request.get("id")
+                capture(float(request.get("seconds", 10)), float(request.get("interval", 0.01)),
+                        profile_dir=profile_dir, label=label)
+
+    threading.Thread(target=run, name="profile-watcher", daemon=True).start()
+
+def list_captures(profile_dir=PROFILE_DIR, limit=50):
+    """列出最近的采集（按时间倒序）"""
+    if not os.path.isdir(profile_dir):
+        return []
+    captures = []
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        if not name.endswith(".meta.json"):
+            continue
+        try:
+            with open(os.path.join(profile_dir, name), "r", encoding="utf-8") as f:
+                captures.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+        if len(captures) >= limit:
+            break
+    return captures
+
+def main():
+    """命令行入口：采样分析一个脚本的完整运行，例如 python sampling_profiler.py batch_runner.py in.jsonl out.jsonl"""
+    import runpy
+
+    parser = argparse.ArgumentParser(description="AI职业规划师 - 采样性能分析")
+    parser.add_argument("--interval", type=float, default=0.01, help="采样间隔（秒，默认0.01）")
+    parser.add_argument("--backend", choices=list(BACKENDS.keys()), default="thread", help="采样后端（默认thread）")
+    parser.add_argument("script", help="要分析的Python脚本")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="脚本参数")
+    args = parser.parse_args()
+
+    sys.argv = [args.script] + args.args
+    sampler = BACKENDS[args.backend](args.interval)
+    started_at = datetime.now()
+    sampler.start()
+    try:
+        runpy.run_path(args.script, run_name="__main__")
+    finally:
+        stacks = sampler.stop()
+        save_capture(stacks, sampler.samples, started_at, os.path.basename(args.script),
+                     args.backend, args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# singleflight.py - 相同请求的在途合并（同一时刻只发一次上游调用，结果分发给所有等待者）
+import contextvars
+import hashlib
+import json
+import threading
+
+from telemetry import SINGLEFLIGHT_REQUESTS
+from turn_executor import CancelToken
+
+def request_key(*parts):
+    """规范化（键排序、紧凑分隔符）后的请求内容哈希"""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class _Flight:
+    """一次在途的上游调用"""
+
+    __slots__ = ("key", "token", "parts", "cond", "done", "result", "error", "waiters")
+
+    def __init__(self, key):
+        self.key = key
+        self.token = CancelToken()  # 所有等待者都离开时取消上游调用
+        self.parts = []             # 已收到的流式片段
+        self.cond = threading.Condition()
+        self.done = False
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """do(key, fn) 相同 key 的调用同时在途时只执行一次 fn
+
+    - fn(token, emit) 在独立线程中执行上游调用：token 为上游调用的取消令牌，emit(片段) 分发流式片段
+    - 每个等待者可以带自己的取消令牌（只停止自己的等待，仍有其他等待者时上游调用继续）
+      和 on_delta 回调（先补发已收到的片段，再实时接收后续片段）
+    - 只合并在途的调用，结束后相同的请求会重新发起
+    """
+
+    def __init__(self, poll_interval=0.1):
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn, cancel_token=None, on_delta=None):
+        """返回 (fn的结果, 是否与其他调用合并)；fn抛出的异常会在每个等待者中重新抛出"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight(key)
+            flight.waiters += 1
+            self.stats["leaders" if leader else "followers"] += 1
+        SINGLEFLIGHT_REQUESTS.labels("leader" if leader else "follower").inc()
+
+        if leader:
+            # 复制上下文，上游调用的span仍挂在发起者的trace下
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(self._run, flight, fn), name="singleflight", daemon=True).start()
+        return self._wait(flight, cancel_token, on_delta), not leader
+
+    def _run(self, flight, fn):
+        def emit(part):
+            with flight.cond:
+                flight.parts.append(part)
+                flight.cond.notify_all()
+
+        result = error = None
+        try:
+            result = fn(flight.token, emit)
+        except Exception as e:
+            error = e
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+        with flight.cond:
+            flight.result = result
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+
+    def _wait(self, flight, cancel_token, on_delta):
+        delivered = 0
+        try:
+            with flight.cond:
+                while True:
+                    if on_delta is not None:
+                        while delivered < len(flight.parts):
+                            on_delta(flight.parts[delivered])
+                            delivered += 1
+                    if flight.done:
+                        break
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    flight.cond.wait(self.poll_interval)
+        finally:
+            with self.lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and not flight.done
+                if abandoned and self.flights.get(flight.key) is flight:
+                    del self.flights[flight.key]
+            if abandoned:
+                flight.token.cancel("cancelled")
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def coalescing_ratio(self):
+        """被合并（未单独发起上游调用）的请求占比"""
+        with self.lock:
+            total = self.stats["leaders"] + self.stats["followers"]
+            return self.stats["followers"] / total if total else 0.0
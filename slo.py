@@ -0,0 +1,302 @@
+# slo.py - SLO多窗口燃烧率告警（可用性、延迟），随事件记录增量更新
+#
+# 两个SLO：
+#   availability  成功调用占比不低于 SLO_AVAILABILITY_TARGET（默认0.99）
+#   latency       成功调用中完整响应时间不超过 SLO_LATENCY_THRESHOLD 秒（默认20）的占比不低于 SLO_LATENCY_TARGET（默认0.99）
+# 燃烧率 = 窗口内坏事件占比 / 错误预算（1 - 目标）。告警规则（多窗口多燃烧率：长窗口和短窗口都超过阈值时触发，
+# 之后短窗口降到阈值以下即解除，故障恢复后几分钟内解除）：
+#   critical  1小时和5分钟燃烧率都 >= 14.4（按此速度约2天耗尽30天的错误预算）
+#   warning   6小时和5分钟燃烧率都 >= 6
+# 每个窗口由固定宽度的时间桶组成，记录事件只更新最新的桶和窗口累计值，过期的桶从头部弹出，均摊O(1)，不重新扫描历史。
+# 告警触发和解除时追加写入 data/alerts.jsonl，设置 SLO_WEBHOOK_URL 时同时POST到该地址；
+# 当前状态写入 data/slo/<进程号>.json，数据面板读取展示。
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+from telemetry import SLO_ALERTS, SLO_BURN_RATE
+
+# 窗口名 -> (窗口长度秒, 桶宽度秒)
+WINDOWS = {"5m": (300, 10), "1h": (3600, 60), "6h": (21600, 300)}
+# (严重程度, 长窗口, 短窗口, 燃烧率阈值)
+RULES = (("critical", "1h", "5m", 14.4), ("warning", "6h", "5m", 6.0))
+SLO_NAMES = {"availability": "可用性", "latency": "延迟"}
+
+class _Window:
+    """滑动窗口计数：[调用数, 失败数, 成功数, 慢调用数]"""
+
+    __slots__ = ("length", "bucket", "buckets", "totals")
+
+    def __init__(self, length, bucket):
+        self.length = length
+        self.bucket = bucket
+        self.buckets = deque()  # [桶起点, 调用数, 失败数, 成功数, 慢调用数]
+        self.totals = [0, 0, 0, 0]
+
+    def add(self, ts, counts):
+        start = ts - ts % self.bucket
+        if self.buckets and start <= self.buckets[-1][0]:
+            # 同一个桶，或多线程下稍晚到达的旧事件：计入最新的桶
+            current = self.buckets[-1]
+        else:
+            current = [start, 0, 0, 0, 0]
+            self.buckets.append(current)
+        for i, count in enumerate(counts):
+            current[i + 1] += count
+            self.totals[i] += count
+
+    def expire(self, now):
+        cutoff = now - self.length
+        while self.buckets and self.buckets[0][0] + self.bucket <= cutoff:
+            expired = self.buckets.popleft()
+            for i in range(4):
+                self.totals[i] -= expired[i + 1]
+
+    def burn_rates(self, availability_budget, latency_budget):
+        calls, errors, ok, slow = self.totals
+        return {
+            "availability": errors / calls / availability_budget if calls else 0.0,
+            "latency": slow / ok / latency_budget if ok else 0.0
+        }
+
+class SLOEngine:
+    """record() 记录一次API调用并重新评估告警；evaluate() 也由后台线程定期调用，流量停止后告警照常解除"""
+
+    def __init__(self, availability_target=0.99, latency_target=0.99, latency_threshold=20.0, min_events=20,
+                 state_file=None, alert_log=None, webhook_url=None, save_interval=5, tick_seconds=15):
+        self.targets = {"availability": availability_target, "latency": latency_target}
+        self.latency_threshold = latency_threshold
+        self.min_events = min_events
+        self.state_file = state_file
+        self.alert_log = alert_log
+        self.webhook_url = webhook_url
+        self.save_interval = save_interval
+        self.tick_seconds = tick_seconds
+        self.lock = threading.Lock()
+        self.windows = {name: _Window(length, bucket) for name, (length, bucket) in WINDOWS.items()}
+        self.active = {}  # (slo, 严重程度) -> 告警
+        self.saved_at = 0.0
+        self.ticker = None
+
+    def record(self, success, latency=None, ts=None, evaluate=True):
+        ts = ts if ts is not None else time.time()
+        timed = success and latency is not None
+        counts = (1, 0 if success else 1, 1 if timed else 0, 1 if timed and latency > self.latency_threshold else 0)
+        with self.lock:
+            for window in self.windows.values():
+                window.add(ts, counts)
+        if evaluate:
+            self._ensure_ticker()
+            return self.evaluate(ts)
+        return []
+
+    def burn_rates(self, now=None):
+        """{slo: {窗口: 燃烧率}}"""
+        with self.lock:
+            return self._burn_rates(now if now is not None else time.time())
+
+    def _burn_rates(self, now):
+        """调用时须持有 lock"""
+        rates = {slo: {} for slo in self.targets}
+        for name, window in self.windows.items():
+            window.expire(now)
+            for slo, rate in window.burn_rates(1 - self.targets["availability"], 1 - self.targets["latency"]).items():
+                rates[slo][name] = rate
+        return rates
+
+    def evaluate(self, now=None):
+        """按告警规则判断触发和解除，返回本次状态变化的告警列表"""
+        now = now if now is not None else time.time()
+        changes = []
+        with self.lock:
+            rates = self._burn_rates(now)
+            events = {name: window.totals[0] for name, window in self.windows.items()}
+            for slo in self.targets:
+                for severity, long_window, short_window, threshold in RULES:
+                    key = (slo, severity)
+                    if key in self.active:
+                        # 已触发的告警只看短窗口解除，长窗口在阈值附近波动时不反复触发/解除
+                        firing = rates[slo][short_window] >= threshold
+                    else:
+                        firing = (events[long_window] >= self.min_events
+                                  and rates[slo][long_window] >= threshold and rates[slo][short_window] >= threshold)
+                    if firing and key not in self.active:
+                        alert = self._alert(slo, severity, long_window, short_window, threshold, rates, now, "firing")
+                        self.active[key] = alert
+                        changes.append(alert)
+                    elif not firing and key in self.active:
+                        del self.active[key]
+                        changes.append(
+                            self._alert(slo, severity, long_window, short_window, threshold, rates, now, "resolved")
+                        )
+            save = changes or now - self.saved_at >= self.save_interval
+            if save:
+                self.saved_at = now
+                state = self._state(rates, now)
+
+        for slo, windows in rates.items():
+            for name, rate in windows.items():
+                SLO_BURN_RATE.labels(slo, name).set(round(rate, 3))
+        for alert in changes:
+            SLO_ALERTS.labels(alert["slo"], alert["severity"]).set(1 if alert["status"] == "firing" else 0)
+            self._notify(alert)
+        if save:
+            self._save(state)
+        return changes
+
+    def _alert(self, slo, severity, long_window, short_window, threshold, rates, now, status):
+        long_rate, short_rate = rates[slo][long_window], rates[slo][short_window]
+        verb = "错误预算消耗过快" if status == "firing" else "已恢复"
+        return {
+            "slo": slo,
+            "severity": severity,
+            "status": status,
+            "ts": round(now, 3),
+            "objective": self.targets[slo],
+            "threshold": threshold,
+            "burn_rates": {long_window: round(long_rate, 2), short_window: round(short_rate, 2)},
+            "message": f"{SLO_NAMES[slo]}SLO（{self.targets[slo]:.2%}）{verb}：{long_window} 燃烧率 {long_rate:.1f}，"
+                       f"{short_window} 燃烧率 {short_rate:.1f}（阈值 {threshold}）"
+        }
+
+    def _state(self, rates, now):
+        return {
+            "pid": os.getpid(),
+            "updated": round(now, 3),
+            "targets": self.targets,
+            "latency_threshold": self.latency_threshold,
+            "events": {name: window.totals[0] for name, window in self.windows.items()},
+            "burn_rates": {slo: {name: round(rate, 3) for name, rate in windows.items()}
+                           for slo, windows in rates.items()},
+            "active_alerts": list(self.active.values())
+        }
+
+    def _save(self, state):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_file = self.state_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            print(f"保存SLO状态失败: {e}")
+
+    def _notify(self, alert):
+        """告警写入日志文件；配置了webhook时在后台线程POST，不阻塞记录事件的调用方"""
+        print(f"{'🚨' if alert['status'] == 'firing' else '✅'} [{alert['severity']}] {alert['message']}")
+        if self.alert_log:
+            try:
+                with open(self.alert_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"写入告警日志失败: {e}")
+        if self.webhook_url:
+            threading.Thread(target=self._post, args=(alert,), name="slo-webhook", daemon=True).start()
+
+    def _post(self, alert):
+        try:
+            requests.post(self.webhook_url, json=alert, timeout=5)
+        except requests.RequestException as e:
+            print(f"发送告警webhook失败: {e}")
+
+    def _ensure_ticker(self):
+        if self.ticker is not None or not self.tick_seconds:
+            return
+        with self.lock:
+            if self.ticker is not None:
+                return
+
+            def tick():
+                while True:
+                    time.sleep(self.tick_seconds)
+                    self.evaluate()
+
+            self.ticker = threading.Thread(target=tick, name="slo-ticker", daemon=True)
+            self.ticker.start()
+
+    def backfill(self, log_file, now=None):
+        """从实时事件日志（见 live_metrics.py）读入最近6小时的API调用，进程重启后窗口不从零开始"""
+        now = now if now is not None else time.time()
+        start = now - max(length for length, _ in WINDOWS.values())
+        count = 0
+        for path in (log_file + ".1", log_file):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except ValueError:
+                            continue
+                        if event.get("kind") == "api_call" and event.get("ts", 0) >= start:
+                            self.record(event.get("success", True), event.get("latency"), event["ts"], evaluate=False)
+                            count += 1
+            except OSError:
+                continue
+        if count:
+            self.evaluate(now)
+        return count
+
+def load_states(data_dir="data", max_age=600):
+    """读取各进程最近 max_age 秒内更新过的SLO状态，返回 (最近更新的状态, 全部活跃告警)"""
+    state_dir = os.path.join(data_dir, "slo")
+    states = []
+    try:
+        names = os.listdir(state_dir)
+    except OSError:
+        return None, []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(state_dir, name), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if time.time() - state.get("updated", 0) <= max_age:
+            states.append(state)
+    if not states:
+        return None, []
+    states.sort(key=lambda s: s["updated"])
+    alerts = [alert for state in states for alert in state.get("active_alerts", [])]
+    return states[-1], alerts
+
+def load_alert_history(data_dir="data", limit=20):
+    """最近的告警触发/解除记录（新的在前）"""
+    try:
+        with open(os.path.join(data_dir, "alerts.jsonl"), "r", encoding="utf-8") as f:
+            lines = deque(f, maxlen=limit)
+    except OSError:
+        return []
+    history = []
+    for line in reversed(lines):
+        try:
+            history.append(json.loads(line))
+        except ValueError:
+            continue
+    return history
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_slo_engine(data_dir="data"):
+    """进程内共享的SLO引擎（每个数据目录一个），首次创建时从实时事件日志回填"""
+    with _engines_lock:
+        engine = _engines.get(data_dir)
+        if engine is None:
+            engine = _engines[data_dir] = SLOEngine(
+                availability_target=float(os.getenv("SLO_AVAILABILITY_TARGET", "0.99")),
+                latency_target=float(os.getenv("SLO_LATENCY_TARGET", "0.99")),
+                latency_threshold=float(os.getenv("SLO_LATENCY_THRESHOLD", "20")),
+                min_events=int(os.getenv("SLO_MIN_EVENTS", "20")),
+                state_file=os.path.join(data_dir, "slo", f"{os.getpid()}.json"),
+                alert_log=os.path.join(data_dir, "alerts.jsonl"),
+                webhook_url=os.getenv("SLO_WEBHOOK_URL") or None
+            )
+            engine.backfill(os.path.join(data_dir, "live_events.jsonl"))
+        return engine
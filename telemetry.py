@@ -0,0 +1,297 @@
+# telemetry.py - 进程内指标注册表与OpenMetrics导出（不依赖prometheus_client）
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# 默认直方图分桶（秒）：覆盖存储写入的毫秒级到API调用的分钟级
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(ABC):
+    """带标签的指标族：labels(...) 返回（并缓存）对应标签组合的子指标
+
+    子类实现 _new_child（创建一个标签组合的子指标）和 _samples（导出子指标的样本行）
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}  # 标签值（字符串）-> 子指标，用于导出
+        self._lookup = {}   # 调用方传入的原始标签值 -> 子指标，热路径上免去字符串转换
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            key = tuple(str(v) for v in values)
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+                self._lookup[values] = child
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """创建一个标签组合的子指标"""
+
+    @abstractmethod
+    def _samples(self, values, child):
+        """子指标的OpenMetrics样本行"""
+
+    def collect(self):
+        """生成该指标族的OpenMetrics文本行"""
+        lines = [f"# TYPE {self.name} {self.type_name}", f"# HELP {self.name} {_escape(self.documentation)}"]
+        for values, child in sorted(self.children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """单调递增计数器（样本名自动加 _total 后缀）"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def _samples(self, values, child):
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+class Gauge(_Metric):
+    """可增可减的瞬时值（活跃会话数、队列深度）"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self.children[()].dec(amount)
+
+    def set(self, value):
+        self.children[()].set(value)
+
+    def _samples(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "lock")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+class _Timer:
+    """with histogram.time(): ... 记录代码块耗时"""
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+class Histogram(_Metric):
+    """分桶直方图（各桶只记录落入本桶的次数，导出时再累加为累计分布）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self.children[()].observe(value)
+
+    def time(self):
+        return self.children[()].time()
+
+    def _samples(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"指标 {metric.name} 已注册")
+            self.metrics[metric.name] = metric
+
+    def render(self):
+        """导出OpenMetrics文本格式"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ========== 指标定义 ==========
+API_LATENCY = Histogram(
+    "career_agent_api_request_duration_seconds", "DeepSeek API调用耗时（按HTTP状态）", ["status"]
+)
+TOKENS = Counter("career_agent_tokens", "API消耗的token数（in/out/in_cached）", ["direction"])
+CACHE_REQUESTS = Counter("career_agent_cache_requests", "缓存查询次数（按缓存和命中结果）", ["cache", "result"])
+RETRIES = Counter("career_agent_retries", "API调用重试次数（按原因）", ["reason"])
+STORAGE_WRITE_LATENCY = Histogram(
+    "career_agent_storage_write_duration_seconds", "JSON存储写入耗时（feedback/metrics）", ["store"]
+)
+ACTIVE_SESSIONS = Gauge("career_agent_active_sessions", "当前活跃的对话会话数")
+QUEUE_DEPTH = Gauge("career_agent_queue_depth", "后台任务队列中等待或执行中的任务数", ["queue"])
+TURN_OUTCOMES = Counter("career_agent_turns", "对话轮次结果（completed/failed/blocked/cancelled/timeout）", ["outcome"])
+SINGLEFLIGHT_REQUESTS = Counter("career_agent_singleflight_requests", "DeepSeek请求的在途合并（leader发起上游调用/follower复用在途结果）", ["role"])
+HEDGED_REQUESTS = Counter(
+    "career_agent_hedged_requests",
+    "对冲请求结果（not_needed 阈值前已响应 / primary_won 原请求先响应 / hedge_won 对冲请求先响应 / rate_limited 超出对冲比例上限）",
+    ["result"]
+)
+HEDGE_THRESHOLD = Gauge("career_agent_hedge_threshold_seconds", "当前发出对冲请求的等待阈值（近期首个响应耗时的分位数）", ["mode"])
+KEY_REQUESTS = Counter(
+    "career_agent_api_key_requests", "按API密钥统计的上游请求（ok/rate_limited/auth_error/error/client_error/cancelled）",
+    ["key", "result"]
+)
+KEY_IN_FLIGHT = Gauge("career_agent_api_key_in_flight", "各API密钥当前在途的上游请求数", ["key"])
+SPEND = Counter("career_agent_spend", "按价格表计算的API费用（币种见 metering.json）", ["model"])
+BUDGET_ACTIONS = Counter(
+    "career_agent_budget_actions", "预算控制动作（degraded 降低max_tokens / blocked 只用缓存回答 / prefetch_paused 暂停预取）",
+    ["scope", "action"]
+)
+SLO_BURN_RATE = Gauge("career_agent_slo_burn_rate", "SLO错误预算燃烧率（按SLO和窗口）", ["slo", "window"])
+SLO_ALERTS = Gauge("career_agent_slo_alert_active", "SLO告警是否触发中（1触发/0未触发）", ["slo", "severity"])
+
+# ========== HTTP导出 ==========
+_server = None
+_server_lock = threading.Lock()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 抓取请求很频繁，不打印访问日志
+
+def start_metrics_server(port=None, addr=None):
+    """在后台线程启动 /metrics 端点（同一进程只启动一次）
+
+    port 为None时读取环境变量 METRICS_PORT，未设置则不启动；返回实际监听端口或None。
+    addr 为None时读取 METRICS_ADDR，默认只监听本机（127.0.0.1），
+    需要让其他主机上的采集器抓取时显式设置 METRICS_ADDR=0.0.0.0
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        if port is None:
+            port = os.getenv("METRICS_PORT")
+            if not port:
+                return None
+        addr = addr or os.getenv("METRICS_ADDR", "127.0.0.1")
+        try:
+            _server = ThreadingHTTPServer((addr, int(port)), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️ 指标端点启动失败: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 OpenMetrics端点: http://{addr}:{_server.server_address[1]}/metrics")
+        return _server.server_address[1]
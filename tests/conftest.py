@@ -0,0 +1,13 @@
+# conftest.py - 测试公共设置：把项目根目录加入导入路径，指标数据写入临时目录
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录，默认的 data/ 相对路径不会写入仓库"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,82 @@
+# test_batch_runner.py - 批量咨询运行器：崩溃续跑不重复输出，耗时只保留有界抽样，批量运行记录只保存耗时汇总
+import json
+
+import batch_runner
+from metrics_dashboard import MetricsDashboard
+
+def fake_process_item(api_key, line_no, item):
+    return {"line": line_no, "id": item.get("id", line_no), "answer": item["question"], "success": True,
+            "error": None, "latency": 0.1 * (line_no + 1)}
+
+def write_questions(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"q{i}", "question": f"问题{i}"}, ensure_ascii=False) + "\n")
+
+def output_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["line"] for line in f]
+
+def test_resume_skips_line_written_before_checkpoint(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "process_item", fake_process_item)
+    write_questions("in.jsonl", 4)
+    # 模拟崩溃：第0、1行已写入输出，但只有第0行记录了检查点
+    with open("out.jsonl", "w", encoding="utf-8") as f:
+        for line_no in (0, 1):
+            f.write(json.dumps(fake_process_item(None, line_no, {"question": "x"})) + "\n")
+    with open("out.jsonl.ckpt", "w", encoding="utf-8") as f:
+        f.write("0\n")
+
+    summary = batch_runner.run_batch("in.jsonl", "out.jsonl", None, workers=2)
+
+    assert sorted(output_lines("out.jsonl")) == [0, 1, 2, 3]
+    assert summary["skipped"] == 2
+    assert summary["processed"] == 2
+
+def test_partial_trailing_lines_are_truncated(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "process_item", fake_process_item)
+    write_questions("in.jsonl", 3)
+    with open("out.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps(fake_process_item(None, 0, {"question": "x"})) + "\n")
+        f.write('{"line": 1, "answer": "写到一半')
+    with open("out.jsonl.ckpt", "w", encoding="utf-8") as f:
+        f.write("0\n1")  # 未写完的 "12" 之类的行号不能被当作已完成
+
+    batch_runner.run_batch("in.jsonl", "out.jsonl", None, workers=1)
+
+    assert sorted(output_lines("out.jsonl")) == [0, 1, 2]
+    assert batch_runner.load_checkpoint("out.jsonl.ckpt") == {0, 1, 2}
+
+def test_batch_run_record_keeps_only_latency_summary(workdir):
+    dashboard = MetricsDashboard()
+    dashboard.record_batch_run({"processed": 1000, "latencies": [i / 100 for i in range(1000)]})
+
+    run = dashboard.load_data()["batch_runs"][-1]
+    assert "item_latencies" not in run
+    assert run["p50_latency"] == 4.995
+    assert run["p99_latency"] == 9.89
+    assert run["max_latency"] == 9.99
+
+def test_latency_reservoir_is_bounded_and_representative():
+    reservoir = batch_runner.LatencyReservoir(size=1000, seed=0)
+    for i in range(100_000):
+        reservoir.add(i / 1000)
+
+    assert len(reservoir.samples) == 1000
+    assert reservoir.count == 100_000
+    assert reservoir.max == 99.999
+    samples = sorted(reservoir.samples)
+    assert abs(samples[500] - 50) < 5
+    assert abs(samples[950] - 95) < 2
+
+def test_run_batch_keeps_bounded_latency_sample(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "process_item", fake_process_item)
+    monkeypatch.setattr(batch_runner, "LATENCY_SAMPLE_SIZE", 5)
+    write_questions("in.jsonl", 20)
+
+    summary = batch_runner.run_batch("in.jsonl", "out.jsonl", None, workers=2)
+
+    assert summary["processed"] == 20
+    assert len(summary["latencies"]) == 5
+    run = MetricsDashboard().load_data()["batch_runs"][-1]
+    assert run["max_latency"] == 2.0
@@ -0,0 +1,46 @@
+# test_feedback_index.py - 反馈SQLite索引：并发重建互不干扰
+import json
+import os
+import threading
+
+from feedback_index import FeedbackIndex
+
+def write_feedbacks(path, count):
+    feedbacks = [{"id": f"fb{i:04d}", "timestamp": f"2025-11-01T10:{i // 60:02d}:{i % 60:02d}",
+                  "type": "问题报告" if i % 3 == 0 else "功能建议", "rating": i % 5 + 1,
+                  "content": f"第{i}条反馈：接口超时", "contact": ""} for i in range(count)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"feedbacks": feedbacks}, f, ensure_ascii=False)
+
+def test_concurrent_rebuilds_do_not_share_temp_file(tmp_path):
+    data_file = str(tmp_path / "feedback.json")
+    write_feedbacks(data_file, 2000)
+    barrier = threading.Barrier(6)
+    errors = []
+
+    def rebuild():
+        barrier.wait()
+        try:
+            FeedbackIndex(data_file).rebuild()
+        except Exception as e:  # 共用临时文件时会出现数据库损坏或文件不存在
+            errors.append(e)
+
+    threads = [threading.Thread(target=rebuild) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    index = FeedbackIndex(data_file)
+    assert index.count() == 2000
+    assert index.count({"type": "问题报告"}) == 667
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+def test_query_pages_in_time_order(tmp_path):
+    data_file = str(tmp_path / "feedback.json")
+    write_feedbacks(data_file, 25)
+    index = FeedbackIndex(data_file)
+
+    ids = [item["id"] for item in index.iter_query(batch_size=10)]
+    assert ids == [f"fb{i:04d}" for i in reversed(range(25))]
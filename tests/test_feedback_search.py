@@ -0,0 +1,99 @@
+# test_feedback_search.py - 反馈全文检索：分词、筛选与相关度排序
+import math
+import random
+
+from feedback_search import FeedbackSearchIndex, highlight, tokenize
+
+def feedback(i, content, type_="功能建议", rating=3):
+    return {"id": f"fb{i}", "content": content, "type": type_, "rating": rating}
+
+def test_tokenize_bigrams_and_words():
+    assert tokenize("接口超时 API v2") == ["接口", "口超", "超时", "api", "v2"]
+    assert tokenize("慢") == ["慢"]
+
+def test_filter_applies_before_ranking_cut():
+    docs = [feedback(i, f"请求超时了，第{i}次超时超时") for i in range(200)]
+    docs.append(feedback(200, "偶尔超时", type_="问题报告"))
+    docs += [feedback(201 + i, f"请求超时，第{i}次") for i in range(50)]
+    index = FeedbackSearchIndex.build(docs)
+
+    results = index.search("超时", limit=5, filters={"type": "问题报告"})
+    assert [r["feedback"]["id"] for r in results] == ["fb200"]
+
+def test_min_rating_filter():
+    index = FeedbackSearchIndex.build([feedback(i, "界面卡顿", rating=i % 5 + 1) for i in range(20)])
+    results = index.search("卡顿", limit=50, filters={"min_rating": 5})
+    assert {r["feedback"]["rating"] for r in results} == {5}
+    assert len(results) == 4
+
+def test_full_match_beats_newer_partial_matches():
+    # "超时"很常见（IDF < 1），唯一同时包含两个词（且包含完整查询串）的文档最旧
+    docs = [feedback(0, "调用接口 超时，等了一分钟")]
+    docs += [feedback(1 + i, f"请求超时，第{i}次") for i in range(3000)]
+    docs += [feedback(3001 + i, f"接口 正常，第{i}次") for i in range(1000)]
+    index = FeedbackSearchIndex.build(docs)
+
+    results = index.search("接口 超时", limit=5)
+    assert results[0]["feedback"]["id"] == "fb0"
+    assert results[0]["score"] > results[1]["score"]
+
+def test_phrase_bonus_ranks_exact_phrase_first():
+    docs = [feedback(0, "超时后接口报错"), feedback(1, "接口超时"), feedback(2, "超时，接口也慢")]
+    index = FeedbackSearchIndex.build(docs)
+
+    results = index.search("接口超时", limit=3)
+    assert results[0]["feedback"]["id"] == "fb1"
+
+def test_equal_scores_newest_first_and_incremental_add():
+    index = FeedbackSearchIndex.build([feedback(i, "导出失败") for i in range(3)])
+    index.add(feedback(3, "导出失败"))
+
+    assert [r["feedback"]["id"] for r in index.search("导出失败", limit=10)] == ["fb3", "fb2", "fb1", "fb0"]
+
+def test_highlight_escapes_and_marks():
+    assert highlight("<b>接口超时</b>", "超时") == "&lt;b&gt;接口<mark>超时</mark>&lt;/b&gt;"
+
+def reference_search(docs, query, limit, filters):
+    """逐文档计算得分的参考实现"""
+    doc_count = len(docs)
+    doc_tokens = [set(tokenize(d["content"])) for d in docs]
+    terms = set()
+    for token in set(tokenize(query)):
+        if len(token) == 1 and not token.isascii():
+            terms |= {t for tokens in doc_tokens for t in tokens if token in t}
+        else:
+            terms.add(token)
+    df = {t: sum(t in tokens for tokens in doc_tokens) for t in terms}
+    idf = {t: math.log(1 + doc_count / n) for t, n in df.items() if n}
+    ranked = []
+    for doc_id, (doc, tokens) in enumerate(zip(docs, doc_tokens)):
+        score = sum(w for t, w in idf.items() if t in tokens)
+        if score == 0:
+            continue
+        if filters.get("type") and doc["type"] != filters["type"]:
+            continue
+        if filters.get("min_rating") and doc["rating"] < filters["min_rating"]:
+            continue
+        if query.lower() in doc["content"].lower():
+            score += sum(idf.values())
+        ranked.append((round(score, 6), doc_id))
+    ranked.sort(reverse=True)
+    return [doc_id for _, doc_id in ranked[:limit]]
+
+def test_matches_reference_ranking():
+    rng = random.Random(7)
+    words = ["接口", "超时", "导出", "失败", "简历", "模板", "面试", "很慢", "报错", "api"]
+    docs = [feedback(i, " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))),
+                     type_=rng.choice(["问题报告", "功能建议", "使用体验"]), rating=rng.randint(1, 5))
+            for i in range(400)]
+    index = FeedbackSearchIndex.build(docs)
+
+    for query in ["接口 超时", "导出失败", "超", "api", "简历模板 面试", "很慢"]:
+        for filters in [{}, {"type": "问题报告"}, {"min_rating": 4}, {"type": "使用体验", "min_rating": 2}]:
+            for limit in (1, 5, 50):
+                got = [int(r["feedback"]["id"][2:]) for r in index.search(query, limit=limit, filters=filters)]
+                assert got == reference_search(docs, query, limit, filters), (query, filters, limit)
+
+def test_unknown_type_filter_returns_nothing():
+    index = FeedbackSearchIndex.build([feedback(0, "接口超时")])
+    assert index.search("超时", filters={"type": "不存在的类型"}) == []
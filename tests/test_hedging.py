@@ -0,0 +1,49 @@
+# test_hedging.py - 对冲请求：慢请求触发对冲且先到者胜出，对冲比例上限与启动时的对冲额度
+import time
+
+from hedging import Hedger
+from turn_executor import CancelToken
+
+def slow_primary(token, emit):
+    """第一份请求很慢（被取消时提前返回），之后的请求立即返回"""
+    if not getattr(slow_primary, "launched", False):
+        slow_primary.launched = True
+        for _ in range(100):
+            if token.cancelled:
+                return "primary-cancelled"
+            time.sleep(0.01)
+        return "primary"
+    return "hedge"
+
+def warmed_hedger(**options):
+    hedger = Hedger(min_delay=0.05, min_samples=5, poll_interval=0.01, **options)
+    hedger.samples[False].extend([0.01] * 5)
+    return hedger
+
+def test_slow_request_is_hedged_and_faster_copy_wins():
+    slow_primary.launched = False
+    hedger = warmed_hedger(max_rate=0.01)
+
+    # 刚启动、近期没有请求记录时也能对冲一次（不必先攒够 1/max_rate = 100 个请求）
+    assert hedger.run(slow_primary, CancelToken(), None, stream=False) == "hedge"
+    assert hedger.get_stats()["hedged"] == 1
+    assert hedger.get_stats()["hedge_won"] == 1
+
+def test_hedge_rate_is_capped():
+    hedger = warmed_hedger(max_rate=0.1)
+    assert hedger._allow()
+    hedger.recent.append(True)
+    assert not hedger._allow()
+    hedger.recent.extend([False] * 19)
+    assert hedger._allow()
+    hedger.recent.append(True)
+    assert not hedger._allow()
+
+    assert not Hedger(max_rate=0)._allow()
+
+def test_no_hedge_before_enough_latency_samples():
+    slow_primary.launched = False
+    hedger = Hedger(min_delay=0.05, min_samples=5, poll_interval=0.01)
+    assert hedger.threshold(False) is None
+    assert hedger.run(slow_primary, CancelToken(), None, stream=False) == "primary"
+    assert hedger.get_stats()["hedged"] == 0
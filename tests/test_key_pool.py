@@ -0,0 +1,76 @@
+# test_key_pool.py - API密钥池：最少在途选择、429冷却与AIMD、失效密钥摘除，以及429后的重发判断
+import os
+import sys
+import time
+
+from key_pool import KeyPool, mask_key
+from turn_executor import CancelToken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+def test_acquire_picks_least_loaded_key():
+    pool = KeyPool(["sk-aaaaaaaaaa", "sk-bbbbbbbbbb", "sk-aaaaaaaaaa", ""])
+    assert len(pool) == 2
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.key, second.key} == {"sk-aaaaaaaaaa", "sk-bbbbbbbbbb"}
+    pool.release(second, 200)
+    assert pool.acquire() is second
+    assert mask_key("sk-aaaaaaaaaa") == "sk-…aaaa"
+
+def test_rate_limit_cools_down_key_and_halves_limit():
+    pool = KeyPool(["sk-aaaaaaaaaa", "sk-bbbbbbbbbb"], max_concurrency=8, max_wait=0.2)
+    state = pool.acquire()
+    pool.release(state, 429, retry_after="60")
+    assert state.limit == 4
+    other = pool.acquire()
+    assert other is not state
+    pool.release(other, 200)
+
+    pool.release(pool.acquire(exclude=[other]), 200)  # exclude 之外只有冷却中的密钥时等到期限后仍用它
+    for _ in range(3):
+        pool.release(pool.acquire(), 200)
+    assert 4 < state.limit < 5
+    assert {s["key"]: s["status"] for s in pool.get_stats()}[state.name] == "cooldown"
+
+def test_auth_error_and_repeated_failures_eject_key():
+    pool = KeyPool(["sk-aaaaaaaaaa", "sk-bbbbbbbbbb"], eject_after=2)
+    bad = pool.acquire()
+    pool.release(bad, 401)
+    assert not pool.has_usable(exclude=[s for s in pool.keys if s is not bad])
+
+    flaky = pool.acquire()
+    assert flaky is not bad
+    pool.release(flaky, "error")
+    pool.release(pool.acquire(exclude=[bad]), 503)
+    assert [s["status"] for s in pool.get_stats()] == ["ejected", "ejected"]
+
+def test_has_usable_only_when_cooldown_ends_within_max_wait():
+    pool = KeyPool(["sk-aaaaaaaaaa"], max_wait=1)
+    state = pool.acquire()
+    pool.release(state, 429)  # 没有 Retry-After：冷却 cooldown=30 秒
+    assert not pool.has_usable()
+
+    state.cooldown_until = 0.0
+    pool.release(pool.acquire(), 429, retry_after="0.2")
+    assert pool.has_usable()
+    start = time.monotonic()
+    pool.release(pool.acquire(), 200)
+    assert 0.1 < time.monotonic() - start < 1
+
+def test_single_key_rate_limited_fails_fast(workdir):
+    from career_agent import CareerAgent
+    from mock_deepseek import MockDeepSeekServer
+
+    with MockDeepSeekServer(latency="fixed:0", error_rate=1.0, error_status=429) as server:
+        agent = CareerAgent(key_pool=KeyPool(["sk-aaaaaaaaaa"], max_wait=2))
+        agent.api_url = server.url
+        data = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "你好"}], "stream": False}
+        start = time.monotonic()
+        status_code, content, _ = agent._attempt({"Content-Type": "application/json"}, data, CancelToken(), None)
+        elapsed = time.monotonic() - start
+
+    # 唯一的密钥要冷却30秒：不再等待 max_wait 后把请求发给仍在冷却的密钥
+    assert status_code == 429 and content is None
+    assert server.stats["requests"] == 1
+    assert elapsed < 1
@@ -0,0 +1,69 @@
+# test_metering.py - 用量计量：费用计算、会话/全局预算判断，以及超过硬预算时的拒绝不算失败
+import json
+
+import pytest
+
+import metering
+from metering import BUDGET_OK, Meter, compute_cost, load_config
+
+PRICES = {"deepseek-chat": {"input_cache_hit": 0.5, "input_cache_miss": 2.0, "output": 8.0}}
+
+@pytest.fixture
+def metering_file(workdir, monkeypatch):
+    """写入临时计量配置并让 load_config 默认读取它；返回写配置的函数"""
+    path = workdir / "metering.json"
+    monkeypatch.setattr(metering, "METERING_FILE", str(path))
+
+    def write(session=None, daily=None):
+        budgets = {"session": session or {"soft": None, "hard": None}, "daily": daily or {"soft": None, "hard": None}}
+        path.write_text(json.dumps({"prices": PRICES, "budgets": budgets}), encoding="utf-8")
+    write()
+    return write
+
+def test_compute_cost_splits_cached_input():
+    usage = {"prompt_tokens": 1_000_000, "prompt_cache_hit_tokens": 400_000, "completion_tokens": 500_000}
+    assert compute_cost(usage, config={"prices": PRICES}) == pytest.approx(0.2 + 1.2 + 4.0)
+    assert compute_cost(usage, model="unknown", config={"prices": PRICES}) == pytest.approx(5.4)
+    assert compute_cost(None, config={"prices": PRICES}) == 0
+
+def test_load_config_keeps_defaults_for_missing_fields(workdir):
+    path = workdir / "partial.json"
+    path.write_text(json.dumps({"budgets": {"session": {"hard": 1}}}), encoding="utf-8")
+    config = load_config(str(path))
+    assert config["budgets"]["session"] == {"soft": None, "hard": 1}
+    assert config["budgets"]["daily"] == {"soft": None, "hard": None}
+    assert config["degraded_max_tokens"] == 400
+
+def test_budget_levels_hard_before_soft_and_session_before_daily(metering_file):
+    meter = Meter("data/metrics.json")
+    usage = {"prompt_tokens": 0, "completion_tokens": 125_000}  # 1.0
+    meter.charge("a", usage)
+    meter.charge("b", usage)
+    assert meter.get_session("a")["cost"] == pytest.approx(1.0)
+    assert meter.get_daily()["cost"] == pytest.approx(2.0)
+
+    assert meter.check("a") == BUDGET_OK
+    metering_file(session={"soft": 0.5, "hard": None})
+    assert meter.check("a")[:2] == ("soft", "session")
+    assert meter.check("new") == BUDGET_OK
+    metering_file(session={"soft": 0.5, "hard": 5}, daily={"soft": None, "hard": 2})
+    assert meter.check("a")[:2] == ("hard", "daily")
+    metering_file(session={"soft": None, "hard": 1}, daily={"soft": None, "hard": 2})
+    assert meter.check("a")[:2] == ("hard", "session")
+
+def test_hard_budget_refusal_is_blocked_not_failed(metering_file):
+    from career_agent import BUDGET_EXCEEDED_MESSAGES, CareerAgent
+    from key_pool import KeyPool
+    from turn_executor import TurnExecutor
+
+    metering_file(session={"soft": None, "hard": 0})
+    agent = CareerAgent(key_pool=KeyPool(["sk-test"]))
+    agent.meter = Meter("data/metrics.json")
+
+    handle = TurnExecutor(max_workers=1).submit(agent, "我想转行做数据分析")
+    handle.wait(10)
+    assert handle.outcome == "blocked"
+    assert handle.response == BUDGET_EXCEEDED_MESSAGES["session"]
+    assert agent.last_error is None and agent.blocked == "session"
+    # 拒绝提示不进入对话历史，之后的提问不会把它当作上下文
+    assert agent.conversation_history == []
@@ -0,0 +1,102 @@
+# test_metrics_archive.py - 历史指标列式归档：重复归档不重复写入，分桶布局与分钟桶汇总合并
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from metrics_archive import MetricsArchive
+from metrics_dashboard import (SECONDS_PER_DAY, EventColumns, MetricsDashboard, bucket_layout, merge_bucket_rows,
+                               new_bucket_rows)
+
+def old_events(days_ago=10, count=5):
+    start = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    calls = [{"timestamp": (start + timedelta(minutes=i)).isoformat(), "success": i != 0, "response_time": 1.0 + i}
+             for i in range(count)]
+    sessions = [{"timestamp": c["timestamp"]} for c in calls]
+    return calls, sessions
+
+def archived_calls(archive):
+    return sum(archive.load_partition(d).api_ts.size for d in archive.list_days())
+
+def test_append_is_idempotent(tmp_path):
+    calls, sessions = old_events()
+    columns = EventColumns.from_data({"api_calls": calls, "sessions": sessions})
+    archive = MetricsArchive(str(tmp_path / "archive"))
+
+    assert archive.append(columns) == 5
+    assert archive.append(columns) == 0
+    assert archived_calls(archive) == 5
+    assert archive.load_partition(archive.list_days()[0]).session_ts.size == 5
+
+def test_archive_after_crash_before_trim_does_not_duplicate(workdir):
+    dashboard = MetricsDashboard()
+    calls, sessions = old_events()
+    data = dashboard.load_data()
+    data["api_calls"], data["sessions"] = calls, sessions
+    dashboard.save_data(data)
+
+    # 模拟上一次归档写入分区后、裁剪 metrics.json 前崩溃
+    MetricsArchive(dashboard.archive_dir).append(EventColumns.from_data(data))
+
+    dashboard.archive_old_events(keep_days=7)
+
+    assert archived_calls(MetricsArchive(dashboard.archive_dir)) == 5
+    assert dashboard.load_data()["api_calls"] == []
+
+def test_later_events_of_same_day_are_appended(tmp_path):
+    calls, sessions = old_events(count=6)
+    archive = MetricsArchive(str(tmp_path / "archive"))
+    archive.append(EventColumns.from_data({"api_calls": calls[:3], "sessions": sessions[:3]}))
+    archive.append(EventColumns.from_data({"api_calls": calls, "sessions": sessions}))
+
+    partition = archive.load_partition(archive.list_days()[0])
+    assert partition.api_ts.size == 6
+    assert np.all(np.diff(partition.api_ts) > 0)
+
+@pytest.mark.parametrize("span, width", [(3600, 5), (SECONDS_PER_DAY, 120), (90 * SECONDS_PER_DAY, 10800),
+                                         (2000 * SECONDS_PER_DAY, 2 * SECONDS_PER_DAY)])
+def test_bucket_layout_picks_smallest_width_within_limit(span, width):
+    start = 1_700_000_123.5
+    got_width, first, count = bucket_layout(start, start + span, 3000)
+    assert got_width == width
+    assert first <= start < first + width and first % width == 0
+    assert first + count * width >= start + span
+    assert count <= 1000 + 1
+
+def test_merge_bucket_rows_sums_and_keeps_extremes():
+    target = new_bucket_rows(2)
+    rows = new_bucket_rows(4)
+    rows[:, 0] = [1, 2, 3, 4]
+    rows[:, 4] = [5.0, 1.0, 7.0, 0.5]
+    rows[:, 5] = [5.0, 9.0, 7.0, 0.5]
+    merge_bucket_rows(target, rows, np.array([0, 0, 1, 2]))  # 下标2越界，忽略
+
+    assert target[:, 0].tolist() == [3, 3]
+    assert target[:, 4].tolist() == [1.0, 7.0]
+    assert target[:, 5].tolist() == [9.0, 7.0]
+
+def test_rollup_timeseries_matches_raw_scan(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    day0 = 20000 * SECONDS_PER_DAY
+    api_ts = np.sort(day0 + rng.uniform(0, 6 * SECONDS_PER_DAY, 20000))
+    latency = rng.lognormal(0, 1, api_ts.size)
+    latency[rng.random(api_ts.size) < 0.05] = np.nan
+    columns = EventColumns(api_ts, rng.random(api_ts.size) > 0.1, latency,
+                           np.sort(day0 + rng.uniform(0, 6 * SECONDS_PER_DAY, 3000)))
+    archive = MetricsArchive(str(tmp_path / "archive"))
+    archive.append(columns)
+
+    live = EventColumns.from_data({})
+    start_s, end_s = day0 + 0.5 * SECONDS_PER_DAY, day0 + 4.5 * SECONDS_PER_DAY
+    opened = []
+    load_partition = archive.load_partition
+    monkeypatch.setattr(archive, "load_partition", lambda d: opened.append(d) or load_partition(d))
+
+    series = archive.timeseries(live, start_s, end_s, 300)
+    expected = columns.timeseries(start_s, end_s, 300)
+
+    assert series["resolution"] == "bucket" and series["bucket_seconds"] == 3600
+    # 完整覆盖的3天直接用分钟桶汇总，只打开首尾两天的原始事件
+    assert len(opened) == 2
+    for field in ("ts", "api_calls", "success_rates", "latency_avg", "latency_min", "latency_max", "sessions"):
+        np.testing.assert_allclose(series[field], expected[field], equal_nan=True)
@@ -0,0 +1,22 @@
+# test_mock_deepseek.py - 基准用mock DeepSeek服务：非流式响应不应被Nagle算法和延迟ACK拖慢
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mock_deepseek import MockDeepSeekServer
+
+def test_non_stream_keepalive_has_no_delayed_ack_stall():
+    with MockDeepSeekServer(latency="fixed:0") as server, requests.Session() as session:
+        timings = []
+        for _ in range(10):
+            start = time.perf_counter()
+            response = session.post(server.url, json={"messages": [{"role": "user", "content": "你好"}]}, timeout=5)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200
+            assert response.json()["choices"][0]["message"]["content"]
+    # 同一连接上的后续请求：头和体分两次写出时每次约多40ms
+    assert sorted(timings[1:])[len(timings) // 2] < 0.03
@@ -0,0 +1,68 @@
+# test_prefetch_engine.py - 后续问题预取：命中率统计和关闭预取时的轮次结算
+import threading
+
+from prefetch_engine import PrefetchEngine, extract_offers
+
+class FakeAgent:
+    """只实现预取引擎用到的接口；release 置位前 call_deepseek 一直阻塞"""
+
+    def __init__(self, release=None):
+        self.current_state = "career"
+        self.metrics_dashboard = None
+        self.release = release
+        self.last_usage = None
+        self.last_error = None
+        self.blocked = None
+
+    def fork(self):
+        return FakeAgent(self.release)
+
+    def prepare_messages(self, question):
+        return [{"role": "user", "content": question}]
+
+    def call_deepseek(self, messages):
+        if self.release is not None:
+            self.release.wait(5)
+        self.last_usage = {"total_tokens": 100}
+        return "预取的回答：" + messages[-1]["content"]
+
+def test_extract_offers():
+    assert extract_offers("以上是建议。需要一些具体的面试技巧吗？") == ["是的，请给我一些具体的面试技巧"]
+
+def test_take_without_round_is_not_counted():
+    engine = PrefetchEngine()
+    assert engine.take("第一次提问") is None
+    stats = engine.get_stats()
+    assert stats["misses"] == 0
+    assert stats["hit_rate"] == 0
+
+def test_hit_and_miss_counted_only_for_pending_round():
+    engine = PrefetchEngine(quick_questions={"career": ["如何写简历？", "如何准备面试？"]})
+    agent = FakeAgent()
+
+    engine.schedule(agent, "我想转行", "好的")
+    assert engine.take("如何写简历") == "预取的回答：如何写简历？"
+
+    engine.schedule(agent, "我想转行", "好的")
+    assert engine.take("别的问题") is None
+    # 上一次 take 已结束该轮次，之后的提问不再计入
+    assert engine.take("又一个问题") is None
+
+    stats = engine.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 50.0
+
+def test_reset_retires_in_flight_prefetches():
+    release = threading.Event()
+    engine = PrefetchEngine(quick_questions={"career": ["如何写简历？"]}, max_workers=1)
+    engine.schedule(FakeAgent(release), "我想转行", "好的")
+    future = next(iter(engine.round.values()))["future"]
+    while not future.running():
+        threading.Event().wait(0.01)
+
+    engine.reset()  # 关闭预取开关时调用
+    assert engine.get_pending_questions() == []
+
+    release.set()
+    future.result(timeout=5)
+    assert engine.get_stats()["tokens_wasted"] == 100
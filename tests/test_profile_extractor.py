@@ -0,0 +1,47 @@
+# test_profile_extractor.py - 用户画像提取：数字解析、字段提取、合并与按token预算压缩
+import pytest
+
+from tokens import estimate_tokens
+from profile_extractor import MAX_SKILLS, extract_profile, format_profile, merge_profile, parse_number
+
+@pytest.mark.parametrize("text, value", [("28", 28), ("3.5", 3.5), ("两", 2), ("十", 10), ("二十八", 28), ("三半", 3.5), ("半", 0.5)])
+def test_parse_number(text, value):
+    assert parse_number(text) == value
+
+def test_extract_full_message():
+    fields = extract_profile("我今年二十八岁，本科学的是计算机专业，做了5年测试，会Python和SQL，想转行做产品经理")
+    assert fields == {"age": 28, "years": 5, "degree": "本科", "major": "计算机",
+                      "target_role": "产品经理", "skills": ["Python", "SQL"]}
+
+def test_extract_years_and_fresh_graduate():
+    assert extract_profile("工作三年半了") == {"years": 3.5}
+    assert extract_profile("应届生，硕士")["years"] == 0
+    assert extract_profile("") == {}
+
+def test_target_role_is_not_counted_as_skill():
+    fields = extract_profile("会SQL，想转行做数据分析")
+    assert fields["target_role"] == "数据分析师"
+    assert fields["skills"] == ["SQL"]
+    assert extract_profile("产品经理面试一般问什么") == {"target_role": "产品经理"}
+
+def test_merge_keeps_latest_values_and_recent_skills():
+    profile = {}
+    merge_profile(profile, {"skills": ["Python", "SQL"], "years": 1})
+    merge_profile(profile, {"skills": ["Python", "Java"], "years": 2})
+    assert profile == {"skills": ["SQL", "Python", "Java"], "years": 2}
+
+    merge_profile(profile, {"skills": [f"S{i}" for i in range(MAX_SKILLS)]})
+    assert profile["skills"] == [f"S{i}" for i in range(MAX_SKILLS)]
+
+def test_format_profile_fits_budget_dropping_oldest_skills_first():
+    profile = {"target_role": "数据分析师", "years": 0, "major": "计算机", "age": 25,
+               "skills": ["Python", "SQL", "Excel", "Tableau", "Spark", "Hadoop", "Java", "Go"]}
+    full = format_profile(profile, max_tokens=1000)
+    assert full.startswith("目标岗位:数据分析师；工作年限:应届/无经验；专业:计算机；技能:Python、")
+
+    text = format_profile(profile, max_tokens=20)
+    assert estimate_tokens(text) <= 20
+    assert "目标岗位:数据分析师" in text
+    assert "技能:Go" in text and "Python" not in text
+
+    assert format_profile({}) == "暂无"
@@ -0,0 +1,79 @@
+# test_singleflight.py - 在途合并：相同请求只发一次上游调用，片段补发，等待者全部离开时取消上游
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+from turn_executor import CancelToken, TurnCancelled
+
+def test_request_key_is_canonical():
+    assert request_key({"a": 1, "b": [1, 2]}, "x") == request_key({"b": [1, 2], "a": 1}, "x")
+    assert request_key({"a": 1}) != request_key({"a": 2})
+
+def test_concurrent_callers_share_one_upstream_call():
+    flights = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+    calls = []
+
+    def fn(token, emit):
+        calls.append(1)
+        emit("你")
+        release.wait(5)
+        emit("好")
+        return "你好"
+
+    results, deltas = [], [[] for _ in range(5)]
+    joined = threading.Barrier(6)
+
+    def caller(i):
+        joined.wait()
+        results.append(flights.do("k", fn, on_delta=deltas[i].append))
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    joined.wait()
+    while flights.stats["leaders"] + flights.stats["followers"] < 5:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(merged for _, merged in results) == [False, True, True, True, True]
+    assert all(result == "你好" for result, _ in results)
+    assert all(parts == ["你", "好"] for parts in deltas)
+    assert flights.coalescing_ratio() == pytest.approx(0.8)
+    assert flights.flights == {}
+
+def test_error_is_raised_in_every_waiter_and_next_call_runs_again():
+    flights = SingleFlight(poll_interval=0.01)
+
+    def fail(token, emit):
+        raise RuntimeError("upstream")
+
+    with pytest.raises(RuntimeError):
+        flights.do("k", fail)
+    assert flights.do("k", lambda token, emit: "ok") == ("ok", False)
+
+def test_last_waiter_leaving_cancels_upstream():
+    flights = SingleFlight(poll_interval=0.01)
+    started = threading.Event()
+    upstream = []
+
+    def fn(token, emit):
+        upstream.append(token)
+        started.set()
+        for _ in range(500):
+            if token.cancelled:
+                return None
+            time.sleep(0.01)
+        return "late"
+
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with pytest.raises(TurnCancelled):
+        flights.do("k", fn, cancel_token=token)
+    assert started.is_set() and upstream[0].cancelled
+    assert "k" not in flights.flights
@@ -0,0 +1,65 @@
+# test_slo.py - SLO燃烧率：滑动窗口计数、告警触发/解除、最少事件数和告警日志
+import json
+
+import pytest
+
+from slo import SLOEngine
+
+T0 = 1_000_000_200.0  # 各窗口桶宽度的整数倍
+
+def engine(**options):
+    return SLOEngine(tick_seconds=0, **options)
+
+def feed(slo, start, seconds, success=True, latency=1.0):
+    """每秒一个调用，返回期间所有状态变化的告警"""
+    changes = []
+    for i in range(int(seconds)):
+        changes += slo.record(success, latency if success else None, start + i)
+    return changes
+
+def test_burn_rates_and_window_expiry():
+    slo = engine(latency_threshold=20.0)
+    for i in range(100):
+        slo.record(i >= 2, 30.0 if i in (2, 3, 4) else 1.0, T0 + i, evaluate=False)
+    rates = slo.burn_rates(T0 + 100)
+    # 2/100 失败、3/98 个成功调用超过20秒，错误预算均为1%
+    assert rates["availability"]["5m"] == pytest.approx(2.0)
+    assert rates["latency"]["5m"] == pytest.approx(3 / 98 / 0.01)
+    assert rates["availability"]["6h"] == pytest.approx(2.0)
+
+    rates = slo.burn_rates(T0 + 1000)
+    assert rates["availability"]["5m"] == 0.0
+    assert rates["availability"]["1h"] == pytest.approx(2.0)
+
+def test_outage_fires_critical_then_resolves_on_short_window(workdir):
+    slo = engine(alert_log=str(workdir / "alerts.jsonl"))
+    assert feed(slo, T0, 3600) == []
+
+    changes = feed(slo, T0 + 3600, 600, success=False)
+    fired = {(a["slo"], a["severity"]) for a in changes if a["status"] == "firing"}
+    assert fired == {("availability", "critical"), ("availability", "warning")}
+    assert ("availability", "critical") in slo.active
+
+    changes = feed(slo, T0 + 4200, 900)
+    resolved = [a for a in changes if a["status"] == "resolved" and a["severity"] == "critical"]
+    assert len(resolved) == 1
+    # 解除时1小时窗口仍在阈值之上：只看短窗口解除
+    assert resolved[0]["burn_rates"]["1h"] >= 14.4 > resolved[0]["burn_rates"]["5m"]
+    assert resolved[0]["ts"] - (T0 + 4200) < 300
+    assert slo.active == {}
+
+    logged = [json.loads(line) for line in (workdir / "alerts.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(a["severity"], a["status"]) for a in logged] == [
+        ("warning", "firing"), ("critical", "firing"), ("critical", "resolved"), ("warning", "resolved")]
+
+def test_no_alert_below_min_events():
+    slo = engine(min_events=20)
+    assert feed(slo, T0, 10, success=False) == []
+    assert feed(slo, T0 + 10, 10, success=False) != []
+
+def test_slow_successful_calls_fire_latency_slo():
+    slo = engine(latency_threshold=5.0)
+    feed(slo, T0, 3600)
+    changes = feed(slo, T0 + 3600, 600, latency=10.0)
+    assert {(a["slo"], a["status"]) for a in changes} == {("latency", "firing")}
+    assert slo.burn_rates(T0 + 4200)["availability"]["5m"] == 0.0
@@ -0,0 +1,44 @@
+# test_telemetry.py - 指标注册表：OpenMetrics文本、抽象指标基类和 /metrics 端点的监听地址
+import urllib.request
+
+import pytest
+
+import telemetry
+from telemetry import Counter, Gauge, Histogram, Registry, _Metric
+
+def test_render_counter_gauge_histogram():
+    registry = Registry()
+    requests = Counter("t_requests", "请求数", ["status"], registry=registry)
+    depth = Gauge("t_depth", "队列深度", registry=registry)
+    latency = Histogram("t_latency_seconds", "耗时", buckets=(0.1, 1), registry=registry)
+
+    requests.labels(200).inc()
+    requests.labels("200").inc(2)
+    depth.set(3)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert 't_requests_total{status="200"} 3' in text
+    assert "t_depth 3" in text
+    assert 't_latency_seconds_bucket{le="0.1"} 0' in text
+    assert 't_latency_seconds_bucket{le="1.0"} 1' in text or 't_latency_seconds_bucket{le="1"} 1' in text
+    assert text.rstrip().endswith("# EOF")
+
+def test_metric_base_class_is_abstract():
+    class Incomplete(_Metric):
+        type_name = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("t_incomplete", "缺少 _new_child / _samples", registry=Registry())
+
+def test_metrics_server_binds_loopback_by_default(monkeypatch):
+    monkeypatch.setattr(telemetry, "_server", None)
+    monkeypatch.delenv("METRICS_ADDR", raising=False)
+    port = telemetry.start_metrics_server(0)
+    try:
+        assert telemetry._server.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        telemetry._server.shutdown()
+        telemetry._server.server_close()
@@ -0,0 +1,5 @@
+# tokens.py - token数估算（提示词构建、画像压缩和预取预算共用，不依赖其他模块）
+
+def estimate_tokens(text):
+    """粗略估算token数（API未返回usage时使用，中文约2字符1个token）"""
+    return max(1, len(text or "") // 2)
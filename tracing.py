@@ -0,0 +1,187 @@
+# tracing.py - 轻量级链路追踪（嵌套span，导出为OpenTelemetry OTLP/JSON格式）
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+SERVICE_NAME = "career-agent"
+
+# 当前线程/协程中正在执行的span（线程池中的任务不继承，会开始新的trace）
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def _otlp_value(value):
+    """Python值转换为OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Span:
+    """一个计时区间；根span持有整条trace已结束的span列表"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "root", "start_ns", "end_ns",
+                 "attributes", "error", "spans")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.spans = [] if parent is None else None
+        self.end_ns = None
+        self.start_ns = time.time_ns()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.root.spans.append(self)
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def depth(self):
+        depth = 0
+        span = self.parent
+        while span is not None:
+            depth += 1
+            span = span.parent
+        return depth
+
+    def to_otlp(self):
+        """OTLP/JSON中的Span对象"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+def stage_timings(root):
+    """根span下已结束的各阶段耗时（相对根span开始的偏移），用于随会话记录保存"""
+    stages = []
+    for span in root.root.spans:
+        if span is root:
+            continue
+        stages.append({
+            "name": span.name,
+            "start_ms": round((span.start_ns - root.start_ns) / 1e6, 3),
+            "duration_ms": round(span.duration_ms, 3),
+            "depth": span.depth() - root.depth()
+        })
+    stages.sort(key=lambda s: s["start_ms"])
+    return stages
+
+def to_otlp_payload(spans, service_name=SERVICE_NAME):
+    """一组span包装为OTLP ExportTraceServiceRequest（JSON编码）"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "career_agent.tracing"},
+                "spans": [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+class FileSpanExporter:
+    """每条trace追加一行OTLP/JSON（可被OpenTelemetry Collector的otlpjsonfile接收器读取）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, payload):
+        line = json.dumps(payload, ensure_ascii=False) + "\n"
+        try:
+            with self.lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"写入trace失败: {e}")
+
+class OTLPHttpExporter:
+    """后台线程把trace发送到OTLP/HTTP collector（队列满时丢弃，不阻塞对话）"""
+
+    def __init__(self, endpoint, max_queue=1000, timeout=5):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._worker, name="otlp-exporter", daemon=True).start()
+
+    def export(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            pass
+
+    def _worker(self):
+        while True:
+            payload = self.queue.get()
+            try:
+                requests.post(self.url, json=payload, timeout=self.timeout)
+            except Exception as e:
+                print(f"发送trace失败: {e}")
+
+def exporters_from_env():
+    """TRACE_FILE 指定本地文件，OTEL_EXPORTER_OTLP_ENDPOINT 指定collector；都未设置时不导出"""
+    exporters = []
+    if os.getenv("TRACE_FILE"):
+        exporters.append(FileSpanExporter(os.getenv("TRACE_FILE")))
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        exporters.append(OTLPHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")))
+    return exporters
+
+class Tracer:
+    """with tracer.span("name"): ... 创建嵌套span，根span结束时整条trace交给导出器"""
+
+    def __init__(self, exporters=None, service_name=SERVICE_NAME):
+        self.exporters = exporters if exporters is not None else exporters_from_env()
+        self.service_name = service_name
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+            if parent is None and self.exporters:
+                payload = to_otlp_payload(span.spans, self.service_name)
+                for exporter in self.exporters:
+                    exporter.export(payload)
+
+    @staticmethod
+    def current_span():
+        return _current_span.get()
+
+tracer = Tracer()
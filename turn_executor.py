@@ -0,0 +1,229 @@
+# turn_executor.py - 对话轮次的后台执行器（有界线程池、可取消、单轮超时）
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from telemetry import QUEUE_DEPTH, TURN_OUTCOMES
+
+# 轮次结果：completed 正常完成 / failed API或程序出错 / cancelled 用户取消 / timeout 超过单轮时限
+OUTCOMES = ("completed", "failed", "blocked", "cancelled", "timeout")
+
+class TurnCancelled(Exception):
+    """轮次被取消（reason 为 cancelled 或 timeout）"""
+
+    def __init__(self, reason="cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+# ========== 可中断的HTTP连接 ==========
+# 当前线程正在为哪个取消令牌发请求；连接发出请求后登记其socket（响应为Connection: close时
+# 连接对象会提前丢开socket，所以登记socket本身），取消时关闭socket，阻塞在读取上的请求线程
+# 会立即收到连接错误，不必等到服务端返回
+
+_active = threading.local()
+
+class _CancellableConnectionMixin:
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        token = getattr(_active, "token", None)
+        if token is not None and self.sock is not None:
+            token.attach(self.sock)
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+class _CancellableHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+class _CancellableHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+class CancellableAdapter(HTTPAdapter):
+    """连接可被 CancelToken 中断的适配器（保留连接池复用）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CancellableHTTPPool, "https": _CancellableHTTPSPool}
+
+def _abort_socket(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+# 可取消请求共用的会话（只在 CancelToken.bind() 范围内的请求会登记连接）
+http_session = requests.Session()
+http_session.mount("http://", CancellableAdapter())
+http_session.mount("https://", CancellableAdapter())
+
+class CancelToken:
+    """一个轮次的取消状态；cancel() 可在任意线程调用，会中断正在进行的HTTP请求"""
+
+    def __init__(self):
+        self.reason = None
+        self.lock = threading.Lock()
+        self._sock = None
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            sock = self._sock
+        if sock is not None:
+            _abort_socket(sock)
+        return True
+
+    def attach(self, sock):
+        with self.lock:
+            self._sock = sock
+            cancelled = self.reason is not None
+        if cancelled:
+            _abort_socket(sock)
+
+    def check(self):
+        """已取消时抛出 TurnCancelled"""
+        if self.reason is not None:
+            raise TurnCancelled(self.reason)
+
+    @contextmanager
+    def bind(self):
+        """在此范围内当前线程通过 http_session 发出的请求可被取消"""
+        _active.token = self
+        try:
+            yield self
+        finally:
+            _active.token = None
+            with self.lock:
+                self._sock = None
+
+# ========== 执行器 ==========
+
+class TurnHandle:
+    """提交后立即返回的句柄：界面轮询 done()/text，取消调用 cancel()"""
+
+    def __init__(self, question, deadline):
+        self.id = uuid.uuid4().hex[:12]
+        self.question = question
+        self.deadline = deadline
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.token = CancelToken()
+        self.parts = []         # 流式收到的回答片段
+        self.response = None
+        self.outcome = None     # 结束后为 OUTCOMES 之一
+        self.error = None
+        self.future = None
+        self._done = threading.Event()
+
+    @property
+    def text(self):
+        """目前已生成的回答"""
+        return "".join(self.parts)
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.submitted_at
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """用户取消：还在排队时直接移出队列，执行中时中断HTTP请求"""
+        if self.done() or not self.token.cancel("cancelled"):
+            return False
+        if self.future is not None:
+            self.future.cancel()  # 排队中的任务不再执行，结果由完成回调记录
+        return True
+
+    def _finish(self, outcome, response=None, error=None):
+        self.response = response
+        self.outcome = outcome
+        self.error = error
+        self.finished_at = time.time()
+        self._done.set()
+
+class TurnExecutor:
+    """在有界线程池中执行 agent.passive_chat，Streamlit脚本线程不再被整轮回答阻塞
+
+    - max_workers: 同时执行的轮次数；max_pending: 排队加执行中的上限，超出时 submit 抛出 RuntimeError
+    - deadline: 单轮时限（秒，含排队时间），超时后中断请求，结果记为 timeout
+    - 取消和超时的轮次作为独立结果写入 MetricsDashboard
+    """
+
+    def __init__(self, max_workers=16, max_pending=64, deadline=90):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn")
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def submit(self, agent, question, deadline=None):
+        handle = TurnHandle(question, deadline or self.deadline)
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise RuntimeError("当前咨询人数较多，请稍后再试")
+            self.pending += 1
+        QUEUE_DEPTH.labels("turns").inc()
+
+        timer = threading.Timer(handle.deadline, handle.token.cancel, args=("timeout",))
+        timer.daemon = True
+        timer.start()
+        handle.future = self.executor.submit(self._run, agent, handle)
+        handle.future.add_done_callback(lambda f: self._on_done(agent, handle, timer))
+        return handle
+
+    def _run(self, agent, handle):
+        if handle.token.cancelled:
+            handle._finish(handle.token.reason)
+            return
+        try:
+            response = agent.passive_chat(handle.question, cancel_token=handle.token, on_delta=handle.parts.append)
+        except TurnCancelled as e:
+            handle._finish(e.reason)
+        except Exception as e:
+            handle._finish("failed", error=str(e))
+        else:
+            outcome = "failed" if agent.last_error else "blocked" if agent.blocked else "completed"
+            handle._finish(outcome, response, agent.last_error)
+
+    def _on_done(self, agent, handle, timer):
+        timer.cancel()
+        with self.lock:
+            self.pending -= 1
+        QUEUE_DEPTH.labels("turns").dec()
+        if not handle.done():  # 排队中被取消
+            handle._finish(handle.token.reason or "cancelled")
+        TURN_OUTCOMES.labels(handle.outcome).inc()
+        # 完成和失败的轮次已由 record_session / record_api_call 记录
+        if handle.outcome in ("cancelled", "timeout"):
+            agent.metrics_dashboard.record_turn_outcome(handle.outcome, handle.elapsed, handle.question)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_turn_executor():
+    """进程内共享的执行器（所有Streamlit会话共用同一个线程池）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = TurnExecutor()
+        return _executor